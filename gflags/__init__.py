@@ -86,6 +86,7 @@ IllegalFlagValue = exceptions.IllegalFlagValueError
 IllegalFlagValueError = exceptions.IllegalFlagValueError
 UnrecognizedFlagError = exceptions.UnrecognizedFlagError
 ValidationError = exceptions.ValidationError
+AggregateFlagsError = exceptions.AggregateFlagsError
 
 # Public functions:
 GetHelpWidth = _helpers.GetHelpWidth
@@ -106,11 +107,19 @@ EnumParser = argument_parser.EnumParser
 ArgumentSerializer = argument_parser.ArgumentSerializer
 FloatParser = argument_parser.FloatParser
 IntegerParser = argument_parser.IntegerParser
+DurationParser = argument_parser.DurationParser
+ByteSizeParser = argument_parser.ByteSizeParser
+DurationSerializer = argument_parser.DurationSerializer
+ByteSizeSerializer = argument_parser.ByteSizeSerializer
 BaseListParser = argument_parser.BaseListParser
 ListParser = argument_parser.ListParser
 ListSerializer = argument_parser.ListSerializer
 CsvListSerializer = argument_parser.CsvListSerializer
 WhitespaceSeparatedListParser = argument_parser.WhitespaceSeparatedListParser
+IntegerListParser = argument_parser.IntegerListParser
+FloatListParser = argument_parser.FloatListParser
+JsonParser = argument_parser.JsonParser
+JsonSerializer = argument_parser.JsonSerializer
 
 # pylint: enable=invalid-name
 
@@ -127,7 +136,9 @@ FLAGS = FlagValues()
 def register_validator(flag_name,
                        checker,
                        message='Flag validation failed',
-                       flag_values=FLAGS):
+                       flag_values=FLAGS,
+                       independent=False,
+                       pure=False):
   """Adds a constraint, which will be enforced during program execution.
 
   The constraint is validated when flags are initially parsed, and after each
@@ -146,14 +157,24 @@ def register_validator(flag_name,
       If checker raises gflags.ValidationError, message from the raised
         Error will be shown.
     flag_values: An optional FlagValues instance to validate against.
+    independent: bool, True if checker has no side effects and does not
+      depend on other validators.  Independent validators are run
+      concurrently on a bounded pool of threads; errors are still reported
+      in registration order.  Useful for slow checks, e.g. on remote files.
+    pure: bool, True if the result of checker depends only on its input.
+      The results for the most recent distinct inputs are remembered, and
+      verifying the validator again on one of them does not call checker.
   Raises:
     AttributeError: If flag_name is not registered as a valid flag name.
   """
-  v = gflags_validators.SingleFlagValidator(flag_name, checker, message)
+  v = gflags_validators.SingleFlagValidator(flag_name, checker, message,
+                                            independent=independent,
+                                            pure=pure)
   _add_validator(flag_values, v)
 
 
-def validator(flag_name, message='Flag validation failed', flag_values=FLAGS):
+def validator(flag_name, message='Flag validation failed', flag_values=FLAGS,
+              independent=False, pure=False):
   """A function decorator for defining a flag validator.
 
   Registers the decorated function as a validator for flag_name, e.g.
@@ -170,6 +191,8 @@ def validator(flag_name, message='Flag validation failed', flag_values=FLAGS):
       If checker raises gflags.ValidationError, message from the raised
         Error will be shown.
     flag_values: FlagValues
+    independent: bool, see register_validator().
+    pure: bool, see register_validator().
   Returns:
     A function decorator that registers its function argument as a validator.
   Raises:
@@ -179,7 +202,9 @@ def validator(flag_name, message='Flag validation failed', flag_values=FLAGS):
   def decorate(function):
     register_validator(flag_name, function,
                        message=message,
-                       flag_values=flag_values)
+                       flag_values=flag_values,
+                       independent=independent,
+                       pure=pure)
     return function
   return decorate
 
@@ -187,7 +212,9 @@ def validator(flag_name, message='Flag validation failed', flag_values=FLAGS):
 def register_multi_flags_validator(flag_names,
                                    multi_flags_checker,
                                    message='Flags validation failed',
-                                   flag_values=FLAGS):
+                                   flag_values=FLAGS,
+                                   independent=False,
+                                   pure=False):
   """Adds a constraint to multiple flags.
 
   The constraint is validated when flags are initially parsed, and after each
@@ -205,18 +232,23 @@ def register_multi_flags_validator(flag_names,
         If checker raises gflags.ValidationError, message from the raised error
         will be shown.
     flag_values: An optional FlagValues instance to validate against.
+    independent: bool, see register_validator().
+    pure: bool, see register_validator().
 
   Raises:
     AttributeError: If a flag is not registered as a valid flag name.
   """
   v = gflags_validators.MultiFlagsValidator(
-      flag_names, multi_flags_checker, message)
+      flag_names, multi_flags_checker, message, independent=independent,
+      pure=pure)
   _add_validator(flag_values, v)
 
 
 def multi_flags_validator(flag_names,
                           message='Flag validation failed',
-                          flag_values=FLAGS):
+                          flag_values=FLAGS,
+                          independent=False,
+                          pure=False):
   """A function decorator for defining a multi-flag validator.
 
   Registers the decorated function as a validator for flag_names, e.g.
@@ -234,6 +266,8 @@ def multi_flags_validator(flag_names,
         If checker raises ValidationError, message from the raised
         error will be shown.
     flag_values: An optional FlagValues instance to validate against.
+    independent: bool, see register_validator().
+    pure: bool, see register_validator().
 
   Returns:
     A function decorator that registers its function argument as a validator.
@@ -246,7 +280,9 @@ def multi_flags_validator(flag_names,
     register_multi_flags_validator(flag_names,
                                    function,
                                    message=message,
-                                   flag_values=flag_values)
+                                   flag_values=flag_values,
+                                   independent=independent,
+                                   pure=pure)
     return function
 
   return decorate
@@ -282,10 +318,7 @@ def mark_flag_as_required(flag_name, flag_values=FLAGS):
         'Flag %s has a non-None default value; therefore, '
         'mark_flag_as_required will pass even if flag is not specified in the '
         'command line!' % flag_name)
-  register_validator(flag_name,
-                     lambda value: value is not None,
-                     message='Flag --%s must be specified.' % flag_name,
-                     flag_values=flag_values)
+  _add_constraint('required', [flag_name], None, None, flag_values)
 
 
 def mark_flags_as_required(flag_names, flag_values=FLAGS):
@@ -317,17 +350,114 @@ def mark_flags_as_mutual_exclusive(flag_names, required=False,
         Otherwise, it is also valid for none of the flags to be set.
     flag_values: An optional FlagValues instance to validate against.
   """
+  _add_constraint('mutual_exclusion', list(flag_names), required, None,
+                  flag_values)
+
+
+def constrain_range(flag_name, lower_bound=None, upper_bound=None,
+                    message=None, flag_values=FLAGS):
+  """Ensures that the value of a flag is within [lower_bound, upper_bound].
+
+  Like the other constrain_* functions, this registers a declarative
+  constraint: a validator checked by a table of built-in functions instead
+  of a user closure.  None values, and the items of list values, are
+  handled as documented for each function.
+
+  Args:
+    flag_name: string, name of the flag.
+    lower_bound: min value of the flag, or None for no lower bound.
+    upper_bound: max value of the flag, or None for no upper bound.
+    message: error text to be shown to the user, or None for the default.
+    flag_values: An optional FlagValues instance to validate against.
+  Raises:
+    AttributeError: if flag_name is not registered as a valid flag name.
+  """
+  if lower_bound is not None and upper_bound is not None:
+    description = 'in the range [%s, %s]' % (lower_bound, upper_bound)
+  elif lower_bound is not None:
+    description = '>= %s' % lower_bound
+  else:
+    description = '<= %s' % upper_bound
+  _add_constraint('range', [flag_name],
+                  (lower_bound, upper_bound, description), message,
+                  flag_values)
+
+
+def constrain_regex(flag_name, pattern, message=None, flag_values=FLAGS):
+  """Ensures that the whole value of a flag matches a regular expression.
+
+  A None value passes; for list flags every item must match.
+
+  Args:
+    flag_name: string, name of the flag.
+    pattern: string or compiled regular expression.
+    message: error text to be shown to the user, or None for the default.
+    flag_values: An optional FlagValues instance to validate against.
+  Raises:
+    AttributeError: if flag_name is not registered as a valid flag name.
+  """
+  _add_constraint('regex', [flag_name], re.compile(pattern), message,
+                  flag_values)
+
+
+def constrain_one_of(flag_name, allowed_values, message=None,
+                     flag_values=FLAGS):
+  """Ensures that the value of a flag is one of allowed_values.
+
+  A None value passes; for list flags every item must be allowed.
+
+  Args:
+    flag_name: string, name of the flag.
+    allowed_values: iterable of hashable values.
+    message: error text to be shown to the user, or None for the default.
+    flag_values: An optional FlagValues instance to validate against.
+  Raises:
+    AttributeError: if flag_name is not registered as a valid flag name.
+  """
+  _add_constraint('one_of', [flag_name], frozenset(allowed_values), message,
+                  flag_values)
+
+
+def constrain_non_empty(flag_name, message=None, flag_values=FLAGS):
+  """Ensures that the value of a flag is not an empty string or list.
+
+  A None value passes: use mark_flag_as_required() to reject it.
+
+  Args:
+    flag_name: string, name of the flag.
+    message: error text to be shown to the user, or None for the default.
+    flag_values: An optional FlagValues instance to validate against.
+  Raises:
+    AttributeError: if flag_name is not registered as a valid flag name.
+  """
+  _add_constraint('non_empty', [flag_name], None, message, flag_values)
+
+
+def constrain_implies(flag_name, implied_flag_names, message=None,
+                      flag_values=FLAGS):
+  """Ensures that the implied flags are specified when a flag is set.
+
+  A flag is set when its value is neither None nor False.
+
+  Args:
+    flag_name: string, name of the flag.
+    implied_flag_names: [str], names of the flags that must not be None
+      when flag_name is set.
+    message: error text to be shown to the user, or None for the default.
+    flag_values: An optional FlagValues instance to validate against.
+  Raises:
+    AttributeError: if a flag is not registered as a valid flag name.
+  """
+  _add_constraint('implies', [flag_name] + list(implied_flag_names), None,
+                  message, flag_values)
 
-  def validate_mutual_exclusion(flags_dict):
-    flag_count = sum(1 for val in flags_dict.values() if val is not None)
-    if flag_count == 1 or (not required and flag_count == 0):
-      return True
-    message = ('%s one of (%s) must be specified.' %
-               ('Exactly' if required else 'At most', ', '.join(flag_names)))
-    raise ValidationError(message)
 
-  register_multi_flags_validator(
-      flag_names, validate_mutual_exclusion, flag_values=flag_values)
+def _add_constraint(kind, flag_names, argument, message, flag_values,
+                    parser_checked=False):
+  """Registers a validators.ConstraintValidator, see its documentation."""
+  _add_validator(flag_values, gflags_validators.ConstraintValidator(
+      kind, flag_names, argument, message=message,
+      parser_checked=parser_checked))
 
 
 def _add_validator(fv, validator_instance):
@@ -340,10 +470,14 @@ def _add_validator(fv, validator_instance):
     KeyError: if validators work with a non-existing flag.
   """
   for flag_name in validator_instance.get_flags_names():
-    fv[flag_name].validators.append(validator_instance)
+    flag = fv[flag_name]
+    flag._notify_change()  # pylint: disable=protected-access
+    flag.validators.append(validator_instance)
+  fv._AddValidatorToIndex(validator_instance)  # pylint: disable=protected-access
 
 
-def _register_bounds_validator_if_needed(parser, name, flag_values):
+def _register_bounds_validator_if_needed(parser, name, flag_values,
+                                         syntactic_help=None):
   """Enforces lower and upper bounds for numeric flags.
 
   Args:
@@ -351,16 +485,16 @@ def _register_bounds_validator_if_needed(parser, name, flag_values):
       and upper bounds, and help text to display.
     name: string, name of the flag
     flag_values: FlagValues
+    syntactic_help: string describing the valid values, if different from
+      the syntactic_help of parser (e.g. for lists).
   """
   if parser.lower_bound is not None or parser.upper_bound is not None:
-
-    def checker(value):
-      if value is not None and parser.is_outside_bounds(value):
-        message = '%s is not %s' % (value, parser.syntactic_help)
-        raise ValidationError(message)
-      return True
-
-    register_validator(name, checker, flag_values=flag_values)
+    # The parser enforces the bounds on every parsed value, so the
+    # constraint only needs to be verified on values assigned directly.
+    _add_constraint('range', [name],
+                    (parser.lower_bound, parser.upper_bound,
+                     syntactic_help or parser.syntactic_help),
+                    None, flag_values, parser_checked=True)
 
 
 # The DEFINE functions are explained in more details in the module doc string.
@@ -380,7 +514,8 @@ def DEFINE(parser, name, default, help, flag_values=FLAGS, serializer=None,  # p
     parser: ArgumentParser that is used to parse the flag arguments.
     name: A string, the flag name.
     default: The default value of the flag.
-    help: A help string.
+    help: A help string, or a callable returning it when the help is first
+        needed (see Flag.help); this holds for all DEFINE* functions.
     flag_values: FlagValues object with which the flag will be registered.
     serializer: ArgumentSerializer that serializes the flag value.
     module_name: A string, the name of the Python module declaring this flag.
@@ -636,6 +771,92 @@ def DEFINE_integer(  # pylint: disable=g-bad-name,redefined-builtin
   _register_bounds_validator_if_needed(parser, name, flag_values=flag_values)
 
 
+def DEFINE_duration(  # pylint: disable=g-bad-name,redefined-builtin
+    name, default, help, lower_bound=None, upper_bound=None,
+    flag_values=FLAGS, **args):
+  """Registers a flag whose value is a duration, in seconds.
+
+  The value is a float.  On the command line it is written with units, e.g.
+  --timeout=250ms, 1.5s, 2h or 1h30m (units: ns, us, ms, s, m, h, d); a
+  number without unit is a number of seconds.
+
+  If lower_bound or upper_bound are set, then this flag must be
+  within the given range.
+
+  Args:
+    name: str, flag name.
+    default: float or str, default flag value, e.g. 30 or '30s'.
+    help: str, help message.
+    lower_bound: float or str, min value of the flag.
+    upper_bound: float or str, max value of the flag.
+    flag_values: FlagValues object with which the flag will be registered.
+    **args: additional arguments to pass to DEFINE.
+  """
+  parser = DurationParser(lower_bound, upper_bound)
+  serializer = DurationSerializer()
+  DEFINE(parser, name, default, help, flag_values, serializer, **args)
+  _register_bounds_validator_if_needed(parser, name, flag_values=flag_values)
+
+
+def DEFINE_bytes(  # pylint: disable=g-bad-name,redefined-builtin
+    name, default, help, lower_bound=None, upper_bound=None,
+    flag_values=FLAGS, **args):
+  """Registers a flag whose value is a size, in bytes.
+
+  The value is an integer.  On the command line it may be written with
+  units, e.g. --cache_size=64KiB or 1G.  The units K, M, G, T, P and KiB,
+  MiB, etc. are powers of 1024, KB, MB, etc. are powers of 1000.
+
+  If lower_bound or upper_bound are set, then this flag must be
+  within the given range.
+
+  Args:
+    name: str, flag name.
+    default: int or str, default flag value, e.g. 1024 or '1KiB'.
+    help: str, help message.
+    lower_bound: int or str, min value of the flag.
+    upper_bound: int or str, max value of the flag.
+    flag_values: FlagValues object with which the flag will be registered.
+    **args: additional arguments to pass to DEFINE.
+  """
+  parser = ByteSizeParser(lower_bound, upper_bound)
+  serializer = ByteSizeSerializer()
+  DEFINE(parser, name, default, help, flag_values, serializer, **args)
+  _register_bounds_validator_if_needed(parser, name, flag_values=flag_values)
+
+
+def DEFINE_json(  # pylint: disable=g-bad-name,redefined-builtin
+    name, default, help, schema=None, flag_values=FLAGS, **args):
+  """Registers a flag whose value is a decoded JSON value.
+
+  On the command line the value is written as JSON text, e.g.
+  --config='{"hosts": ["a", "b"]}', or as @ followed by the path of a file
+  containing the JSON text, e.g. --config=@~/config.json.  The value is
+  decoded once at parse time into an immutable structure: JSON objects are
+  read-only Mappings and arrays are tuples.
+
+  Args:
+    name: str, flag name.
+    default: JSON text, or a structure of dicts, lists and scalars.
+    help: str, help message.
+    schema: dict, a subset of JSON Schema that the value must match, using
+      the keywords type, enum, minimum, maximum, properties, required,
+      additionalProperties and items; or None.
+    flag_values: FlagValues object with which the flag will be registered.
+    **args: additional arguments to pass to DEFINE.
+
+  Raises:
+    ValueError: if schema uses keywords or type names that are not supported.
+  """
+  if schema is not None:
+    gflags_validators._check_json_schema_definition(schema)  # pylint: disable=protected-access
+  parser = JsonParser()
+  serializer = JsonSerializer()
+  DEFINE(parser, name, default, help, flag_values, serializer, **args)
+  if schema is not None:
+    _add_constraint('json_schema', [name], schema, None, flag_values)
+
+
 def DEFINE_enum(  # pylint: disable=g-bad-name,redefined-builtin
     name, default, enum_values, help, flag_values=FLAGS, module_name=None,
     **args):
@@ -697,6 +918,66 @@ def DEFINE_spaceseplist(  # pylint: disable=g-bad-name,redefined-builtin
   DEFINE(parser, name, default, help, flag_values, serializer, **args)
 
 
+def DEFINE_int_list(  # pylint: disable=g-bad-name,redefined-builtin
+    name, default, help, lower_bound=None, upper_bound=None, use_numpy=False,
+    flag_values=FLAGS, **args):
+  """Registers a flag whose value is a list of integers.
+
+  The items are separated by commas and/or whitespace, e.g. --sizes=1,2,3.
+  The value is an array.array of signed integers, or a NumPy array if
+  use_numpy is True (NumPy must then be installed).
+
+  If lower_bound or upper_bound are set, then every item must be within
+  the given range.
+
+  Args:
+    name: str, flag name.
+    default: list of ints or str, default flag value.
+    help: str, help message.
+    lower_bound: int, min value of the items.
+    upper_bound: int, max value of the items.
+    use_numpy: bool, whether the value is a NumPy array.
+    flag_values: FlagValues object with which the flag will be registered.
+    **args: additional arguments to pass to DEFINE.
+  """
+  parser = IntegerListParser(lower_bound, upper_bound, use_numpy)
+  serializer = ListSerializer(',')
+  DEFINE(parser, name, default, help, flag_values, serializer, **args)
+  _register_bounds_validator_if_needed(
+      parser, name, flag_values=flag_values,
+      syntactic_help=parser.item_parser.syntactic_help)
+
+
+def DEFINE_float_list(  # pylint: disable=g-bad-name,redefined-builtin
+    name, default, help, lower_bound=None, upper_bound=None, use_numpy=False,
+    flag_values=FLAGS, **args):
+  """Registers a flag whose value is a list of floats.
+
+  The items are separated by commas and/or whitespace, e.g.
+  --weights=0.5,1.5.  The value is an array.array of doubles, or a NumPy
+  array if use_numpy is True (NumPy must then be installed).
+
+  If lower_bound or upper_bound are set, then every item must be within
+  the given range.
+
+  Args:
+    name: str, flag name.
+    default: list of floats or str, default flag value.
+    help: str, help message.
+    lower_bound: float, min value of the items.
+    upper_bound: float, max value of the items.
+    use_numpy: bool, whether the value is a NumPy array.
+    flag_values: FlagValues object with which the flag will be registered.
+    **args: additional arguments to pass to DEFINE.
+  """
+  parser = FloatListParser(lower_bound, upper_bound, use_numpy)
+  serializer = ListSerializer(',')
+  DEFINE(parser, name, default, help, flag_values, serializer, **args)
+  _register_bounds_validator_if_needed(
+      parser, name, flag_values=flag_values,
+      syntactic_help=parser.item_parser.syntactic_help)
+
+
 def DEFINE_multi(  # pylint: disable=g-bad-name,redefined-builtin
     parser, serializer, name, default, help, flag_values=FLAGS,
     module_name=None, **args):
@@ -877,6 +1158,13 @@ DEFINE_string(
     'with that name.  IMPORTANT: flags in this list that have '
     'arguments MUST use the --flag=value format.', _helpers.SPECIAL_FLAGS)
 
+DEFINE_string(
+    'helpsearch', '',
+    'Regular expression matching the name, short name, help or module of '
+    'the flags to print the help of.  Parsing only records it: the '
+    'application is expected to print the help of the matching flags and '
+    'exit, see FlagValues.help_search_query().', _helpers.SPECIAL_FLAGS)
+
 
 # Old CamelCase functions. It's OK to use them, but those use cases will be
 # migrated to PEP8 style functions in the future.
@@ -31,6 +31,7 @@
 """Helper functions for //gflags."""
 
 import collections
+import multiprocessing.pool
 import os
 import re
 import struct
@@ -55,6 +56,11 @@ _DEFAULT_HELP_WIDTH = 80  # Default width of help output.
 _MIN_HELP_WIDTH = 40  # Minimal "sane" width of help output. We assume that any
                       # value below 40 is unreasonable.
 
+# Dictionary: (width, indent, first line indent) -> pair of TextWrapper
+# objects, see _GetTextWrappers.  Cleared when it grows too large.
+_text_wrappers = {}
+_MAX_CACHED_TEXT_WRAPPERS = 64
+
 # Define the allowed error rate in an input string to get suggestions.
 #
 # We lean towards a high threshold because we tend to be matching a phrase,
@@ -72,6 +78,9 @@ _SUGGESTION_ERROR_RATE_THRESHOLD = 0.50
 _ILLEGAL_XML_CHARS_REGEX = re.compile(
     u'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x84\x86-\x9f\ud800-\udfff\ufffe\uffff]')
 
+# Upper bound on the number of threads used by MapConcurrently.
+_MAX_WORKER_THREADS = 8
+
 # This is a set of module ids for the modules that disclaim key flags.
 # This module is explicitly added to this set so that we never consider it to
 # define key flag.
@@ -167,19 +176,20 @@ def StrOrUnicode(value):
     return unicode(value)  # Python3 should never come here
 
 
-def CreateXMLDOMElement(doc, name, value):
-  """Returns an XML DOM element with name and text value.
+def _XMLText(value):
+  """Returns the text of an XML element holding value.
 
   Args:
-    doc: A minidom.Document, the DOM document it should create nodes from.
-    name: A string, the tag of XML element.
     value: A Python object, whose string representation will be used
-      as the value of the XML element. Illegal or highly discouraged xml 1.0
-      characters are stripped.
+      as the value of the XML element.
 
   Returns:
-    An instance of minidom.Element.
+    A unicode string without illegal or highly discouraged xml 1.0
+    characters.
   """
+  if hasattr(value, 'tolist'):
+    # Display arrays (array.array, NumPy) like lists.
+    value = value.tolist()
   s = StrOrUnicode(value)
   if six.PY2 and not isinstance(s, unicode):
     # Get a valid unicode string.
@@ -188,13 +198,49 @@ def CreateXMLDOMElement(doc, name, value):
     # Display boolean values as the C++ flag library does: no caps.
     s = s.lower()
   # Remove illegal xml characters.
-  s = _ILLEGAL_XML_CHARS_REGEX.sub(u'', s)
+  return _ILLEGAL_XML_CHARS_REGEX.sub(u'', s)
+
+
+def CreateXMLDOMElement(doc, name, value):
+  """Returns an XML DOM element with name and text value.
+
+  Args:
+    doc: A minidom.Document, the DOM document it should create nodes from.
+    name: A string, the tag of XML element.
+    value: A Python object, whose string representation will be used
+      as the value of the XML element. Illegal or highly discouraged xml 1.0
+      characters are stripped.
 
+  Returns:
+    An instance of minidom.Element.
+  """
+  s = _XMLText(value)
   e = doc.createElement(name)
   e.appendChild(doc.createTextNode(s))
   return e
 
 
+def WriteXMLElement(writer, name, value, indent=''):
+  """Writes an XML element with name and text value.
+
+  The output is identical to the one of the element returned by
+  CreateXMLDOMElement when it is pretty printed by minidom, without
+  building any DOM node.
+
+  Args:
+    writer: An object with a write method accepting unicode strings.
+    name: A string, the tag of XML element.
+    value: A Python object, whose string representation will be used
+      as the value of the XML element. Illegal or highly discouraged xml 1.0
+      characters are stripped.
+    indent: A string, the indentation of the element.
+  """
+  # Escape the same characters as minidom does for text nodes.
+  text = (_XMLText(value).replace(u'&', u'&amp;').replace(u'<', u'&lt;')
+          .replace(u'"', u'&quot;').replace(u'>', u'&gt;'))
+  writer.write(u'%s<%s>%s</%s>\n' % (indent, name, text, name))
+
+
 def GetHelpWidth():
   """Returns: an integer, the width of help lines that is used in TextWrap."""
   if not sys.stdout.isatty() or termios is None or fcntl is None:
@@ -269,6 +315,42 @@ def _DamerauLevenshtein(a, b):
   return Distance(a, b)
 
 
+def MapConcurrently(function, items, max_threads=_MAX_WORKER_THREADS):
+  """Calls function on every item using a bounded pool of threads.
+
+  Args:
+    function: callable taking a single item.
+    items: list of items.
+    max_threads: int, maximal number of threads to use.
+
+  Returns:
+    The list of the results of function, in the order of items.
+  """
+  if len(items) < 2 or max_threads < 2:
+    return [function(item) for item in items]
+  pool = multiprocessing.pool.ThreadPool(min(len(items), max_threads))
+  try:
+    return pool.map(function, items)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def _GetTextWrappers(length, indent, firstline_indent):
+  """Returns the cached (first paragraph, other paragraphs) TextWrappers."""
+  key = (length, indent, firstline_indent)
+  wrappers = _text_wrappers.get(key)
+  if wrappers is None:
+    if len(_text_wrappers) >= _MAX_CACHED_TEXT_WRAPPERS:
+      _text_wrappers.clear()
+    wrappers = _text_wrappers[key] = (
+        textwrap.TextWrapper(width=length, initial_indent=firstline_indent,
+                             subsequent_indent=indent),
+        textwrap.TextWrapper(width=length, initial_indent=indent,
+                             subsequent_indent=indent))
+  return wrappers
+
+
 def TextWrap(text, length=None, indent='', firstline_indent=None):
   """Wraps a given text to a maximum line length and returns it.
 
@@ -301,21 +383,25 @@ def TextWrap(text, length=None, indent='', firstline_indent=None):
   if len(firstline_indent) >= length:
     raise ValueError('Length of first line indent exceeds length')
 
-  text = text.expandtabs(4)
-
-  result = []
-  # Create one wrapper for the first paragraph and one for subsequent
-  # paragraphs that does not have the initial wrapping.
-  wrapper = textwrap.TextWrapper(
-      width=length, initial_indent=firstline_indent, subsequent_indent=indent)
-  subsequent_wrapper = textwrap.TextWrapper(
-      width=length, initial_indent=indent, subsequent_indent=indent)
-
   # textwrap does not have any special treatment for newlines. From the docs:
   # "...newlines may appear in the middle of a line and cause strange output.
   # For this reason, text should be split into paragraphs (using
   # str.splitlines() or similar) which are wrapped separately."
-  for paragraph in (p.strip() for p in text.splitlines()):
+  paragraphs = text.expandtabs(4).splitlines()
+
+  if len(paragraphs) == 1:
+    paragraph = paragraphs[0].strip()
+    if len(firstline_indent) + len(paragraph) <= length:
+      # Fast path: a single paragraph that fits on the first line.
+      return firstline_indent + paragraph if paragraph else ''
+
+  result = []
+  # One wrapper for the first paragraph and one for subsequent paragraphs
+  # that does not have the initial wrapping.
+  wrapper, subsequent_wrapper = _GetTextWrappers(length, indent,
+                                                 firstline_indent)
+
+  for paragraph in (p.strip() for p in paragraphs):
     if paragraph:
       result.extend(wrapper.wrap(paragraph))
     else:
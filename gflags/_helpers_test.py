@@ -163,6 +163,27 @@ class GetCallingModuleTest(unittest.TestCase):
       sys.modules = orig_sys_modules
 
 
+class TextWrapTest(unittest.TestCase):
+
+  def testOneLine(self):
+    self.assertEqual('> short text',
+                     _helpers.TextWrap('  short text ', 20, '  ', '> '))
+    self.assertEqual('', _helpers.TextWrap('   ', 20))
+
+  def testWrapsLongParagraphs(self):
+    self.assertEqual('> aaaa bbbb\n  cccc\n\n  dd',
+                     _helpers.TextWrap('aaaa bbbb cccc\n\ndd', 11, '  ', '> '))
+
+  def testWrappersAreReused(self):
+    _helpers.TextWrap('aaaa bbbb cccc', 11, '  ')
+    wrappers = _helpers._GetTextWrappers(11, '  ', '  ')
+    _helpers.TextWrap('dddd eeee ffff', 11, '  ')
+    self.assertIs(wrappers, _helpers._GetTextWrappers(11, '  ', '  '))
+
+  def testIndentTooLong(self):
+    self.assertRaises(ValueError, _helpers.TextWrap, 'text', 4, '    ')
+
+
 class IsRunningTestTest(unittest.TestCase):
 
   def testUnderTest(self):
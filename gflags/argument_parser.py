@@ -34,14 +34,42 @@ Instead of importing this module directly, it's preferable to import the
 flags package and use the aliases defined at the package level.
 """
 
+import array
+import collections
 import csv
 import io
+import json
+import os
+import re
 import string
+import threading
 
 import six
 
 from gflags import _helpers
 
+try:
+  from collections import abc as collections_abc  # pylint: disable=g-import-not-at-top
+except ImportError:  # Python 2.
+  collections_abc = collections
+
+
+# Default maximal number of arguments in the cache of a parser, see
+# ArgumentParser.enable_parse_cache.
+_DEFAULT_PARSE_CACHE_SIZE = 1000
+
+# Statistics of the cache of a parser, see ArgumentParser.parse_cache_stats.
+ParseCacheStats = collections.namedtuple(
+    'ParseCacheStats', ['hits', 'misses', 'evictions', 'size', 'max_size'])
+
+# Marks a missing cache entry.
+_MISSING = object()
+
+# Characters which require the csv module to parse a comma-separated list.
+_CSV_PARSE_SPECIAL_CHARS = ('"', '\r', '\n', '\0')
+# Characters which require the csv module to serialize a list item.
+_CSV_SERIALIZE_SPECIAL_CHARS = ('"', '\r', '\n', '\0', ',')
+
 
 class _ArgumentParserCache(type):
   """Metaclass used to cache and share argument parsers among flags."""
@@ -127,6 +155,30 @@ class ArgumentParser(six.with_metaclass(_ArgumentParserCache, object)):
     """Returns a string representing the type of the flag."""
     return 'string'
 
+  def enable_parse_cache(self, max_size=_DEFAULT_PARSE_CACHE_SIZE):
+    """Makes this parser remember the values of recently parsed arguments.
+
+    Only use it for parsers returning immutable values, or lists: lists are
+    stored as tuples and each call returns a new list.  Since parsers are
+    shared, the cache is used by all the flags using this parser.  Calling
+    it again replaces the cache by an empty one.
+
+    Args:
+      max_size: int, maximal number of string arguments in the cache; the
+        least recently used ones are evicted first.
+    """
+    parse = self.parse
+    if isinstance(parse, _ParseCache):
+      parse = parse.parse
+    self.parse = self.Parse = _ParseCache(parse, max_size)
+
+  def parse_cache_stats(self):
+    """Returns ParseCacheStats, or None if the parse cache is not enabled."""
+    parse = self.__dict__.get('parse')
+    if not isinstance(parse, _ParseCache):
+      return None
+    return parse.stats()
+
   def _custom_xml_dom_elements(self, doc):  # pylint: disable=unused-argument
     """Returns a list of XML DOM elements to add additional flag information.
 
@@ -138,6 +190,58 @@ class ArgumentParser(six.with_metaclass(_ArgumentParserCache, object)):
     """
     return []
 
+  def _custom_schema_fields(self):
+    """Returns a dictionary of additional fields of the JSON flag schema.
+
+    Returns:
+      A dictionary, field name -> value encodable in JSON.
+    """
+    return {}
+
+
+class _ParseCache(object):
+  """Bounded LRU cache of the values returned by a parse method.
+
+  Instances are callable like the parse method they wrap.  Only string
+  arguments are cached, and errors are not.
+  """
+
+  def __init__(self, parse, max_size):
+    self.parse = parse
+    self._max_size = max_size
+    # OrderedDict: argument -> (is_list, value), least recently used first.
+    self._values = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+
+  def __call__(self, argument):
+    if not isinstance(argument, six.string_types):
+      return self.parse(argument)
+    with self._lock:
+      entry = self._values.pop(argument, _MISSING)
+      if entry is not _MISSING:
+        self._values[argument] = entry
+        self._hits += 1
+    if entry is _MISSING:
+      value = self.parse(argument)
+      is_list = isinstance(value, list)
+      with self._lock:
+        self._misses += 1
+        self._values[argument] = (is_list, tuple(value) if is_list else value)
+        while len(self._values) > self._max_size:
+          self._values.popitem(last=False)
+          self._evictions += 1
+      return value
+    is_list, value = entry
+    return list(value) if is_list else value
+
+  def stats(self):
+    with self._lock:
+      return ParseCacheStats(self._hits, self._misses, self._evictions,
+                             len(self._values), self._max_size)
+
 
 class _ArgumentSerializerMeta(type):
 
@@ -179,6 +283,14 @@ class NumericParser(ArgumentParser):
           doc, 'upper_bound', self.upper_bound))
     return elements
 
+  def _custom_schema_fields(self):
+    fields = {}
+    if self.lower_bound is not None:
+      fields['lower_bound'] = self.lower_bound
+    if self.upper_bound is not None:
+      fields['upper_bound'] = self.upper_bound
+    return fields
+
   def convert(self, argument):
     """Default implementation: always returns its argument unmodified."""
     return argument
@@ -264,6 +376,220 @@ class IntegerParser(NumericParser):
     return 'int'
 
 
+# One term of a value with units, e.g. '1.5' and 'h' in '1.5h'.
+_UNIT_TERM_REGEX = re.compile(r'\s*(\d+(?:\.\d*)?|\.\d+)\s*([^\d\s.+-]*)\s*')
+
+
+class _UnitParser(NumericParser):
+  """Base class of the parsers of numbers with unit suffixes, e.g. '1.5s'.
+
+  Arguments are sums of terms such as '1h30m'; a single number without a
+  unit is in the base unit.  Numbers (e.g. default values) are converted to
+  the type of the parsed values.  Bounds may be given either way.
+
+  The parse cache is enabled, as multi flags often repeat the same
+  arguments.
+  """
+
+  # Dictionary: unit -> multiplier (number of base units), set by subclasses.
+  _units = {}
+  # Unit of the numbers given without unit.
+  _default_unit = None
+  # Whether units are matched case-insensitively, using upper-case keys.
+  _case_insensitive_units = False
+
+  def __init__(self, lower_bound=None, upper_bound=None):
+    super(_UnitParser, self).__init__()
+    if lower_bound is not None:
+      lower_bound = self.convert(lower_bound)
+    if upper_bound is not None:
+      upper_bound = self.convert(upper_bound)
+    self.lower_bound = lower_bound
+    self.upper_bound = upper_bound
+    sh = self.syntactic_help
+    if lower_bound is not None and upper_bound is not None:
+      sh = ('%s in the range [%s, %s]' % (
+          sh, self.format_value(lower_bound), self.format_value(upper_bound)))
+    elif lower_bound == 0:
+      sh = 'a non-negative %s' % self.number_name
+    elif upper_bound is not None:
+      sh = '%s <= %s' % (self.number_name, self.format_value(upper_bound))
+    elif lower_bound is not None:
+      sh = '%s >= %s' % (self.number_name, self.format_value(lower_bound))
+    self.syntactic_help = sh
+    self.enable_parse_cache()
+
+  def parse(self, argument):
+    val = self.convert(argument)
+    if self.is_outside_bounds(val):
+      raise ValueError('%s is not %s' % (self.format_value(val),
+                                         self.syntactic_help))
+    return val
+
+  def convert(self, argument):
+    """Converts argument to the type of the parsed values.
+
+    Args:
+      argument: string with units, or number in the base unit.
+
+    Returns:
+      The parsed value.
+
+    Raises:
+      ValueError: if argument is not valid.
+    """
+    if not isinstance(argument, six.string_types):
+      return self._from_base_units(argument)
+    text = argument.strip()
+    sign = 1
+    if text[:1] in ('-', '+'):
+      sign = -1 if text[0] == '-' else 1
+      text = text[1:]
+    if not text:
+      raise ValueError('%r is not %s' % (argument, self.number_article_name))
+    total = 0
+    pos = 0
+    while pos < len(text):
+      match = _UNIT_TERM_REGEX.match(text, pos)
+      if not match:
+        raise ValueError('%r is not %s' % (argument, self.number_article_name))
+      number, unit = match.groups()
+      if not unit:
+        if pos or match.end() < len(text):
+          raise ValueError('missing unit in %r' % argument)
+        unit = self._default_unit
+      multiplier = self._units.get(
+          unit.upper() if self._case_insensitive_units else unit)
+      if multiplier is None:
+        raise ValueError('unknown unit %r in %r' % (unit, argument))
+      if '.' in number:
+        total += float(number) * multiplier
+      else:
+        total += int(number) * multiplier
+      pos = match.end()
+    return self._from_base_units(sign * total)
+
+  @property
+  def number_article_name(self):
+    return '%s %s' % (self.number_article, self.number_name)
+
+  def format_value(self, value):
+    """Returns the shortest string with units that parses to value."""
+    raise NotImplementedError('This method should be overloaded')
+
+  def _from_base_units(self, number):
+    """Converts a number of base units to the type of the parsed values."""
+    raise NotImplementedError('This method should be overloaded')
+
+
+class DurationParser(_UnitParser):
+  """Parser of durations, e.g. '250ms', '1.5s', '2h' or '1h30m'.
+
+  The parsed values are floats, in seconds.  The units are ns, us, ms, s,
+  m (minutes), h and d.  A number without unit is a number of seconds.
+  """
+  number_article = 'a'
+  number_name = 'duration'
+  syntactic_help = ' '.join((number_article, number_name))
+
+  # The base unit is the nanosecond, so that durations are sums of integers.
+  _units = {
+      'ns': 1,
+      'us': 10**3,
+      u'\u00b5s': 10**3,
+      'ms': 10**6,
+      's': 10**9,
+      'm': 60 * 10**9,
+      'h': 3600 * 10**9,
+      'd': 86400 * 10**9,
+  }
+  _default_unit = 's'
+  _format_units = ('d', 'h', 'm', 's', 'ms', 'us', 'ns')
+
+  def convert(self, argument):
+    if not isinstance(argument, six.string_types):
+      return float(argument)
+    return super(DurationParser, self).convert(argument)
+
+  def _from_base_units(self, number):
+    return number / 1e9
+
+  def format_value(self, value):
+    nanoseconds = value * 1e9
+    if nanoseconds != int(nanoseconds):
+      return '%rs' % value
+    return _format_with_units(int(nanoseconds), self._units, self._format_units)
+
+  def flag_type(self):
+    return 'duration'
+
+
+class ByteSizeParser(_UnitParser):
+  """Parser of byte sizes, e.g. '512', '64KiB', '1G' or '1.5MB'.
+
+  The parsed values are integers.  The units are B, the binary K, M, G, T, P
+  (also written KiB, MiB, etc.) and the decimal KB, MB, GB, TB, PB.  Units
+  are case-insensitive.
+  """
+  number_article = 'a'
+  number_name = 'byte size'
+  syntactic_help = ' '.join((number_article, number_name))
+
+  _units = {'B': 1}
+  for _exponent, _prefix in enumerate('KMGTP'):
+    _units[_prefix] = _units[_prefix + 'IB'] = 1024**(_exponent + 1)
+    _units[_prefix + 'B'] = 1000**(_exponent + 1)
+  del _exponent, _prefix
+  _default_unit = 'B'
+  _case_insensitive_units = True
+  _format_units = ('PiB', 'PB', 'TiB', 'TB', 'GiB', 'GB', 'MiB', 'MB', 'KiB',
+                   'KB')
+
+  def _from_base_units(self, number):
+    size = int(number)
+    if size != number:
+      raise ValueError('%r is not a whole number of bytes' % number)
+    return size
+
+  def format_value(self, value):
+    return _format_with_units(value, self._units, self._format_units)
+
+  def flag_type(self):
+    return 'byte size'
+
+
+def _format_with_units(number, units, format_units):
+  """Formats an integer with the largest unit dividing it.
+
+  Args:
+    number: int, number of base units.
+    units: dictionary, unit -> multiplier; upper-case keys are also tried.
+    format_units: sequence of units, by decreasing multiplier.
+
+  Returns:
+    A string such as '64KiB', or str(number) if no unit divides number.
+  """
+  for unit in format_units:
+    multiplier = units.get(unit) or units[unit.upper()]
+    if number and number % multiplier == 0:
+      return '%d%s' % (number // multiplier, unit)
+  return str(number)
+
+
+class DurationSerializer(ArgumentSerializer):
+  """Serializes durations with units, e.g. 0.25 as '250ms'."""
+
+  def serialize(self, value):
+    return DurationParser().format_value(value)
+
+
+class ByteSizeSerializer(ArgumentSerializer):
+  """Serializes byte sizes with units, e.g. 65536 as '64KiB'."""
+
+  def serialize(self, value):
+    return ByteSizeParser().format_value(value)
+
+
 class BooleanParser(ArgumentParser):
   """Parser of boolean values."""
 
@@ -307,6 +633,13 @@ class EnumParser(ArgumentParser):
     super(EnumParser, self).__init__()
     self.enum_values = enum_values
     self.case_sensitive = case_sensitive
+    if case_sensitive:
+      self._enum_values_set = frozenset(enum_values or ())
+    else:
+      # Dictionary: upper-cased value -> first matching element of the enum.
+      self._canonical_values = {}
+      for value in enum_values or ():
+        self._canonical_values.setdefault(value.upper(), value)
 
   def parse(self, argument):
     """Determine validity of argument and return the correct element of enum.
@@ -331,22 +664,27 @@ class EnumParser(ArgumentParser):
     if not self.enum_values:
       return argument
     elif self.case_sensitive:
-      if argument not in self.enum_values:
+      if argument not in self._enum_values_set:
         raise ValueError('value should be one of <%s>' %
                          '|'.join(self.enum_values))
       else:
         return argument
     else:
-      if argument.upper() not in [value.upper() for value in self.enum_values]:
+      value = self._canonical_values.get(argument.upper())
+      if value is None:
         raise ValueError('value should be one of <%s>' %
                          '|'.join(self.enum_values))
       else:
-        return [value for value in self.enum_values
-                if value.upper() == argument.upper()][0]
+        return value
 
   def flag_type(self):
     return 'string enum'
 
+  def _custom_schema_fields(self):
+    if not self.enum_values:
+      return {}
+    return {'enum_values': list(self.enum_values)}
+
 
 class ListSerializer(ArgumentSerializer):
 
@@ -364,15 +702,19 @@ class CsvListSerializer(ArgumentSerializer):
 
   def serialize(self, value):
     """Serialize a list as a string, if possible, or as a unicode string."""
-    if six.PY2:
+    items = [six.text_type(x) for x in value]
+    if not _needs_csv_quoting(items):
+      # Fast path: csv.writer would not quote any item.
+      serialized_value = ','.join(items).strip()
+    elif six.PY2:
       # In Python2 csv.writer doesn't accept unicode, so we convert to UTF-8.
       output = io.BytesIO()
-      csv.writer(output).writerow([unicode(x).encode('utf-8') for x in value])
+      csv.writer(output).writerow([x.encode('utf-8') for x in items])
       serialized_value = output.getvalue().decode('utf-8').strip()
     else:
       # In Python3 csv.writer expects a text stream.
       output = io.StringIO()
-      csv.writer(output).writerow([str(x) for x in value])
+      csv.writer(output).writerow(items)
       serialized_value = output.getvalue().strip()
 
     # We need the returned value to be pure ascii or Unicodes so that
@@ -380,6 +722,15 @@ class CsvListSerializer(ArgumentSerializer):
     return _helpers.StrOrUnicode(serialized_value)
 
 
+def _needs_csv_quoting(items):
+  """Returns whether csv.writer would quote some of the strings in items."""
+  if len(items) == 1 and not items[0]:
+    # A row with a single empty field is written as "".
+    return True
+  joined = ''.join(items)
+  return any(char in joined for char in _CSV_SERIALIZE_SPECIAL_CHARS)
+
+
 class BaseListParser(ArgumentParser):
   """Base class for a parser of lists of strings.
 
@@ -409,6 +760,15 @@ class BaseListParser(ArgumentParser):
   def flag_type(self):
     return '%s separated list of strings' % self._name
 
+  def _list_separators(self):
+    """Returns the characters separating the items, for the help outputs."""
+    if self._token is None:
+      return sorted(string.whitespace)
+    return [self._token]
+
+  def _custom_schema_fields(self):
+    return {'list_separators': self._list_separators()}
+
 
 class ListParser(BaseListParser):
   """Parser for a comma-separated list of strings."""
@@ -422,6 +782,9 @@ class ListParser(BaseListParser):
       return argument
     elif not argument:
       return []
+    elif not any(char in argument for char in _CSV_PARSE_SPECIAL_CHARS):
+      # Fast path: without quotes and line breaks, csv.reader only splits.
+      return [s.strip() for s in argument.split(',')]
     else:
       try:
         return [s.strip() for s in list(csv.reader([argument], strict=True))[0]]
@@ -436,8 +799,9 @@ class ListParser(BaseListParser):
 
   def _custom_xml_dom_elements(self, doc):
     elements = super(ListParser, self)._custom_xml_dom_elements(doc)
-    elements.append(_helpers.CreateXMLDOMElement(
-        doc, 'list_separator', repr(',')))
+    for sep_char in self._list_separators():
+      elements.append(_helpers.CreateXMLDOMElement(
+          doc, 'list_separator', repr(sep_char)))
     return elements
 
 
@@ -467,14 +831,250 @@ class WhitespaceSeparatedListParser(BaseListParser):
         argument = argument.replace(',', ' ')
       return argument.split()
 
-  def _custom_xml_dom_elements(self, doc):
-    elements = super(WhitespaceSeparatedListParser, self
-                    )._custom_xml_dom_elements(doc)
+  def _list_separators(self):
     separators = list(string.whitespace)
     if self._comma_compat:
       separators.append(',')
     separators.sort()
-    for sep_char in separators:
+    return separators
+
+  def _custom_xml_dom_elements(self, doc):
+    elements = super(WhitespaceSeparatedListParser, self
+                    )._custom_xml_dom_elements(doc)
+    for sep_char in self._list_separators():
       elements.append(_helpers.CreateXMLDOMElement(
           doc, 'list_separator', repr(sep_char)))
     return elements
+
+
+def _integer_type_code():
+  """Returns the array typecode of the largest native signed integer."""
+  try:
+    array.array('q')
+    return 'q'
+  except ValueError:  # No long long support in Python 2 arrays.
+    return 'l'
+
+
+# Separators of the items of numeric lists: commas and/or whitespace.
+_NUMERIC_LIST_SEPARATORS_REGEX = re.compile(r'\s*,\s*|\s+')
+
+
+class _NumericListParser(BaseListParser):
+  """Base class of the parsers of comma or whitespace separated numbers.
+
+  The parsed values are array.array objects, or NumPy arrays if use_numpy is
+  True.  Subclasses define the array typecode and the parser of the items,
+  which provides the bounds and their help.
+  """
+
+  # Array typecode of the parsed values; set by subclasses.
+  _typecode = None
+  # NumericParser class of the items; set by subclasses.
+  _item_parser_class = None
+  # Fast conversion of the items of textual arguments; set by subclasses.
+  _convert_text = None
+
+  def __init__(self, lower_bound=None, upper_bound=None, use_numpy=False):
+    super(_NumericListParser, self).__init__(None, 'comma or whitespace')
+    self.lower_bound = lower_bound
+    self.upper_bound = upper_bound
+    self.use_numpy = use_numpy
+    self.item_parser = self._item_parser_class(lower_bound, upper_bound)
+    self._numpy = None
+    if use_numpy:
+      import numpy  # pylint: disable=g-import-not-at-top
+      self._numpy = numpy
+    self.syntactic_help = 'a %s separated list of %ss' % (
+        self._name, self.item_parser.number_name)
+    if lower_bound is not None or upper_bound is not None:
+      self.syntactic_help += ', each %s' % self.item_parser.syntactic_help
+
+  def parse(self, argument):
+    values = None
+    if isinstance(argument, six.string_types):
+      words = argument.split()
+      if len(words) == 1:
+        # Fast path: without whitespace, the items are only comma separated.
+        items = words[0].split(',')
+      else:
+        items = _NUMERIC_LIST_SEPARATORS_REGEX.split(' '.join(words))
+        if items == ['']:
+          items = []
+      try:
+        # Arrays are much faster to build from lists than from iterators.
+        values = array.array(self._typecode,
+                             list(map(self._convert_text, items)))
+      except (TypeError, ValueError, OverflowError):
+        # E.g. hexadecimal or too large items, converted one by one below.
+        pass
+    else:
+      items = argument
+    if values is None:
+      values = array.array(self._typecode, [
+          self._convert_item(item) for item in items])
+    if values and (self.lower_bound is not None or
+                   self.upper_bound is not None):
+      # Bounds are checked over the whole array at once.
+      smallest, largest = min(values), max(values)
+      if self.lower_bound is not None and smallest < self.lower_bound:
+        raise ValueError('%s is not %s' % (smallest,
+                                           self.item_parser.syntactic_help))
+      if self.upper_bound is not None and largest > self.upper_bound:
+        raise ValueError('%s is not %s' % (largest,
+                                           self.item_parser.syntactic_help))
+    if self._numpy is not None:
+      return self._numpy.array(values)
+    return values
+
+  def _convert_item(self, item):
+    """Returns the value of an item, which must fit in the array."""
+    try:
+      value = self.item_parser.convert(item)
+    except (TypeError, ValueError, OverflowError):
+      raise ValueError('%r is not %s %s' % (
+          item, self.item_parser.number_article, self.item_parser.number_name))
+    try:
+      array.array(self._typecode, [value])
+    except OverflowError:
+      raise ValueError('%r is out of the range of %d-bit %ss' % (
+          item, array.array(self._typecode).itemsize * 8,
+          self.item_parser.number_name))
+    return value
+
+  def flag_type(self):
+    return '%s separated list of %ss' % (self._name,
+                                         self.item_parser.number_name)
+
+  def _list_separators(self):
+    return sorted(list(string.whitespace) + [','])
+
+  def _custom_xml_dom_elements(self, doc):
+    elements = super(_NumericListParser, self)._custom_xml_dom_elements(doc)
+    for sep_char in self._list_separators():
+      elements.append(_helpers.CreateXMLDOMElement(
+          doc, 'list_separator', repr(sep_char)))
+    elements.extend(
+        self.item_parser._custom_xml_dom_elements(doc))  # pylint: disable=protected-access
+    return elements
+
+  def _custom_schema_fields(self):
+    fields = super(_NumericListParser, self)._custom_schema_fields()
+    fields.update(
+        self.item_parser._custom_schema_fields())  # pylint: disable=protected-access
+    return fields
+
+
+class IntegerListParser(_NumericListParser):
+  """Parser of lists of integers, e.g. '1,2,3' or '1 2 3'.
+
+  The parsed values are arrays of (64 bits when possible) signed integers.
+  """
+
+  _typecode = _integer_type_code()
+  _item_parser_class = IntegerParser
+  _convert_text = int
+
+
+class FloatListParser(_NumericListParser):
+  """Parser of lists of floats, e.g. '0.5,1.5' or '0.5 1.5'.
+
+  The parsed values are arrays of double precision floats.
+  """
+
+  _typecode = 'd'
+  _item_parser_class = FloatParser
+  _convert_text = float
+
+
+class _FrozenJsonObject(collections_abc.Mapping):
+  """Immutable and hashable mapping holding a decoded JSON object."""
+
+  def __init__(self, items):
+    self._dict = dict(items)
+    self._hash = None
+
+  def __getitem__(self, key):
+    return self._dict[key]
+
+  def __iter__(self):
+    return iter(self._dict)
+
+  def __len__(self):
+    return len(self._dict)
+
+  def __hash__(self):
+    if self._hash is None:
+      self._hash = hash(frozenset(six.iteritems(self._dict)))
+    return self._hash
+
+  def __repr__(self):
+    return repr(self._dict)
+
+
+def _freeze_json(value):
+  """Returns value with dicts made immutable Mappings and lists tuples."""
+  if isinstance(value, collections_abc.Mapping):
+    return _FrozenJsonObject((key, _freeze_json(item))
+                             for key, item in six.iteritems(value))
+  if isinstance(value, (list, tuple)):
+    return tuple(_freeze_json(item) for item in value)
+  return value
+
+
+def _encode_frozen_json(value):
+  """json.dumps default hook for the Mappings made by _freeze_json."""
+  if isinstance(value, collections_abc.Mapping):
+    return dict(value)
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+
+class JsonParser(ArgumentParser):
+  """Parser of JSON values, e.g. '{"hosts": ["a", "b"], "port": 80}'.
+
+  An argument starting with '@' is the path of a file containing the JSON
+  text.  The parsed values are immutable: JSON objects are read-only
+  Mappings and arrays are tuples, so that a value can be shared by all the
+  flags and parses that decode the same text.  Decoding is cached per JSON
+  text; files are read again at every parse, but their content is only
+  decoded again if it changed.
+  """
+
+  syntactic_help = 'a JSON value, or @ followed by the path of a JSON file'
+
+  def __init__(self, max_cache_size=_DEFAULT_PARSE_CACHE_SIZE):
+    super(JsonParser, self).__init__()
+    self._decode = _ParseCache(self._decode_uncached, max_cache_size)
+
+  def parse(self, argument):
+    if not isinstance(argument, six.string_types):
+      return _freeze_json(argument)
+    if argument.startswith('@'):
+      path = os.path.expanduser(argument[1:])
+      try:
+        with io.open(path, encoding='utf-8') as json_file:
+          argument = json_file.read()
+      except (IOError, OSError) as e:
+        raise ValueError('cannot read JSON file %s: %s' % (path, e))
+    return self._decode(argument)
+
+  def _decode_uncached(self, text):
+    try:
+      return _freeze_json(json.loads(text))
+    except ValueError as e:
+      raise ValueError('invalid JSON: %s' % e)
+
+  def parse_cache_stats(self):
+    """Returns the ParseCacheStats of the cache of decoded JSON texts."""
+    return self._decode.stats()
+
+  def flag_type(self):
+    return 'json'
+
+
+class JsonSerializer(ArgumentSerializer):
+  """Serializes values as compact JSON, with the keys of objects sorted."""
+
+  def serialize(self, value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'),
+                      default=_encode_frozen_json)
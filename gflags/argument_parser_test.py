@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Unittest for argument_parser module."""
+
+import array
+import os
+import shutil
+import tempfile
+import unittest
+
+import gflags
+from gflags import argument_parser
+
+try:
+  import numpy  # pylint: disable=g-import-not-at-top
+except ImportError:
+  numpy = None
+
+
+class EnumParserTest(unittest.TestCase):
+
+  def testCaseSensitive(self):
+    parser = argument_parser.EnumParser(['apple', 'Banana'])
+    self.assertEqual('Banana', parser.parse('Banana'))
+    self.assertRaises(ValueError, parser.parse, 'banana')
+
+  def testCaseInsensitiveReturnsFirstMatchingValue(self):
+    parser = argument_parser.EnumParser(['apple', 'Banana', 'BANANA'],
+                                        case_sensitive=False)
+    self.assertEqual('Banana', parser.parse('bAnAnA'))
+    self.assertEqual('apple', parser.parse('APPLE'))
+    with self.assertRaises(ValueError) as cm:
+      parser.parse('cherry')
+    self.assertEqual('value should be one of <apple|Banana|BANANA>',
+                     str(cm.exception))
+
+  def testEmptyEnumAcceptsAnything(self):
+    self.assertEqual('x', argument_parser.EnumParser([]).parse('x'))
+    self.assertEqual('x', argument_parser.EnumParser().parse('x'))
+
+  def testMultiEnum(self):
+    fv = gflags.FlagValues()
+    gflags.DEFINE_multi_enum('fruits', None, ['apple', 'banana'], 'help',
+                             case_sensitive=False, flag_values=fv)
+    fv(['program', '--fruits=APPLE', '--fruits=Banana'])
+    self.assertEqual(['apple', 'banana'], fv.fruits)
+
+
+class DurationParserTest(unittest.TestCase):
+
+  def testParse(self):
+    parser = argument_parser.DurationParser()
+    self.assertEqual(0.25, parser.parse('250ms'))
+    self.assertEqual(1.5, parser.parse('1.5s'))
+    self.assertEqual(7200.0, parser.parse('2h'))
+    self.assertEqual(5400.0, parser.parse('1h30m'))
+    self.assertEqual(10.0, parser.parse('10'))
+    self.assertEqual(-3.0, parser.parse('-3s'))
+    self.assertEqual(30.0, parser.parse(30))
+
+  def testParseErrors(self):
+    parser = argument_parser.DurationParser()
+    for argument in ('', 'ms', '1x', '1h30', '1..5s'):
+      self.assertRaises(ValueError, parser.parse, argument)
+
+  def testBounds(self):
+    parser = argument_parser.DurationParser('1s', '1h')
+    self.assertEqual('a duration in the range [1s, 1h]', parser.syntactic_help)
+    with self.assertRaises(ValueError) as cm:
+      parser.parse('2h')
+    self.assertEqual('2h is not a duration in the range [1s, 1h]',
+                     str(cm.exception))
+
+  def testSerialize(self):
+    serializer = argument_parser.DurationSerializer()
+    self.assertEqual('250ms', serializer.serialize(0.25))
+    self.assertEqual('90m', serializer.serialize(5400.0))
+    self.assertEqual('0.1234567891s', serializer.serialize(0.1234567891))
+
+  def testParsedValuesAreCached(self):
+    parser = argument_parser.DurationParser(None, '1d')
+    parser.parse('5m')
+    parser.parse('5m')
+    self.assertEqual(1, parser.parse_cache_stats().hits)
+
+
+class ByteSizeParserTest(unittest.TestCase):
+
+  def testParse(self):
+    parser = argument_parser.ByteSizeParser()
+    self.assertEqual(512, parser.parse('512'))
+    self.assertEqual(65536, parser.parse('64KiB'))
+    self.assertEqual(2**30, parser.parse('1G'))
+    self.assertEqual(2000, parser.parse('2kb'))
+    self.assertEqual(1500000, parser.parse('1.5MB'))
+    self.assertEqual(2**20 + 2**19, parser.parse('1M512K'))
+
+  def testParseErrors(self):
+    parser = argument_parser.ByteSizeParser()
+    for argument in ('1.5B', '1X', 'KiB'):
+      self.assertRaises(ValueError, parser.parse, argument)
+
+  def testSerialize(self):
+    serializer = argument_parser.ByteSizeSerializer()
+    self.assertEqual('64KiB', serializer.serialize(65536))
+    self.assertEqual('1MB', serializer.serialize(10**6))
+    self.assertEqual('1KB', serializer.serialize(1000))
+    self.assertEqual('1001', serializer.serialize(1001))
+    self.assertEqual('0', serializer.serialize(0))
+
+  def testDefineBytes(self):
+    fv = gflags.FlagValues()
+    gflags.DEFINE_bytes('cache_size', '64KiB', 'help', upper_bound='1G',
+                        flag_values=fv)
+    fv(['program', '--cache_size=1M'])
+    self.assertEqual(2**20, fv.cache_size)
+    self.assertEqual('--cache_size=1MiB', fv['cache_size'].serialize())
+    self.assertEqual("'64KiB'", fv['cache_size'].default_as_str)
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      fv, ['program', '--cache_size=2G'])
+
+
+class ParseCacheTest(unittest.TestCase):
+
+  def testCacheIsDisabledByDefault(self):
+    self.assertIsNone(argument_parser.IntegerParser(0, 7).parse_cache_stats())
+
+  def testStatsAndEviction(self):
+    parser = argument_parser.IntegerParser(0, 8)
+    parser.enable_parse_cache(max_size=2)
+    for argument in ('1', '2', '1', '3', '2', '1'):
+      parser.parse(argument)
+    self.assertEqual(argument_parser.ParseCacheStats(
+        hits=1, misses=5, evictions=3, size=2, max_size=2),
+                     parser.parse_cache_stats())
+    self.assertEqual(3, parser.Parse('3'))
+
+  def testErrorsAreNotCached(self):
+    parser = argument_parser.IntegerParser(0, 9)
+    parser.enable_parse_cache()
+    self.assertRaises(ValueError, parser.parse, '10')
+    self.assertRaises(ValueError, parser.parse, '10')
+    self.assertEqual(0, parser.parse_cache_stats().size)
+
+  def testListsAreCopied(self):
+    parser = argument_parser.ListParser()
+    parser.enable_parse_cache()
+    try:
+      parser.parse('a,b').append('c')
+      self.assertEqual(['a', 'b'], parser.parse('a,b'))
+    finally:
+      del parser.parse, parser.Parse
+
+  def testNonStringArgumentsAreNotCached(self):
+    parser = argument_parser.IntegerParser(0, 10)
+    parser.enable_parse_cache()
+    self.assertEqual(5, parser.parse(5))
+    self.assertEqual(0, parser.parse_cache_stats().misses)
+
+
+class ListParserTest(unittest.TestCase):
+
+  def testParseUnquoted(self):
+    parser = argument_parser.ListParser()
+    self.assertEqual(['a', 'b', '', 'c d'], parser.parse(' a, b,, c d '))
+    self.assertEqual([], parser.parse(''))
+
+  def testParseQuoted(self):
+    parser = argument_parser.ListParser()
+    self.assertEqual(['a,b', 'c "d"'], parser.parse('"a,b","c ""d"""'))
+
+  def testParseNewlineRaises(self):
+    parser = argument_parser.ListParser()
+    self.assertRaises(ValueError, parser.parse, 'hello,\nworld')
+
+
+class CsvListSerializerTest(unittest.TestCase):
+
+  def testSerialize(self):
+    serializer = argument_parser.CsvListSerializer(',')
+    self.assertEqual('a,b,1', serializer.serialize(['a', 'b', 1]))
+    self.assertEqual('', serializer.serialize([]))
+    self.assertEqual('""', serializer.serialize(['']))
+    self.assertEqual(',', serializer.serialize(['', '']))
+    self.assertEqual('"a,b","c ""d"""',
+                     serializer.serialize(['a,b', 'c "d"']))
+    self.assertEqual(u'\xe9', serializer.serialize([u'\xe9']))
+
+
+class NumericListParserTest(unittest.TestCase):
+
+  def testParseIntegers(self):
+    parser = argument_parser.IntegerListParser()
+    value = parser.parse(' 1,2, 3\t0x10 ')
+    self.assertIsInstance(value, array.array)
+    self.assertEqual([1, 2, 3, 16], value.tolist())
+    self.assertEqual([], parser.parse('').tolist())
+    self.assertEqual([4, 5], parser.parse([4, 5]).tolist())
+
+  def testParseFloats(self):
+    parser = argument_parser.FloatListParser()
+    value = parser.parse('0.5 1e3,2')
+    self.assertEqual('d', value.typecode)
+    self.assertEqual([0.5, 1000.0, 2.0], value.tolist())
+
+  def testParseErrors(self):
+    parser = argument_parser.IntegerListParser()
+    for argument, message in (('1,x', "'x' is not an integer"),
+                              ('1,,2', "'' is not an integer"),
+                              ('1.5', "'1.5' is not an integer")):
+      with self.assertRaises(ValueError) as cm:
+        parser.parse(argument)
+      self.assertEqual(message, str(cm.exception))
+
+  def testOverflow(self):
+    parser = argument_parser.IntegerListParser()
+    for argument, item in (('1,99999999999999999999999',
+                            "'99999999999999999999999'"),
+                           ([1, 10**30], repr(10**30))):
+      with self.assertRaises(ValueError) as cm:
+        parser.parse(argument)
+      self.assertTrue(str(cm.exception).startswith(
+          item + ' is out of the range of '), cm.exception)
+    fv = gflags.FlagValues()
+    gflags.DEFINE_int_list('ints', '', 'help', flag_values=fv)
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      fv, ['program', '--ints=99999999999999999999999'])
+
+  def testBounds(self):
+    parser = argument_parser.IntegerListParser(0, 10)
+    self.assertEqual(
+        'a comma or whitespace separated list of integers, each an integer '
+        'in the range [0, 10]', parser.syntactic_help)
+    with self.assertRaises(ValueError) as cm:
+      parser.parse('3 11 -1')
+    self.assertEqual('-1 is not an integer in the range [0, 10]',
+                     str(cm.exception))
+
+  def testDefineIntList(self):
+    fv = gflags.FlagValues()
+    gflags.DEFINE_int_list('sizes', '1,2', 'help', lower_bound=0,
+                           flag_values=fv)
+    fv(['program', '--sizes=3 4'])
+    self.assertEqual([3, 4], fv.sizes.tolist())
+    self.assertEqual('--sizes=3,4', fv['sizes'].serialize())
+    self.assertEqual("'1,2'", fv['sizes'].default_as_str)
+    self.assertRaises(gflags.IllegalFlagValueError, setattr, fv, 'sizes',
+                      array.array('l', [-1]))
+
+  @unittest.skipIf(numpy is None, 'NumPy is not installed')
+  def testNumpy(self):
+    fv = gflags.FlagValues()
+    gflags.DEFINE_float_list('weights', [0.5], 'help', use_numpy=True,
+                             flag_values=fv)
+    fv(['program', '--weights=1,2'])
+    self.assertIsInstance(fv.weights, numpy.ndarray)
+    self.assertEqual([1.0, 2.0], fv.weights.tolist())
+
+
+class JsonParserTest(unittest.TestCase):
+
+  def setUp(self):
+    self.parser = gflags.JsonParser()
+
+  def testValuesAreImmutable(self):
+    value = self.parser.parse('{"a": [1, {"b": null}], "c": "x"}')
+    self.assertEqual({'a': (1, {'b': None}), 'c': 'x'}, value)
+    with self.assertRaises(TypeError):
+      value['c'] = 'y'
+    self.assertIsInstance(value['a'], tuple)
+    self.assertEqual(hash(value), hash(self.parser.parse({'c': 'x', 'a': [
+        1, {'b': None}]})))
+
+  def testDecodingIsCachedPerText(self):
+    first = self.parser.parse('[1, 2]')
+    self.assertIs(first, self.parser.parse('[1, 2]'))
+    stats = self.parser.parse_cache_stats()
+    self.assertEqual((1, 1), (stats.hits, stats.misses))
+
+  def testFile(self):
+    directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, directory)
+    path = os.path.join(directory, 'config.json')
+    for content in ('{"a": 1}', '{"a": 2}'):
+      with open(path, 'w') as json_file:
+        json_file.write(content)
+      self.assertEqual({'a': int(content[-2])},
+                       self.parser.parse('@' + path))
+    with self.assertRaises(ValueError) as cm:
+      self.parser.parse('@' + os.path.join(directory, 'missing.json'))
+    self.assertIn('cannot read JSON file', str(cm.exception))
+
+  def testInvalidJson(self):
+    with self.assertRaises(ValueError) as cm:
+      self.parser.parse('{"a": }')
+    self.assertIn('invalid JSON', str(cm.exception))
+
+  def testFlagRoundTripsThroughFlagsIntoString(self):
+    fv = gflags.FlagValues()
+    gflags.DEFINE_json('config', {'b': [1, 2], 'a': 'x y'}, 'help',
+                       flag_values=fv)
+    fv(['program'])
+    self.assertEqual('--config={"a":"x y","b":[1,2]}\n', fv.FlagsIntoString())
+    other = gflags.FlagValues()
+    gflags.DEFINE_json('config', None, 'help', flag_values=other)
+    other(['program', fv.FlagsIntoString().strip()])
+    self.assertEqual(fv.config, other.config)
+
+
+if __name__ == '__main__':
+  unittest.main()
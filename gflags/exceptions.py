@@ -131,3 +131,17 @@ class UnparsedFlagAccessError(Error):
 
 class ValidationError(Error):
   """Raised if flag validator constraint is not satisfied."""
+
+
+class AggregateFlagsError(Error):
+  """Raised to report all the errors found while parsing flags at once.
+
+  Attributes:
+    errors: List of the individual Error instances, in the order they were
+      found: illegal flag values, then unknown flags, then failed validators.
+  """
+
+  def __init__(self, errors):
+    self.errors = list(errors)
+    Error.__init__(self, '%d flag errors:\n  %s' % (
+        len(self.errors), '\n  '.join(str(e) for e in self.errors)))
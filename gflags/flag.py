@@ -42,6 +42,18 @@ from gflags import argument_parser
 from gflags import exceptions
 
 
+# Callables that are invoked with a Flag object right before the flag's value
+# or parsing state changes.  Used by gflags.flagsaver to save only the flags
+# that actually change.  Do not use it outside the gflags package.
+_change_observers = []
+
+# Callables that are invoked with a Flag object right after its value was
+# assigned directly, i.e. not by its parser: the constraints enforced by the
+# parser may not hold for the value.  Used by gflags.flagvalues to verify all
+# the validators of the flag again.  Do not use it outside the gflags package.
+_assignment_observers = []
+
+
 class _FlagMetaClass(type):
 
   def __new__(mcs, name, bases, dct):
@@ -57,6 +69,19 @@ class _FlagMetaClass(type):
     return type.__new__(mcs, name, bases, dct)
 
 
+def _EvaluateHelp(help_string):
+  """Returns the string of a help given as a string, callable or object."""
+  if isinstance(help_string, six.string_types):
+    return help_string
+  if callable(help_string):
+    help_string = help_string()
+  if help_string is None:
+    return '(no help available)'
+  if not isinstance(help_string, six.string_types):
+    help_string = str(help_string)
+  return help_string or '(no help available)'
+
+
 @total_ordering
 class Flag(six.with_metaclass(_FlagMetaClass, object)):
   """Information about a command-line flag.
@@ -66,7 +91,10 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
     .default - the default value for this flag;
     .default_as_str - default value as repr'd string, e.g., "'true'" (or None);
     .value - the most recent parsed value of this flag; set by Parse();
-    .help - a help string or None if no help is available;
+    .help - a help string or None if no help is available; it may be given
+            as a callable returning the help string (or as any object
+            converted with str()), which is only evaluated, once, when the
+            help is first read, e.g. to render help, XML or man output;
     .short_name - the single letter alias for this flag (or None);
     .boolean - if 'true', this flag does not accept arguments;
     .present - true if this flag was parsed from command line flags;
@@ -106,10 +134,6 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
                allow_cpp_override=False, allow_hide_cpp=False,
                allow_overwrite=True, parse_default=True):
     self.name = name
-
-    if not help_string:
-      help_string = '(no help available)'
-
     self.help = help_string
     self.short_name = short_name
     self.boolean = boolean
@@ -123,7 +147,6 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
 
     self.using_default_value = True
     self._value = None
-    self.validators = []
     if allow_hide_cpp and allow_cpp_override:
       raise exceptions.Error(
           "Can't have both allow_hide_cpp (means use Python flag) and "
@@ -133,6 +156,33 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
       self._set_default(default)
     else:
       self.default = default
+    # Assigned last: change observers skip flags without validators, since
+    # there is nothing to save while a flag is being constructed.
+    self.validators = []
+
+  @property
+  def help(self):
+    help_string = self._help
+    if not isinstance(help_string, six.string_types):
+      # Deferred help: evaluated once, at first use.
+      help_string = _EvaluateHelp(help_string)
+      self._help = help_string
+    return help_string
+
+  @help.setter
+  def help(self, help_string):
+    if not help_string:
+      help_string = '(no help available)'
+    self._help = help_string
+
+  def _defer_help(self, transform):
+    """Makes the help transform(help), evaluated when the help is first read.
+
+    Args:
+      transform: function taking the help string and returning the new one.
+    """
+    help_string = self._help
+    self._help = lambda: transform(_EvaluateHelp(help_string))
 
   @property
   def value(self):
@@ -140,7 +190,16 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
 
   @value.setter
   def value(self, value):
+    if _change_observers:
+      self._notify_change()
     self._value = value
+    for observer in _assignment_observers:
+      observer(self)
+
+  def _notify_change(self):
+    """Notifies the change observers that this flag is about to change."""
+    for observer in list(_change_observers):
+      observer(self)
 
   def __hash__(self):
     return hash(id(self))
@@ -176,16 +235,20 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
       raise exceptions.IllegalFlagValueError(
           'flag --%s=%s: already defined as %s' % (
               self.name, argument, self.value))
+    if _change_observers:
+      self._notify_change()
     try:
-      self.value = self.parser.parse(argument)
+      self._value = self.parser.parse(argument)
     except ValueError as e:  # Recast ValueError as IllegalFlagValueError.
       raise exceptions.IllegalFlagValueError(
           'flag --%s=%s: %s' % (self.name, argument, e))
     self.present += 1
 
   def unparse(self):
+    if _change_observers:
+      self._notify_change()
     if self.default is None:
-      self.value = None
+      self._value = None
     else:
       self.present = 0
       self.Parse(self.default)
@@ -193,10 +256,14 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
     self.present = 0
 
   def serialize(self):
-    if self.value is None:
+    return self._serialize(self.value)
+
+  def _serialize(self, value):
+    """Returns the command-line argument that sets this flag to value."""
+    if value is None:
       return ''
     if self.boolean:
-      if self.value:
+      if value:
         return '--%s' % self.name
       else:
         return '--no%s' % self.name
@@ -204,7 +271,7 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
       if not self.serializer:
         raise exceptions.Error(
             'Serializer not present for flag %s' % self.name)
-      return '--%s=%s' % (self.name, self.serializer.serialize(self.value))
+      return '--%s=%s' % (self.name, self.serializer.serialize(value))
 
   def _set_default(self, value):
     """Changes the default value (and current value too) for this Flag."""
@@ -216,6 +283,8 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
     if value is None and self.allow_override:
       raise exceptions.DuplicateFlagCannotPropagateNoneToSwig(self.name)
 
+    if _change_observers:
+      self._notify_change()
     self.default = value
     self.unparse()
     self.default_as_str = self._get_parsed_value_as_string(self.value)
@@ -250,17 +319,54 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
       A minidom.Element instance.
     """
     element = doc.createElement('flag')
+    for name, value in self._xml_element_values(module_name, is_key):
+      element.appendChild(_helpers.CreateXMLDOMElement(doc, name, value))
+    # Adds extra flag features this flag may have.
+    for e in self._extra_xml_dom_elements(doc):
+      element.appendChild(e)
+    return element
+
+  def _write_xml(self, writer, doc, module_name, is_key=False, indent='  '):
+    """Writes the XML element of this flag, pretty printed.
+
+    The output is identical to the one of the element returned by
+    _create_xml_dom_element when it is pretty printed by minidom, but only
+    the elements returned by _extra_xml_dom_elements are built as DOM nodes.
+
+    Args:
+      writer: An object with a write method accepting unicode strings.
+      doc: A minidom.Document, the DOM document it should create the extra
+        nodes from.
+      module_name: A string, the name of the module that defines this flag.
+      is_key: A boolean, True iff this flag is key for main module.
+      indent: A string, the indentation of the flag element.
+    """
+    if (six.get_unbound_function(type(self)._create_xml_dom_element) is not
+        six.get_unbound_function(Flag._create_xml_dom_element)):
+      # Honor the overridden method, even if it should not be.
+      self._create_xml_dom_element(doc, module_name, is_key=is_key).writexml(
+          writer, indent, '  ', '\n')
+      return
+    child_indent = indent + '  '
+    writer.write(u'%s<flag>\n' % indent)
+    for name, value in self._xml_element_values(module_name, is_key):
+      _helpers.WriteXMLElement(writer, name, value, child_indent)
+    for e in self._extra_xml_dom_elements(doc):
+      e.writexml(writer, child_indent, '  ', '\n')
+    writer.write(u'%s</flag>\n' % indent)
+
+  def _xml_element_values(self, module_name, is_key):
+    """Returns the (tag, value) pairs of the elements common to all flags."""
+    values = []
     if is_key:
-      element.appendChild(_helpers.CreateXMLDOMElement(doc, 'key', 'yes'))
-    element.appendChild(_helpers.CreateXMLDOMElement(doc, 'file', module_name))
+      values.append(('key', 'yes'))
+    values.append(('file', module_name))
     # Adds flag features that are relevant for all flags.
-    element.appendChild(_helpers.CreateXMLDOMElement(doc, 'name', self.name))
+    values.append(('name', self.name))
     if self.short_name:
-      element.appendChild(_helpers.CreateXMLDOMElement(
-          doc, 'short_name', self.short_name))
+      values.append(('short_name', self.short_name))
     if self.help:
-      element.appendChild(_helpers.CreateXMLDOMElement(
-          doc, 'meaning', self.help))
+      values.append(('meaning', self.help))
     # The default flag value can either be represented as a string like on the
     # command line, or as a Python object.  We serialize this value in the
     # latter case in order to remain consistent.
@@ -271,16 +377,44 @@ class Flag(six.with_metaclass(_FlagMetaClass, object)):
         default_serialized = ''
     else:
       default_serialized = self.default
-    element.appendChild(_helpers.CreateXMLDOMElement(
-        doc, 'default', default_serialized))
-    element.appendChild(_helpers.CreateXMLDOMElement(
-        doc, 'current', self.value))
-    element.appendChild(_helpers.CreateXMLDOMElement(
-        doc, 'type', self.flag_type()))
-    # Adds extra flag features this flag may have.
-    for e in self._extra_xml_dom_elements(doc):
-      element.appendChild(e)
-    return element
+    values.append(('default', default_serialized))
+    values.append(('current', self.value))
+    values.append(('type', self.flag_type()))
+    return values
+
+  def _parsed_default(self):
+    """Returns the default value, parsed if it is given as a string."""
+    if not isinstance(self.default, six.string_types):
+      return self.default
+    try:
+      return self.parser.parse(self.default)
+    except ValueError:
+      return self.default
+
+  def _schema_fields(self, module_name, is_key):
+    """Returns the fields of the JSON schema of this flag.
+
+    The current value is not included: it is not part of the flag
+    definition.
+
+    Args:
+      module_name: A string, the name of the module that defines this flag.
+      is_key: A boolean, True iff this flag is key for main module.
+
+    Returns:
+      A dictionary, field name -> value.
+    """
+    fields = {
+        'name': self.name,
+        'short_name': self.short_name,
+        'type': self.flag_type(),
+        'help': self.help,
+        'default': self._parsed_default(),
+        'module': module_name,
+        'key': is_key,
+    }
+    fields.update(self.parser._custom_schema_fields())  # pylint: disable=protected-access
+    return fields
 
   def _extra_xml_dom_elements(self, doc):
     """Returns extra info about this flag in XML.
@@ -325,7 +459,8 @@ class EnumFlag(Flag):
     p = argument_parser.EnumParser(enum_values, case_sensitive)
     g = argument_parser.ArgumentSerializer()
     Flag.__init__(self, p, g, name, default, help, short_name, **args)
-    self.help = '<%s>: %s' % ('|'.join(enum_values), self.help)
+    self._defer_help(
+        lambda help_string: '<%s>: %s' % ('|'.join(enum_values), help_string))
 
   def _extra_xml_dom_elements(self, doc):
     elements = []
@@ -354,7 +489,8 @@ class MultiFlag(Flag):
 
   def __init__(self, *args, **kwargs):
     Flag.__init__(self, *args, **kwargs)
-    self.help += ';\n    repeat this option to specify a list of values'
+    self._defer_help(lambda help_string: (
+        help_string + ';\n    repeat this option to specify a list of values'))
 
   def parse(self, arguments):
     """Parses one or more arguments with the installed parser.
@@ -370,20 +506,47 @@ class MultiFlag(Flag):
       # processing simpler below.
       arguments = [arguments]
 
+    if not self.allow_overwrite and self.present + len(arguments) > 1:
+      # Same error as Flag.Parse would raise for the second value.
+      if self.present:
+        argument, value = arguments[0], self.value
+      else:
+        argument, value = arguments[1], self._ParseItem(arguments[0])
+      raise exceptions.IllegalFlagValueError(
+          'flag --%s=%s: already defined as %s' % (self.name, argument, value))
+
+    # Parse all items into a separate list first: self.value is then
+    # changed once, and not at all if one of the items is invalid.
+    new_values = [self._ParseItem(item) for item in arguments]
+
+    if _change_observers:
+      self._notify_change()
     if self.present:
-      # keep a backup reference to list of previously supplied option values
-      values = self.value
+      # Extend the list of previously supplied option values in place.
+      self._value.extend(new_values)
     else:
-      # "erase" the defaults with an empty list
-      values = []
+      # "erase" the defaults with the new list
+      self._value = new_values
+    self.present += len(new_values)
 
-    for item in arguments:
-      # have Flag superclass parse argument, overwriting self.value reference
-      Flag.Parse(self, item)  # also increments self.present
-      values.append(self.value)
+  def _parsed_default(self):
+    if self.default is None:
+      return None
+    defaults = self.default
+    if not isinstance(defaults, list):
+      defaults = [defaults]
+    try:
+      return [self.parser.parse(item) for item in defaults]
+    except ValueError:
+      return self.default
 
-    # put list of option values back in the 'value' attribute
-    self.value = values
+  def _ParseItem(self, argument):
+    """Returns the parsed value of a single argument."""
+    try:
+      return self.parser.parse(argument)
+    except ValueError as e:  # Recast ValueError as IllegalFlagValueError.
+      raise exceptions.IllegalFlagValueError(
+          'flag --%s=%s: %s' % (self.name, argument, e))
 
   def serialize(self):
     if not self.serializer:
@@ -391,18 +554,8 @@ class MultiFlag(Flag):
           'Serializer not present for flag %s' % self.name)
     if self.value is None:
       return ''
-
-    s = ''
-
-    multi_value = self.value
-
-    for self.value in multi_value:
-      if s: s += ' '
-      s += Flag.serialize(self)
-
-    self.value = multi_value
-
-    return s
+    return ' '.join(self._serialize(value) for value in self.value
+                    if value is not None)
 
   def flag_type(self):
     return 'multi ' + self.parser.flag_type()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Unittest for flag module."""
+
+import unittest
+
+import gflags
+from gflags import flagsaver
+
+
+class MultiFlagTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_multi_integer('input', [1, 2], 'help', flag_values=self.fv)
+
+  def testDefault(self):
+    self.fv(['program'])
+    self.assertEqual([1, 2], self.fv.input)
+    self.assertEqual(0, self.fv['input'].present)
+
+  def testRepeatedArgumentsReplaceTheDefault(self):
+    self.fv(['program', '--input=3', '--input=4', '--input', '5'])
+    self.assertEqual([3, 4, 5], self.fv.input)
+    self.assertEqual(3, self.fv['input'].present)
+
+  def testParseList(self):
+    flag = self.fv['input']
+    flag.parse(['3', '4'])
+    flag.parse('5')
+    self.assertEqual([3, 4, 5], flag.value)
+    self.assertEqual(3, flag.present)
+
+  def testInvalidItemLeavesValueUnchanged(self):
+    flag = self.fv['input']
+    flag.parse('3')
+    with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+      flag.parse(['4', 'x'])
+    self.assertIn('--input=x', str(cm.exception))
+    self.assertEqual([3], flag.value)
+    self.assertEqual(1, flag.present)
+
+  def testNoOverwrite(self):
+    gflags.DEFINE_multi_string('once', None, 'help', allow_overwrite=False,
+                               flag_values=self.fv)
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv,
+                      ['program', '--once=a', '--once=b'])
+
+  def testSerialize(self):
+    self.fv(['program', '--input=3', '--input=4'])
+    self.assertEqual('--input=3 --input=4', self.fv['input'].serialize())
+    self.assertEqual([3, 4], self.fv.input)
+
+  def testFlagSaverRestoresAccumulatedValues(self):
+    self.fv(['program', '--input=3'])
+    with flagsaver.flagsaver():
+      self.fv(['program', '--input=4'])
+      self.assertEqual([3, 4], self.fv.input)
+    self.assertEqual([3], self.fv.input)
+
+class DeferredHelpTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    self.calls = []
+
+  def _Help(self, text):
+
+    def Help():
+      self.calls.append(text)
+      return text
+
+    return Help
+
+  def testCallableIsEvaluatedOnceWhenRead(self):
+    gflags.DEFINE_string('name', 'x', self._Help('Name.'), flag_values=self.fv)
+    self.fv(['program'])
+    self.assertEqual([], self.calls)
+    self.assertEqual('Name.', self.fv['name'].help)
+    self.assertEqual('Name.', self.fv['name'].help)
+    self.assertEqual(['Name.'], self.calls)
+
+  def testEnumAndMultiFlags(self):
+    gflags.DEFINE_enum('mode', 'a', ['a', 'b'], self._Help('Mode.'),
+                       flag_values=self.fv)
+    gflags.DEFINE_multi_string('input', None, 'Inputs.', flag_values=self.fv)
+    self.assertEqual([], self.calls)
+    self.assertEqual('<a|b>: Mode.', self.fv['mode'].help)
+    self.assertEqual(
+        'Inputs.;\n    repeat this option to specify a list of values',
+        self.fv['input'].help)
+
+  def testRenderedHelp(self):
+    gflags.DEFINE_integer('count', 1, self._Help('Count.'), flag_values=self.fv)
+    self.assertIn('--count: Count.', self.fv.GetHelp())
+
+  def testEmptyHelp(self):
+    gflags.DEFINE_string('name', 'x', lambda: '', flag_values=self.fv)
+    gflags.DEFINE_string('other', 'x', lambda: None, flag_values=self.fv)
+    self.assertEqual('(no help available)', self.fv['name'].help)
+    self.assertEqual('(no help available)', self.fv['other'].help)
+    self.assertIn('--other: (no help available)', self.fv.GetHelp())
+
+  def testLazyObject(self):
+
+    class LazyText(object):
+
+      def __str__(self):
+        return 'Lazy.'
+
+    gflags.DEFINE_string('name', 'x', LazyText(), flag_values=self.fv)
+    self.assertEqual('Lazy.', self.fv['name'].help)
+
+  def testAssignment(self):
+    gflags.DEFINE_string('name', 'x', 'Name.', flag_values=self.fv)
+    self.fv['name'].help = self._Help('Other.')
+    self.assertEqual('Other.', self.fv['name'].help)
+
+
+if __name__ == '__main__':
+  unittest.main()
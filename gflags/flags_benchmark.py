@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Micro benchmarks for the gflags package.
+
+Usage:
+  python -m gflags.flags_benchmark [benchmark_name ...]
+
+Without arguments, all benchmarks are run.  Each benchmark prints the best
+wall time out of a few repetitions for every variant it measures.
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from xml.dom import minidom
+
+import six
+
+import gflags
+from gflags import flagsaver
+from gflags import registry_diff
+
+
+_REPEAT = 3
+
+_HOST_REGEX = re.compile(r'[a-z][a-z0-9.-]*$')
+
+
+def _Report(benchmark_name, variant, seconds, number):
+  sys.stdout.write('%-32s %-36s %10.3f ms\n' % (
+      benchmark_name, variant, seconds * 1000.0 / number))
+
+
+def _Time(benchmark_name, variant, func, number=1):
+  seconds = min(timeit.repeat(func, repeat=_REPEAT, number=number))
+  _Report(benchmark_name, variant, seconds, number)
+
+
+def _DefineIntegerFlags(fv, count, prefix='flag'):
+  for i in range(count):
+    gflags.DEFINE_integer('%s%d' % (prefix, i), i, 'Help for flag %d.' % i,
+                          flag_values=fv)
+
+
+def BenchmarkEnumParser():
+  """Parsing the values of a 500-element enum."""
+  enum_values = ['value_%03d' % i for i in range(500)]
+  arguments = [value.upper() for value in enum_values[::10]]
+  for case_sensitive in (True, False):
+    parser = gflags.EnumParser(enum_values, case_sensitive)
+    args = enum_values[::10] if case_sensitive else arguments
+    _Time('enum_parser', 'case_sensitive=%s' % case_sensitive,
+          lambda: [parser.parse(arg) for arg in args], number=1000)
+
+
+def BenchmarkFlagSaver():
+  """Saving and restoring a 30k flag registry around a small change."""
+  fv = gflags.FlagValues()
+  _DefineIntegerFlags(fv, 30000)
+  fv.MarkAsParsed()
+  flag_dict = fv.FlagDict()
+
+  def SaveAndRestoreEveryFlag():
+    saved = dict((name, (flag.value, flag.present, flag.using_default_value))
+                 for name, flag in flag_dict.items())
+    fv.flag7 = 8
+    for name, (value, present, using_default_value) in saved.items():
+      flag = flag_dict[name]
+      flag.value = value
+      flag.present = present
+      flag.using_default_value = using_default_value
+
+  def SaveAndRestoreChangedFlags():
+    with flagsaver.flagsaver():
+      fv.flag7 = 8
+
+  _Time('flagsaver', 'snapshot every flag', SaveAndRestoreEveryFlag,
+        number=10)
+  _Time('flagsaver', 'flagsaver.flagsaver()', SaveAndRestoreChangedFlags,
+        number=1000)
+
+
+def BenchmarkRegistryDiff():
+  """Diffing the JSON schema and XML files of two 20k flag registries."""
+  tmpdir = tempfile.mkdtemp()
+  try:
+    paths = {}
+    for version in ('old', 'new'):
+      fv = gflags.FlagValues()
+      for i in range(20000):
+        default = i + 1 if version == 'new' and i % 100 == 0 else i
+        gflags.DEFINE_integer('flag%d' % i, default, 'Help for flag %d.' % i,
+                              flag_values=fv, module_name='module%d' % (i % 50))
+      for extension, write_method in (('json', fv.write_schema_json),
+                                      ('xml', fv.WriteHelpInXMLFormat)):
+        path = os.path.join(tmpdir, '%s.%s' % (version, extension))
+        with open(path, 'w') as registry_file:
+          write_method(registry_file)
+        paths[version, extension] = path
+    for extension in ('json', 'xml'):
+      _Time('registry_diff', extension,
+            lambda: registry_diff.diff_registries(
+                paths['old', extension], paths['new', extension]), number=1)
+  finally:
+    shutil.rmtree(tmpdir)
+
+
+def BenchmarkValidation():
+  """Re-parsing one flag of a registry with 10k validators."""
+  fv = gflags.FlagValues()
+  _DefineIntegerFlags(fv, 10000)
+  for i in range(10000):
+    gflags.register_validator('flag%d' % i, lambda value: value >= 0,
+                              flag_values=fv)
+  argv = ['program', '--flag42=7']
+  fv(argv)
+
+  def ParseAndValidateAll():
+    fv(argv)
+    fv.validate_all()
+
+  _Time('validation', 'parse + validate_all()', ParseAndValidateAll,
+        number=10)
+  _Time('validation', 'parse, changed flags only', lambda: fv(argv),
+        number=100)
+
+
+def BenchmarkConstraints():
+  """Parsing and fully validating 5k bounded, required flags, or only
+  validating them."""
+
+  def Closures(fv):
+    # What DEFINE_integer and mark_flag_as_required used to register.
+    for i in range(5000):
+      name = 'flag%d' % i
+      parser = gflags.IntegerParser(0, 5000 + i)
+      gflags.DEFINE(parser, name, None, 'Help.', flag_values=fv,
+                    serializer=gflags.ArgumentSerializer())
+      gflags.register_validator(
+          name, lambda value, p=parser: (
+              value is None or not p.is_outside_bounds(value)),
+          flag_values=fv)
+      gflags.register_validator(name, lambda value: value is not None,
+                                flag_values=fv)
+
+  def Constraints(fv):
+    for i in range(5000):
+      name = 'flag%d' % i
+      gflags.DEFINE_integer(name, None, 'Help.', lower_bound=0,
+                            upper_bound=5000 + i, flag_values=fv)
+      gflags.mark_flag_as_required(name, flag_values=fv)
+
+  for variant, define in (('closure validators', Closures),
+                          ('declarative constraints', Constraints)):
+    fv = gflags.FlagValues()
+    define(fv)
+    argv = ['program'] + ['--flag%d=%d' % (i, i) for i in range(5000)]
+    fv(argv)
+
+    def ParseFromScratch(fv=fv, argv=argv):
+      fv.Reset()
+      fv(argv)
+
+    _Time('constraints', variant, ParseFromScratch, number=10)
+    _Time('constraints', variant + ', validate_all()', fv.validate_all,
+          number=10)
+
+
+def _CheckHostsAndPorts(values):
+  return (len(values['hosts']) == len(values['ports']) and
+          all(_HOST_REGEX.match(host) for host in values['hosts']) and
+          all(0 < int(port) < 65536 for port in values['ports']))
+
+
+def BenchmarkJson():
+  """Decoding a 1k entry JSON config flag."""
+  text = json.dumps(dict(('key%d' % i, {'port': i, 'hosts': ['a', 'b']})
+                         for i in range(1000)))
+  fv = gflags.FlagValues()
+  gflags.DEFINE_json('config', text, 'Config.', flag_values=fv)
+  fv(['program'])
+
+  def ParseFromScratch():
+    fv.Reset()
+    fv(['program'])
+
+  _Time('json', 'json.loads() at every use', lambda: json.loads(text),
+        number=100)
+  _Time('json', 'Reset + parse (cached decoding)', ParseFromScratch,
+        number=100)
+
+
+def BenchmarkLists():
+  """Parsing and serializing a 10k item comma-separated list."""
+  items = ['item%d' % i for i in range(10000)]
+  argument = ','.join(items)
+  quoted_argument = argument + ',"quoted"'
+  parser = gflags.ListParser()
+  serializer = gflags.CsvListSerializer(',')
+  _Time('lists', 'parse unquoted', lambda: parser.parse(argument),
+        number=100)
+  _Time('lists', 'parse quoted (csv)', lambda: parser.parse(quoted_argument),
+        number=100)
+  _Time('lists', 'serialize', lambda: serializer.serialize(items),
+        number=100)
+  numbers = ','.join(str(i) for i in range(10000))
+  _Time('lists', 'ListParser + int()',
+        lambda: [int(item) for item in parser.parse(numbers)], number=100)
+  int_list_parser = gflags.IntegerListParser()
+  _Time('lists', 'IntegerListParser', lambda: int_list_parser.parse(numbers),
+        number=100)
+
+
+def BenchmarkMultiFlags():
+  """Parsing and serializing a multi flag repeated 100k times."""
+  fv = gflags.FlagValues()
+  gflags.DEFINE_multi_string('input', None, 'Inputs.', flag_values=fv)
+  argv = ['program'] + ['--input=file%d' % i for i in range(100000)]
+
+  def ParseFromScratch():
+    fv.Reset()
+    fv(argv)
+
+  _Time('multi_flags', 'parse', ParseFromScratch, number=1)
+  _Time('multi_flags', 'serialize', fv['input'].serialize, number=1)
+
+
+def BenchmarkPureValidators():
+  """Re-validating a multi-flag validator over two unchanged 10k lists."""
+  for pure in (False, True):
+    fv = gflags.FlagValues()
+    gflags.DEFINE_list('hosts', ['host%d' % i for i in range(10000)], 'Hosts.',
+                       flag_values=fv)
+    gflags.DEFINE_list('ports', [str(i + 1) for i in range(10000)], 'Ports.',
+                       flag_values=fv)
+    gflags.register_multi_flags_validator(
+        ['hosts', 'ports'], _CheckHostsAndPorts, pure=pure, flag_values=fv)
+    fv(['program'])
+    _Time('pure_validators', 'pure=%s' % pure, fv.validate_all, number=100)
+
+
+def BenchmarkHelp():
+  """Rendering the help of 5k flags defined by 50 modules."""
+  fv = gflags.FlagValues()
+  for i in range(5000):
+    gflags.DEFINE_integer('flag%d' % i, i, 'Help for flag %d. ' % i * 5,
+                          flag_values=fv, module_name='module%d' % (i % 50))
+
+  def GetHelpFromScratch():
+    fv._InvalidateHelpCaches(fv.FlagDict().values())  # pylint: disable=protected-access
+    fv.GetHelp()
+
+  _Time('help', 'GetHelp(), empty caches', GetHelpFromScratch, number=1)
+  _Time('help', 'repeated GetHelp()', fv.GetHelp, number=10)
+  with open(os.devnull, 'w') as devnull:
+    _Time('help', 'repeated write_help()', lambda: fv.write_help(devnull),
+          number=10)
+
+    def WriteHelpFromScratch():
+      fv._InvalidateHelpCaches(fv.FlagDict().values())  # pylint: disable=protected-access
+      fv.write_help(devnull)
+
+    _Time('help', 'write_help(), empty caches', WriteHelpFromScratch,
+          number=1)
+  _Time('help', 'search() for one flag', lambda: fv.search('^flag123$'),
+        number=100)
+  texts = [flag.help for flag in fv.FlagDict().values()]
+  texts += [text[:40] for text in texts]
+  _Time('help', 'TextWrap() of 10k help strings',
+        lambda: [gflags.TextWrap(text, 80, '    ', '  ') for text in texts],
+        number=1)
+
+
+def BenchmarkDeferredHelp():
+  """Defining 2k enum flags whose help is formatted from a table."""
+  enum_values = ['value_%03d' % i for i in range(100)]
+  table = [(value, 'Description of %s.' % value) for value in enum_values]
+
+  def FormatHelp():
+    return 'Choices:\n' + '\n'.join('  %s: %s' % row for row in table)
+
+  for variant, help_string in (('eager help', FormatHelp),
+                               ('deferred help', lambda: FormatHelp)):
+
+    def DefineFlags(help_string=help_string):
+      fv = gflags.FlagValues()
+      for i in range(2000):
+        gflags.DEFINE_enum('flag%d' % i, 'value_000', enum_values,
+                           help_string(), flag_values=fv,
+                           module_name='module')
+
+    _Time('deferred_help', variant, DefineFlags, number=1)
+
+
+def BenchmarkConcurrentHelp():
+  """Rendering 32 modules of flags whose deferred help blocks for 10 ms."""
+
+  def SlowHelp():
+    time.sleep(0.01)
+    return 'Help.'
+
+  def DefineAndRender(max_threads):
+    fv = gflags.FlagValues()
+    for i in range(32):
+      gflags.DEFINE_integer('flag%d' % i, i, SlowHelp, flag_values=fv,
+                            module_name='module%d' % i)
+    fv.GetHelp(max_threads=max_threads)
+
+  for max_threads in (1, 8):
+    _Time('concurrent_help', 'max_threads=%d' % max_threads,
+          lambda: DefineAndRender(max_threads), number=1)
+
+
+def BenchmarkIndependentValidators():
+  """Validating 32 flags whose validators each block for 10 ms."""
+
+  def SlowChecker(unused_value):
+    time.sleep(0.01)
+    return True
+
+  for independent in (False, True):
+    fv = gflags.FlagValues()
+    _DefineIntegerFlags(fv, 32)
+    for i in range(32):
+      gflags.register_validator('flag%d' % i, SlowChecker,
+                                independent=independent, flag_values=fv)
+    fv(['program'])
+    _Time('independent_validators', 'independent=%s' % independent,
+          fv.validate_all, number=1)
+
+
+def BenchmarkKeyFlags():
+  """Adopting 10k key flags and writing the XML help of the main module."""
+  module_fv = gflags.FlagValues()
+  for i in range(10000):
+    gflags.DEFINE_boolean('flag%d' % i, False, 'Help.', flag_values=module_fv,
+                          module_name='module')
+
+  def Adopt():
+    fv = gflags.FlagValues()
+    for flag in six.itervalues(module_fv.FlagDict()):
+      fv[flag.name] = flag
+      fv._RegisterFlagByModule('module', flag)  # pylint: disable=protected-access
+      fv._RegisterKeyFlagForModule(sys.argv[0], flag)  # pylint: disable=protected-access
+    return fv
+
+  _Time('key_flags', 'adopt', Adopt, number=1)
+  fv = Adopt()
+  _Time('key_flags', 'get_key_flags_for_module',
+        lambda: fv._GetKeyFlagsForModule(sys.argv[0]), number=1)  # pylint: disable=protected-access
+  _Time('key_flags', 'xml',
+        lambda: fv.WriteHelpInXMLFormat(six.StringIO()), number=1)
+
+
+def BenchmarkXml():
+  """Exporting 2000 flags as minidom XML, streamed XML and JSON schema."""
+  fv = gflags.FlagValues()
+  for i in range(2000):
+    module_name = 'module%d' % (i % 20)
+    if i % 2:
+      gflags.DEFINE_enum('flag%d' % i, 'a', ['a', 'b', 'c'],
+                         'Help for <flag> %d & co.' % i, flag_values=fv,
+                         module_name=module_name)
+    else:
+      gflags.DEFINE_integer('flag%d' % i, i, 'Help for flag %d.' % i,
+                            lower_bound=0, flag_values=fv,
+                            module_name=module_name)
+
+  def WriteMinidom():
+    doc = minidom.Document()
+    all_flag = doc.createElement('AllFlags')
+    doc.appendChild(all_flag)
+    flags_by_module = fv.FlagsByModuleDict()
+    for module_name in sorted(flags_by_module):
+      for flag in sorted(flags_by_module[module_name], key=lambda f: f.name):
+        all_flag.appendChild(flag._create_xml_dom_element(  # pylint: disable=protected-access
+            doc, module_name))
+    six.StringIO().write(
+        doc.toprettyxml(indent='  ', encoding='utf-8').decode('utf-8'))
+
+  _Time('xml', 'minidom', WriteMinidom, number=1)
+  _Time('xml', 'streaming',
+        lambda: fv.WriteHelpInXMLFormat(six.StringIO()), number=1)
+  _Time('xml', 'schema_json',
+        lambda: fv.write_schema_json(six.StringIO()), number=1)
+
+
+_BENCHMARKS = {
+    'concurrent_help': BenchmarkConcurrentHelp,
+    'constraints': BenchmarkConstraints,
+    'deferred_help': BenchmarkDeferredHelp,
+    'enum_parser': BenchmarkEnumParser,
+    'flagsaver': BenchmarkFlagSaver,
+    'help': BenchmarkHelp,
+    'independent_validators': BenchmarkIndependentValidators,
+    'json': BenchmarkJson,
+    'key_flags': BenchmarkKeyFlags,
+    'lists': BenchmarkLists,
+    'multi_flags': BenchmarkMultiFlags,
+    'pure_validators': BenchmarkPureValidators,
+    'registry_diff': BenchmarkRegistryDiff,
+    'validation': BenchmarkValidation,
+    'xml': BenchmarkXml,
+}
+
+
+def main(argv):
+  names = argv[1:] or sorted(_BENCHMARKS)
+  for name in names:
+    _BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+  main(sys.argv)
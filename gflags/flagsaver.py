@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Decorator and context manager for saving and restoring flag values.
+
+There are many ways to save and restore.  Always use the most convenient
+method for a given use case.
+
+Here are examples of each method.  They all call DoStuff() while
+FLAGS.someflag is temporarily set to 'foo'.
+
+  # Use a decorator which can optionally override flags via arguments.
+  @flagsaver.flagsaver(someflag='foo')
+  def SomeFunc():
+    DoStuff()
+
+  # Use a decorator which does not override flags itself.
+  @flagsaver.flagsaver
+  def SomeFunc():
+    FLAGS.someflag = 'foo'
+    DoStuff()
+
+  # Use a context manager which can optionally override flags via arguments.
+  with flagsaver.flagsaver(someflag='foo'):
+    DoStuff()
+
+  # Save and restore the flag values yourself.
+  saved_flag_values = flagsaver.save_flag_values()
+  try:
+    FLAGS.someflag = 'foo'
+    DoStuff()
+  finally:
+    flagsaver.restore_flag_values(saved_flag_values)
+
+Only the flags that are modified while the values are being saved are
+restored, so the cost of saving and restoring is proportional to the number
+of changed flags rather than to the size of the registry.  A flag counts as
+modified when its value is assigned (including through FLAGS.<name> = value),
+when it is parsed, reset or when its default is changed.  Validators attached
+to a modified flag are restored together with the flag.  In-place mutations
+of a flag value (e.g. FLAGS.some_list.append(x)) bypass the tracking and are
+not undone.
+"""
+
+import copy
+import functools
+import inspect
+
+import gflags
+from gflags import flag as _flag
+from gflags import flagvalues
+
+
+FLAGS = gflags.FLAGS
+
+
+def flagsaver(*args, **kwargs):
+  """The main flagsaver interface.  See module doc for usage."""
+  if not args:
+    return _FlagOverrider(**kwargs)
+  elif len(args) == 1:
+    if kwargs:
+      raise ValueError(
+          "It's invalid to specify both positional and keyword parameters.")
+    func = args[0]
+    if inspect.isclass(func):
+      raise TypeError('@flagsaver.flagsaver cannot be applied to a class.')
+    return _wrap(func, {})
+  else:
+    raise ValueError(
+        "It's invalid to specify more than one positional parameters.")
+
+
+def save_flag_values():
+  """Starts recording the flags that are about to be modified.
+
+  Returns:
+    An opaque object to be passed to restore_flag_values().
+  """
+  snapshots = _FlagSnapshots()
+  _flag._change_observers.append(snapshots.record)  # pylint: disable=protected-access
+  return snapshots
+
+
+def restore_flag_values(saved_flag_values):
+  """Restores the flags modified since the matching save_flag_values() call.
+
+  Args:
+    saved_flag_values: The object returned by save_flag_values().
+  """
+  saved_flag_values.restore()
+
+
+class _FlagSnapshots(object):
+  """Copies of the state of the flags modified while recording."""
+
+  def __init__(self):
+    # Dictionary: Flag object -> copy of its __dict__ before the first change.
+    self._saved = {}
+
+  def record(self, flag):
+    """Saves the state of flag unless it was saved already."""
+    if flag in self._saved:
+      return
+    state = flag.__dict__
+    if 'validators' not in state:
+      # The flag is still being constructed: there is nothing to restore.
+      return
+    saved = dict(state)
+    saved['validators'] = list(saved['validators'])
+    if isinstance(saved.get('_value'), list):
+      # Multi flags accumulate their values in place.
+      saved['_value'] = copy.copy(saved['_value'])
+    self._saved[flag] = saved
+
+  def restore(self):
+    """Stops recording and restores every flag that was saved."""
+    observers = _flag._change_observers  # pylint: disable=protected-access
+    if self.record in observers:
+      observers.remove(self.record)
+    validators_changed = []
+    for flag, saved in self._saved.items():
+      if flag.validators != saved['validators']:
+        validators_changed.append(flag)
+      flag.__dict__.clear()
+      flag.__dict__.update(saved)
+    self._saved = {}
+    # pylint: disable=protected-access
+    flagvalues._validators_changed(validators_changed)
+
+
+def _wrap(func, overrides):
+  """Creates a wrapper function that saves/restores flag values.
+
+  Args:
+    func: function object - This will be called between saving flags and
+        restoring flags.
+    overrides: {str: object} - Flag names mapped to their values.  These flags
+        will be set after saving the original flag state.
+
+  Returns:
+    return value from func()
+  """
+  @functools.wraps(func)
+  def _flagsaver_wrapper(*args, **kwargs):
+    """Wrapper function that saves and restores flags."""
+    with _FlagOverrider(**overrides):
+      return func(*args, **kwargs)
+  return _flagsaver_wrapper
+
+
+class _FlagOverrider(object):
+  """Overrides flags for the duration of the decorated function call.
+
+  It also restores all original values of flags after decorated method
+  completes.
+  """
+
+  def __init__(self, **overrides):
+    self._overrides = overrides
+    self._saved_flag_values = None
+
+  def __call__(self, func):
+    if inspect.isclass(func):
+      raise TypeError('flagsaver cannot be applied to a class.')
+    return _wrap(func, self._overrides)
+
+  def __enter__(self):
+    self._saved_flag_values = save_flag_values()
+    try:
+      for name, value in self._overrides.items():
+        setattr(FLAGS, name, value)
+    except:
+      restore_flag_values(self._saved_flag_values)
+      raise
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    restore_flag_values(self._saved_flag_values)
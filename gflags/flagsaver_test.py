@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Unittest for flagsaver module."""
+
+import unittest
+
+import gflags
+from gflags import flagsaver
+
+FLAGS = gflags.FLAGS
+
+gflags.DEFINE_string('flagsaver_test_flag0', 'unchanged0', 'flag to test with')
+gflags.DEFINE_integer('flagsaver_test_flag1', 1, 'flag to test with')
+gflags.DEFINE_multistring('flagsaver_test_multi', ['a'], 'flag to test with')
+
+
+class FlagSaverTest(unittest.TestCase):
+
+  def setUp(self):
+    FLAGS.MarkAsParsed()
+
+  def testContextManagerWithoutOverrides(self):
+    with flagsaver.flagsaver():
+      FLAGS.flagsaver_test_flag0 = 'new value'
+      FLAGS.flagsaver_test_flag1 = 5
+    self.assertEqual('unchanged0', FLAGS.flagsaver_test_flag0)
+    self.assertEqual(1, FLAGS.flagsaver_test_flag1)
+    self.assertTrue(FLAGS['flagsaver_test_flag0'].using_default_value)
+
+  def testContextManagerWithOverrides(self):
+    with flagsaver.flagsaver(flagsaver_test_flag0='new value'):
+      self.assertEqual('new value', FLAGS.flagsaver_test_flag0)
+    self.assertEqual('unchanged0', FLAGS.flagsaver_test_flag0)
+
+  def testDecorator(self):
+
+    @flagsaver.flagsaver
+    def MutateFlags():
+      FLAGS.flagsaver_test_flag0 = 'new value'
+
+    MutateFlags()
+    self.assertEqual('unchanged0', FLAGS.flagsaver_test_flag0)
+
+  def testDecoratorWithOverrides(self):
+
+    @flagsaver.flagsaver(flagsaver_test_flag1=7)
+    def ReadFlag():
+      return FLAGS.flagsaver_test_flag1
+
+    self.assertEqual(7, ReadFlag())
+    self.assertEqual(1, FLAGS.flagsaver_test_flag1)
+
+  def testRestoresParsedFlags(self):
+    with flagsaver.flagsaver():
+      FLAGS(['program', '--flagsaver_test_flag1=3',
+             '--flagsaver_test_multi=b', '--flagsaver_test_multi=c'])
+      self.assertEqual(['b', 'c'], FLAGS.flagsaver_test_multi)
+      self.assertTrue(FLAGS['flagsaver_test_flag1'].present)
+    self.assertEqual(1, FLAGS.flagsaver_test_flag1)
+    self.assertEqual(['a'], FLAGS.flagsaver_test_multi)
+    self.assertFalse(FLAGS['flagsaver_test_flag1'].present)
+    self.assertTrue(FLAGS['flagsaver_test_multi'].using_default_value)
+
+  def testRestoresDefault(self):
+    with flagsaver.flagsaver():
+      FLAGS.SetDefault('flagsaver_test_flag1', 10)
+      self.assertEqual(10, FLAGS['flagsaver_test_flag1'].default)
+    self.assertEqual(1, FLAGS['flagsaver_test_flag1'].default)
+    self.assertEqual("'1'", FLAGS['flagsaver_test_flag1'].default_as_str)
+    self.assertEqual(1, FLAGS.flagsaver_test_flag1)
+
+  def testRestoresValidators(self):
+    with flagsaver.flagsaver():
+      gflags.register_validator('flagsaver_test_flag1', lambda x: x > 100)
+      FLAGS['flagsaver_test_flag1'].value = 2
+    self.assertEqual([], FLAGS['flagsaver_test_flag1'].validators)
+
+  def testRestoresOnException(self):
+
+    @flagsaver.flagsaver
+    def MutateFlagsAndRaise():
+      FLAGS.flagsaver_test_flag0 = 'new value'
+      raise ValueError('test')
+
+    self.assertRaises(ValueError, MutateFlagsAndRaise)
+    self.assertEqual('unchanged0', FLAGS.flagsaver_test_flag0)
+
+  def testNestedSavers(self):
+    with flagsaver.flagsaver(flagsaver_test_flag0='outer'):
+      with flagsaver.flagsaver(flagsaver_test_flag0='inner'):
+        FLAGS.flagsaver_test_flag1 = 9
+      self.assertEqual('outer', FLAGS.flagsaver_test_flag0)
+      self.assertEqual(1, FLAGS.flagsaver_test_flag1)
+    self.assertEqual('unchanged0', FLAGS.flagsaver_test_flag0)
+
+  def testSaveAndRestoreFlagValues(self):
+    saved_flag_values = flagsaver.save_flag_values()
+    FLAGS.flagsaver_test_flag1 = 13
+    flagsaver.restore_flag_values(saved_flag_values)
+    self.assertEqual(1, FLAGS.flagsaver_test_flag1)
+
+  def testOnlyModifiedFlagsAreSaved(self):
+    saved_flag_values = flagsaver.save_flag_values()
+    try:
+      FLAGS.flagsaver_test_flag1 = 13
+      self.assertEqual(
+          [FLAGS['flagsaver_test_flag1']],
+          list(saved_flag_values._saved))  # pylint: disable=protected-access
+    finally:
+      flagsaver.restore_flag_values(saved_flag_values)
+
+  def testFlagsDefinedInsideScopeAreKept(self):
+    fv = gflags.FlagValues()
+    with flagsaver.flagsaver():
+      gflags.DEFINE_integer('defined_inside', 3, 'help', flag_values=fv)
+    fv.MarkAsParsed()
+    self.assertEqual(3, fv.defined_inside)
+    self.assertEqual("'3'", fv['defined_inside'].default_as_str)
+
+  def testClassDecoratorRaises(self):
+    self.assertRaises(TypeError, flagsaver.flagsaver, FlagSaverTest)
+
+  def testPositionalAndKeywordArgumentsRaise(self):
+    self.assertRaises(ValueError, flagsaver.flagsaver, lambda: None,
+                      flagsaver_test_flag0='x')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -33,13 +33,20 @@ Instead of importing this module directly, it's preferable to import the
 flags package and use the aliases defined at the package level.
 """
 
+import bisect
+import codecs
+import collections
 import hashlib
+import json
 import logging
 import os
+import re
 import struct
 import sys
+import time
 import traceback
 import warnings
+import weakref
 from xml.dom import minidom
 
 import six
@@ -47,6 +54,12 @@ import six
 from gflags import _helpers
 from gflags import exceptions
 from gflags import flag as _flag
+from gflags import validators as gflags_validators
+
+try:
+  from collections import abc as collections_abc  # pylint: disable=g-import-not-at-top
+except ImportError:  # Python 2.
+  collections_abc = collections
 
 # Add flagvalues module to disclaimed module ids.
 _helpers.disclaim_module_ids.add(id(sys.modules[__name__]))
@@ -68,8 +81,80 @@ _UNPARSED_ACCESS_DISABLED_PERCENT = 0
 # style. Do NOT rely on it. It will be removed as part of b/32278439.
 _USE_GNU_GET_OPT_ENV_NAME = 'GFLAGS_USE_GNU_GET_OPT'
 
+# Version of the format of the JSON flag schema, see write_schema_json().
+_SCHEMA_VERSION = 1
+
+# Dictionary: Flag -> weakref.WeakSet of the FlagValues it is registered in.
+# Used to mark the sorted validator index of those FlagValues as stale when
+# validators are attached to or detached from the flag from elsewhere, and to
+# record the flags whose value was assigned directly.
+_flag_values_by_flag = weakref.WeakKeyDictionary()
+
+
+# Statistics about the verifications of a validator, see validator_stats().
+ValidatorStats = collections.namedtuple(
+    'ValidatorStats', ['calls', 'failures', 'seconds'])
+
+
+def _validators_changed(flags, except_flag_values=None):
+  """Marks the sorted validator index of FlagValues sharing flags as stale.
+
+  Args:
+    flags: iterable of Flag, the flags whose validators changed.
+    except_flag_values: FlagValues or None, a registry to leave alone because
+        it updates its own index.
+  """
+  for flag in flags:
+    for flag_values in _flag_values_by_flag.get(flag, ()):
+      if flag_values is not except_flag_values:
+        flag_values.__dict__['__validators'] = None
+
+
+def _flag_assigned(flag):
+  """Records that the value of flag was assigned directly, see _flag."""
+  for flag_values in _flag_values_by_flag.get(flag, ()):
+    flag_values.__dict__['__assigned_flags'].add(flag)
+
+
+_flag._assignment_observers.append(_flag_assigned)  # pylint: disable=protected-access
 
 
+def _CheckerName(checker):
+  """Returns the qualified name of a validator checker function."""
+  name = getattr(checker, '__qualname__', None) or getattr(
+      checker, '__name__', None) or type(checker).__name__
+  module = getattr(checker, '__module__', None)
+  return '%s.%s' % (module, name) if module else name
+
+
+def _FlagHelpInputs(flag):
+  """Returns the attributes of a flag that its rendered help depends on."""
+  return (flag.name, flag.short_name, flag.boolean, flag.help,
+          flag.default_as_str, flag.parser.syntactic_help)
+
+
+def _EncodeSchemaValue(value):
+  """json.dumps default hook for the flag values of the JSON schema."""
+  if hasattr(value, 'tolist'):
+    # Arrays (array.array, NumPy) are encoded as lists.
+    return value.tolist()
+  if isinstance(value, collections_abc.Mapping):
+    return dict(value)
+  if isinstance(value, (set, frozenset)):
+    return sorted(value)
+  return _helpers.StrOrUnicode(value)
+
+
+def _RecordValidatorCall(stats, validator, failed, seconds):
+  """Adds a verification of validator to the statistics dictionary."""
+  key = (tuple(validator.get_flags_names()), _CheckerName(validator.checker))
+  value = stats.get(key)
+  if value is None:
+    value = stats[key] = [0, 0, 0.0]
+  value[0] += 1
+  value[1] += failed
+  value[2] += seconds
+
 
 class FlagValues(object):
   """Registry of 'Flag' objects.
@@ -124,6 +209,9 @@ class FlagValues(object):
     # Dictionary: module name (string) -> list of Flag objects that are
     # key for that module.
     self.__dict__['__key_flags_by_module'] = {}
+    # Dictionary: module name (string) -> set of the Flag objects of the
+    # list in __key_flags_by_module, for constant time membership tests.
+    self.__dict__['__key_flag_sets_by_module'] = {}
 
     # Bool: True if flags were parsed.
     self.__dict__['__flags_parsed'] = False
@@ -134,6 +222,41 @@ class FlagValues(object):
     # None or Method(name, value) to call from __setattr__ for an unknown flag.
     self.__dict__['__set_unknown'] = None
 
+    # List: validators of the registered flags, sorted by insertion_index, or
+    # None when it must be rebuilt.  See _GetSortedValidators.
+    self.__dict__['__validators'] = None
+    # Set: the validators in the list above.
+    self.__dict__['__validator_set'] = set()
+    # validators.ConstraintTable: the constraints of the list above, compiled.
+    self.__dict__['__constraint_table'] = gflags_validators.ConstraintTable()
+    # Set: validators added since the last validation at the end of parsing.
+    self.__dict__['__pending_validators'] = set()
+    # Set: flags whose value was assigned directly, i.e. not by their parser,
+    # since their validators were last verified.  See _GetAssignedFlags.
+    self.__dict__['__assigned_flags'] = set()
+    # Bool: True if all validators were verified since the list was built.
+    self.__dict__['__all_validators_verified'] = False
+    # None when validator statistics are disabled, otherwise dictionary:
+    # (tuple of flag names, checker name) -> [calls, failures, seconds].
+    self.__dict__['__validator_stats'] = None
+    # None or float: see enable_validator_stats.
+    self.__dict__['__validator_stats_log_threshold'] = None
+
+    # None or string: the value of --helpsearch given to the last parse.
+    self.__dict__['__help_search_query'] = None
+
+    # Dictionary: Flag object -> dictionary: (help width, prefix) ->
+    # (_FlagHelpInputs of the flag, rendered help).  See __RenderFlagHelp.
+    self.__dict__['__flag_help_cache'] = {}
+    # Dictionary: (module name, key flags only, help width, prefix) ->
+    # (tuple of (Flag object, _FlagHelpInputs), list of rendered lines).
+    # See __RenderCachedModuleFlags.
+    self.__dict__['__module_help_cache'] = {}
+    # None, or the index searched by search(): a tuple (text, list of the
+    # offsets of the entries in text, list of Flag objects, list of tuples of
+    # the searched fields of the flags).  See __GetSearchIndex.
+    self.__dict__['__search_index'] = None
+
     if _USE_GNU_GET_OPT_ENV_NAME in os.environ:
       self.__dict__['__use_gnu_getopt'] = (
           os.environ[_USE_GNU_GET_OPT_ENV_NAME] == '1')
@@ -196,6 +319,7 @@ class FlagValues(object):
     """
     flags_by_module = self.FlagsByModuleDict()
     flags_by_module.setdefault(module_name, []).append(flag)
+    self._InvalidateHelpCaches()
 
   def _RegisterFlagByModuleId(self, module_id, flag):
     """Records the module that defines a specific flag.
@@ -217,9 +341,13 @@ class FlagValues(object):
     key_flags_by_module = self.KeyFlagsByModuleDict()
     # The list of key flags for the module named module_name.
     key_flags = key_flags_by_module.setdefault(module_name, [])
+    key_flag_set = self.__dict__['__key_flag_sets_by_module'].setdefault(
+        module_name, set())
     # Add flag, but avoid duplicates.
-    if flag not in key_flags:
+    if flag not in key_flag_set:
+      key_flag_set.add(flag)
       key_flags.append(flag)
+      self._InvalidateHelpCaches()
 
   def _FlagIsRegistered(self, flag_obj):
     """Checks whether a Flag object is registered under long name or short name.
@@ -253,6 +381,8 @@ class FlagValues(object):
     """
     if self._FlagIsRegistered(flag_obj):
       return
+    _flag_values_by_flag.get(flag_obj, set()).discard(self)
+    self.__dict__['__assigned_flags'].discard(flag_obj)
     for flags_by_module_dict in (self.FlagsByModuleDict(),
                                  self.FlagsByModuleIdDict(),
                                  self.KeyFlagsByModuleDict()):
@@ -261,6 +391,9 @@ class FlagValues(object):
         # flag in the list for the same module.
         while flag_obj in flags_in_module:
           flags_in_module.remove(flag_obj)
+    for key_flag_set in six.itervalues(
+        self.__dict__['__key_flag_sets_by_module']):
+      key_flag_set.discard(flag_obj)
 
   def _GetFlagsDefinedByModule(self, module):
     """Returns the list of flags defined by a module.
@@ -298,8 +431,9 @@ class FlagValues(object):
     key_flags = self._GetFlagsDefinedByModule(module)
 
     # Take into account flags explicitly declared as key for a module.
+    defined_flags = set(key_flags)
     for flag in self.KeyFlagsByModuleDict().get(module, []):
-      if flag not in key_flags:
+      if flag not in defined_flags:
         key_flags.append(flag)
     return key_flags
 
@@ -457,8 +591,15 @@ class FlagValues(object):
       if name in fl and fl[name] != flag:
         flags_to_cleanup.add(fl[name])
       fl[name] = flag
+    flag_values = _flag_values_by_flag.get(flag)
+    if flag_values is None:
+      flag_values = _flag_values_by_flag[flag] = weakref.WeakSet()
+    flag_values.add(self)
     for f in flags_to_cleanup:
       self._CleanupUnregisteredFlagFromModuleDicts(f)
+    if flags_to_cleanup or flag.validators:
+      self.__dict__['__validators'] = None
+    self._InvalidateHelpCaches(flags_to_cleanup)
 
   def __dir__(self):
     """Returns list of names of all defined flags.
@@ -548,34 +689,271 @@ class FlagValues(object):
       return self._SetUnknownFlag(name, value)
     fl[name].value = value
     self._AssertValidators(fl[name].validators)
+    self.__dict__['__assigned_flags'].discard(fl[name])
     fl[name].using_default_value = False
     return value
 
+  def _AddValidatorToIndex(self, validator):
+    """Records a validator just attached to flags registered here.
+
+    Validators are created with increasing insertion_index, so a new one can
+    usually be appended to the sorted index instead of rebuilding it.  Other
+    FlagValues the flags are registered in rebuild their index when next used.
+
+    Args:
+      validator: validators.Validator, the validator to record.
+    """
+    flag_dict = self.FlagDict()
+    _validators_changed(
+        [flag_dict[name] for name in validator.get_flags_names()], self)
+    validators = self.__dict__['__validators']
+    validator_set = self.__dict__['__validator_set']
+    if validators is not None and validator not in validator_set:
+      if validators and (validators[-1].insertion_index >
+                         validator.insertion_index):
+        self.__dict__['__validators'] = None
+      else:
+        validators.append(validator)
+        validator_set.add(validator)
+    self.__dict__['__pending_validators'].add(validator)
+
+  def _GetSortedValidators(self):
+    """Returns the validators of all registered flags in insertion order.
+
+    The list is cached and rebuilt only after validators or flags were added
+    or removed in a way that _AddValidatorToIndex can't track incrementally.
+    Rebuilding it requires verifying all validators again.
+
+    Returns:
+      A list of validators.Validator.  Do not modify it.
+    """
+    validators = self.__dict__['__validators']
+    if validators is None:
+      validator_set = set()
+      for flag in six.itervalues(self.FlagDict()):
+        validator_set.update(flag.validators)
+      validators = sorted(
+          validator_set, key=lambda validator: validator.insertion_index)
+      self.__dict__['__validators'] = validators
+      self.__dict__['__validator_set'] = validator_set
+      self.__dict__['__constraint_table'] = gflags_validators.ConstraintTable()
+      self.__dict__['__all_validators_verified'] = False
+    return validators
+
+  def validate_all(self):
+    """Verifies all validators of the registered flags.
+
+    Validators are normally verified when the flag values change, and at the
+    end of parsing only the validators of flags changed by the parsing are
+    verified again.  This method verifies all of them regardless.
+
+    Raises:
+      AttributeError: if validators work with a non-existing flag.
+      IllegalFlagValueError: if validation fails for at least one validator
+    """
+    assigned_flags = self._GetAssignedFlags()
+    self._VerifyValidators(self._GetSortedValidators())
+    self.__dict__['__all_validators_verified'] = True
+    self.__dict__['__pending_validators'].clear()
+    self.__dict__['__assigned_flags'].difference_update(assigned_flags)
+
+  def _GetAssignedFlags(self):
+    """Returns the registered flags whose value was assigned directly.
+
+    Their values did not go through their parsers, so all their validators
+    must be verified, including the parser_checked ones.
+
+    Returns:
+      A set of Flag objects.
+    """
+    assigned_flags = self.__dict__['__assigned_flags']
+    if not assigned_flags:
+      return set()
+    fl = self.FlagDict()
+    return set(flag for flag in assigned_flags if fl.get(flag.name) is flag)
+
   def _AssertAllValidators(self):
-    all_validators = set()
-    for flag in six.itervalues(self.FlagDict()):
-      for validator in flag.validators:
-        all_validators.add(validator)
-    self._AssertValidators(all_validators)
+    self.validate_all()
+
+  def _AssertValidatorsAfterParse(self, changed_flags, errors=None,
+                                  failed_flags=None):
+    """Verifies the validators that may be affected by parsing.
+
+    The first time (and after the validator index has been rebuilt) all
+    validators are verified.  Afterwards, only the validators of the changed
+    flags and the validators added since the last parse are verified, plus
+    the validators of the flags whose value was assigned directly since.
+    Constraints already enforced by the flag parsers (parser_checked
+    validators) are skipped for the values that went through the parsers,
+    but not in the full verification.
+
+    Args:
+      changed_flags: A set of Flag objects modified by the parsing.
+      errors: None, or a list to append the validation errors to instead of
+        raising the first one.
+      failed_flags: None, or a set of the Flag objects whose value could not
+        be parsed: the validators involving them are not verified, since
+        they would check the previous value.
 
-  def _AssertValidators(self, validators):
+    Raises:
+      AttributeError: if validators work with a non-existing flag.
+      IllegalFlagValueError: if validation fails for at least one validator
+    """
+    all_validators = self._GetSortedValidators()
+    pending_validators = self.__dict__['__pending_validators']
+    assigned_flags = self._GetAssignedFlags()
+    num_errors = len(errors) if errors is not None else 0
+    if not self.__dict__['__all_validators_verified']:
+      self._VerifyValidators(
+          self._SkipValidatorsOf(all_validators, failed_flags), errors)
+      verified_all = True
+    else:
+      validators = set(pending_validators)
+      for flag in changed_flags:
+        validators.update(flag.validators)
+      validators = [v for v in validators if not v.parser_checked]
+      if assigned_flags:
+        validators = set(validators)
+        for flag in assigned_flags:
+          validators.update(flag.validators)
+      # Until they succeed, the validators stay pending so that a failure is
+      # reported again by the next parse even if the flag does not change.
+      pending_validators.update(validators)
+      self._AssertValidators(
+          self._SkipValidatorsOf(validators, failed_flags), errors)
+      verified_all = False
+    if errors is not None and len(errors) > num_errors:
+      return
+    if verified_all:
+      self.__dict__['__all_validators_verified'] = True
+    pending_validators.clear()
+    self.__dict__['__assigned_flags'].difference_update(assigned_flags)
+
+  def _SkipValidatorsOf(self, validators, flags):
+    """Returns the validators that do not involve any of flags.
+
+    Args:
+      validators: iterable of validators.Validator.
+      flags: None, or a set of Flag objects.
+
+    Returns:
+      The validators, in the same order, or unchanged if flags is empty.
+    """
+    if not flags:
+      return validators
+    fl = self.FlagDict()
+    return [validator for validator in validators
+            if not any(fl.get(name) in flags
+                       for name in validator.get_flags_names())]
+
+  def _VerifyAndCatch(self, validator):
+    """Verifies validator.
+
+    Args:
+      validator: validators.Validator, the validator to verify.
+
+    Returns:
+      A tuple (exception raised by the validator or None, seconds taken).
+    """
+    start = time.time()
+    try:
+      validator.verify(self)
+    except Exception as e:  # pylint: disable=broad-except
+      return e, time.time() - start
+    return None, time.time() - start
+
+  def enable_validator_stats(self, enabled=True, log_threshold=None):
+    """Enables or disables the statistics about validator verifications.
+
+    Enabling the statistics clears the ones recorded so far.
+
+    Args:
+      enabled: bool, whether to record statistics.
+      log_threshold: None, or float: at the end of each parsing, log the
+        validators that took more than this many seconds in total so far.
+    """
+    self.__dict__['__validator_stats'] = {} if enabled else None
+    self.__dict__['__validator_stats_log_threshold'] = log_threshold
+
+  def validator_stats(self):
+    """Returns the statistics recorded since enable_validator_stats().
+
+    Returns:
+      A dictionary mapping (tuple of flag names, checker name) to
+      ValidatorStats(calls, failures, seconds); empty if the statistics are
+      disabled.  The checker name is the qualified name of the function.
+    """
+    stats = self.__dict__['__validator_stats'] or {}
+    return dict((key, ValidatorStats(*value))
+                for key, value in six.iteritems(stats))
+
+  def _LogSlowValidators(self):
+    """Logs the validators slower than the threshold of the statistics."""
+    threshold = self.__dict__['__validator_stats_log_threshold']
+    stats = self.__dict__['__validator_stats']
+    if threshold is None or not stats:
+      return
+    slow = sorted(((value[2], key, value[0]) for key, value
+                   in six.iteritems(stats) if value[2] > threshold),
+                  reverse=True)
+    if slow:
+      logging.warning('Slow flag validators: %s', ', '.join(
+          '%s (%s): %.3fs in %d calls' % (checker_name, ','.join(names),
+                                          seconds, calls)
+          for seconds, (names, checker_name), calls in slow))
+
+  def _AssertValidators(self, validators, errors=None):
     """Assert if all validators in the list are satisfied.
 
     Asserts validators in the order they were created.
     Args:
       validators: Iterable(validators.Validator), validators to be
         verified
+      errors: None, or a list to append an IllegalFlagValueError to for
+        every failed validator instead of raising the first one.
     Raises:
       AttributeError: if validators work with a non-existing flag.
       IllegalFlagValueError: if validation fails for at least one validator
     """
-    for validator in sorted(
-        validators, key=lambda validator: validator.insertion_index):
-      try:
-        validator.verify(self)
-      except exceptions.ValidationError as e:
-        message = validator.print_flags_with_values(self)
-        raise exceptions.IllegalFlagValueError('%s: %s' % (message, str(e)))
+    self._VerifyValidators(sorted(
+        validators, key=lambda validator: validator.insertion_index), errors)
+
+  def _VerifyValidators(self, validators, errors=None):
+    """Same as _AssertValidators, for validators already in insertion order."""
+    stats = self.__dict__['__validator_stats']
+    if stats is None:
+      # Checks all the constraints in one pass: only the other validators
+      # and the failed constraints remain to be verified one by one.
+      validators = self.__dict__['__constraint_table'].filter_unsatisfied(
+          validators, self.FlagDict())
+    independent = [v for v in validators if v.independent]
+    if len(independent) > 1:
+      outcomes = dict(zip(independent, _helpers.MapConcurrently(
+          self._VerifyAndCatch, independent)))
+    else:
+      outcomes = {}
+    for validator in validators:
+      if validator in outcomes:
+        error, seconds = outcomes[validator]
+      elif stats is not None:
+        error, seconds = self._VerifyAndCatch(validator)
+      else:
+        error = None
+        try:
+          validator.verify(self)
+        except exceptions.ValidationError as e:
+          error = e
+      if stats is not None:
+        _RecordValidatorCall(stats, validator, error is not None, seconds)
+      if error is None:
+        continue
+      if not isinstance(error, exceptions.ValidationError):
+        raise error
+      message = validator.print_flags_with_values(self)
+      error = exceptions.IllegalFlagValueError('%s: %s' % (message, error))
+      if errors is None:
+        raise error
+      errors.append(error)
 
   def __delattr__(self, flag_name):
     """Deletes a previously-defined flag from a flag object.
@@ -606,6 +984,9 @@ class FlagValues(object):
     del fl[flag_name]
 
     self._CleanupUnregisteredFlagFromModuleDicts(flag_obj)
+    if flag_obj.validators:
+      self.__dict__['__validators'] = None
+    self._InvalidateHelpCaches([flag_obj])
 
   def _RemoveAllFlagAppearances(self, name):
     """Removes flag with name for all appearances.
@@ -655,6 +1036,7 @@ class FlagValues(object):
           'passed at the command line.',
           name)
     fl[name]._set_default(value)  # pylint: disable=protected-access
+    self._InvalidateHelpCaches([fl[name]])
     self._AssertValidators(fl[name].validators)
 
   def __contains__(self, name):
@@ -666,7 +1048,7 @@ class FlagValues(object):
   def __iter__(self):
     return iter(self.FlagDict())
 
-  def __call__(self, argv, known_only=False):
+  def __call__(self, argv, known_only=False, collect_errors=False):
     """Parses flags from argv; stores parsed flags into this FlagValues object.
 
     All unparsed arguments are returned.
@@ -674,6 +1056,9 @@ class FlagValues(object):
     Args:
        argv: argument list. Can be of any type that may be converted to a list.
        known_only: parse and remove known flags, return rest untouched.
+       collect_errors: if True, illegal flag values, unknown flags and failed
+         validators do not stop the parsing: all of them are reported
+         together by a single AggregateFlagsError at the end.
 
     Returns:
        The list of arguments not parsed as options, including argv[0].
@@ -681,37 +1066,74 @@ class FlagValues(object):
     Raises:
        Error: on any parsing error.
        ValueError: on flag value parsing error.
+       AggregateFlagsError: on any flag value, unknown flag or validation
+         error, if collect_errors is True.
     """
+    errors = [] if collect_errors else None
+
     if not argv:
       # Unfortunately, the old parser used to accept an empty argv, and some
       # users rely on that behaviour. Allow it as a special case for now.
       self.MarkAsParsed()
-      self._AssertAllValidators()
+      try:
+        self._AssertValidatorsAfterParse(set(), errors)
+      finally:
+        self._LogSlowValidators()
+      if errors:
+        raise exceptions.AggregateFlagsError(errors)
       return []
 
     # This pre parses the argv list for --flagfile=<> options.
     program_name = argv[0]
     args = self.ReadFlagsFromFiles(argv[1:], force_gnu=False)
 
-    # Parse the arguments.
-    unknown_flags, unparsed_args, undefok = self._ParseArgs(args, known_only)
+    # Parse the arguments, keeping track of the flags that change so that
+    # only their validators need to be verified again.
+    changed_flags = set()
+    failed_flags = set()
+    observer = changed_flags.add
+    _flag._change_observers.append(observer)  # pylint: disable=protected-access
+    try:
+      unknown_flags, unparsed_args, undefok, help_query = self._ParseArgs(
+          args, known_only, errors, failed_flags)
+    finally:
+      _flag._change_observers.remove(observer)  # pylint: disable=protected-access
+
+    if help_query is not None:
+      try:
+        re.compile(help_query)
+      except re.error as e:
+        raise exceptions.IllegalFlagValueError(
+            'flag --helpsearch=%s: %s' % (help_query, e))
+    self.__dict__['__help_search_query'] = help_query
 
     # Handle unknown flags by raising UnrecognizedFlagError.
     # Note some users depend on us raising this particular error.
+    registered_flags = None
     for name, value in unknown_flags:
       if name in undefok:
         continue
 
-      suggestions = _helpers.GetFlagSuggestions(
-          name, self.RegisteredFlags())
-      raise exceptions.UnrecognizedFlagError(
+      if registered_flags is None:
+        registered_flags = self.RegisteredFlags()
+      suggestions = _helpers.GetFlagSuggestions(name, registered_flags)
+      error = exceptions.UnrecognizedFlagError(
           name, value, suggestions=suggestions)
+      if errors is None:
+        raise error
+      errors.append(error)
 
-    self.MarkAsParsed()
-    self._AssertAllValidators()
+    if not errors:
+      self.MarkAsParsed()
+    try:
+      self._AssertValidatorsAfterParse(changed_flags, errors, failed_flags)
+    finally:
+      self._LogSlowValidators()
+    if errors:
+      raise exceptions.AggregateFlagsError(errors)
     return [program_name] + unparsed_args
 
-  def _ParseArgs(self, args, known_only):
+  def _ParseArgs(self, args, known_only, errors=None, failed_flags=None):
     """Helper function to do the main argument parsing.
 
     This function goes through args and does the bulk of the flag parsing.
@@ -721,18 +1143,24 @@ class FlagValues(object):
     Args:
       args: List of strings with the arguments to parse.
       known_only: parse and remove known flags, return rest in unparsed_args
+      errors: None, or a list to append IllegalFlagValueError instances to
+        instead of raising them.
+      failed_flags: None, or a set to add the flags whose value could not be
+        parsed to, when errors is a list.
 
     Returns:
       A tuple with the following:
         unknown_flags: List of (flag name, arg) for flags we don't know about.
         unparsed_args: List of arguments we did not parse.
         undefok: Set of flags that were given via --undefok.
+        help_query: The value of --helpsearch, or None.
 
     Raises:
        Error: on any parsing error.
        ValueError: on flag value parsing error.
     """
     unknown_flags, unparsed_args, undefok = [], [], set()
+    help_query = None
 
     flag_dict = self.FlagDict()
     args = iter(args)
@@ -781,6 +1209,15 @@ class FlagValues(object):
         undefok.update('no' + v.strip() for v in value.split(','))
         continue
 
+      # --helpsearch is a special case, see help_search_query().
+      if name == 'helpsearch':
+        help_query = GetValue()
+        if known_only:
+          unparsed_args.append(arg)
+          if value is None:
+            unparsed_args.append(help_query)
+        continue
+
       flag = flag_dict.get(name)
       if flag:
         value = (flag.boolean and value is None) or GetValue()
@@ -795,7 +1232,15 @@ class FlagValues(object):
 
 
       if flag:
-        flag.parse(value)
+        try:
+          flag.parse(value)
+        except exceptions.IllegalFlagValueError as e:
+          if errors is None:
+            raise
+          errors.append(e)
+          if failed_flags is not None:
+            failed_flags.add(flag)
+          continue
         flag.using_default_value = False
       elif known_only:
         unparsed_args.append(arg)
@@ -803,7 +1248,20 @@ class FlagValues(object):
         unknown_flags.append((name, arg))
 
     unparsed_args.extend(args)
-    return unknown_flags, unparsed_args, undefok
+    return unknown_flags, unparsed_args, undefok, help_query
+
+  def help_search_query(self):
+    """Returns the regular expression given by --helpsearch, or None.
+
+    Like --help, --helpsearch is only recorded by the parsing.  The
+    application is expected to print the help of the matching flags, e.g.
+    with write_help(sys.stdout, query=FLAGS.help_search_query()), and exit.
+
+    Returns:
+      The value of --helpsearch in the arguments last parsed by __call__, or
+      None if it was not given.
+    """
+    return self.__dict__['__help_search_query']
 
   def IsParsed(self):
     """Whether flags were parsed."""
@@ -827,6 +1285,8 @@ class FlagValues(object):
     logging.info('Reset() called; flags access will now raise errors.')
     self.__dict__['__flags_parsed'] = False
     self.__dict__['__reset_called'] = True
+    self.__dict__['__all_validators_verified'] = False
+    self.__dict__['__help_search_query'] = None
 
   def RegisteredFlags(self):
     """Returns: a list of the names and short names of all registered flags."""
@@ -834,31 +1294,157 @@ class FlagValues(object):
 
   def FlagValuesDict(self):
     """Returns: a dictionary that maps flag names to flag values."""
-    flag_values = {}
+    return dict((flag_name, flag.value)
+                for flag_name, flag in six.iteritems(self.FlagDict()))
+
+  def iter_flag_values(self, only_non_default=False, modules=None):
+    """Yields the long name and the value of every registered flag.
+
+    Unlike FlagValuesDict(), short names are not repeated and no intermediate
+    copy of the registry is made: the flags are visited in a single pass.
+
+    Args:
+      only_non_default: bool, whether to skip the flags whose value has not
+        been set by the user (see Flag.using_default_value).
+      modules: An optional iterable of module objects or module names.  If
+        given, only the flags defined by those modules are visited.
+
+    Yields:
+      (str, object) tuples, the flag name and the flag value.
+    """
+    for flag in self._IterFlags(only_non_default, modules):
+      yield flag.name, flag.value
 
-    for flag_name in self.RegisteredFlags():
-      flag = self.FlagDict()[flag_name]
-      flag_values[flag_name] = flag.value
+  def _IterFlags(self, only_non_default=False, modules=None):
+    """Yields the registered Flag objects once each; see iter_flag_values()."""
+    flag_dict = self.FlagDict()
+    if modules is None:
+      flags = (flag for name, flag in six.iteritems(flag_dict)
+               if name == flag.name)
+    else:
+      flags = self._IterFlagsDefinedByModules(modules)
+    for flag in flags:
+      if not (only_non_default and flag.using_default_value):
+        yield flag
+
+  def _IterFlagsDefinedByModules(self, modules):
+    """Yields the registered flags defined by the given modules, once each."""
+    flag_dict = self.FlagDict()
+    flags_by_module = self.FlagsByModuleDict()
+    seen = set()
+    for module in modules:
+      if not isinstance(module, str):
+        module = module.__name__
+      for flag in flags_by_module.get(module, ()):
+        # Skip flags that were deleted or overridden since being registered.
+        if flag in seen or flag_dict.get(flag.name) is not flag:
+          continue
+        seen.add(flag)
+        yield flag
 
-    return flag_values
+  def write_flag_values(self, outfile, only_non_default=False, modules=None):
+    """Writes the flag assignments to a file-like object, one per line.
+
+    The output is in the format of a flagfile, like FlagsIntoString(), but it
+    is written incrementally and flags whose value is None are skipped.  See
+    iter_flag_values() for the meaning of the arguments.
+
+    Args:
+      outfile: A file-like object with a write() method.
+      only_non_default: bool, whether to skip flags using their default value.
+      modules: An optional iterable of module objects or module names.
+    """
+    for flag in self._IterFlags(only_non_default, modules):
+      if flag.value is not None:
+        outfile.write(flag.serialize() + '\n')
 
   def __str__(self):
     """Generates a help string for all known flags."""
     return self.GetHelp()
 
-  def GetHelp(self, prefix='', include_special_flags=True):
+  def GetHelp(self, prefix='', include_special_flags=True, max_threads=1):
     """Generates a help string for all known flags.
 
     Args:
       prefix: str, per-line output prefix.
       include_special_flags: bool, whether to include description of
         _SPECIAL_FLAGS, i.e. --flagfile and --undefok.
+      max_threads: int, see write_help().
 
     Returns:
       str, formatted help message.
     """
-    # TODO(vrusinov): this function needs a test.
-    helplist = []
+    output = six.StringIO()
+    self.__WriteHelp(output, prefix, include_special_flags, None, max_threads,
+                     True)
+    return output.getvalue()
+
+  def write_help(self, outfile, prefix='', include_special_flags=True,
+                 query=None, max_threads=1):
+    """Writes the help for all known flags to a file-like object.
+
+    The output is the same as GetHelp(), but it is rendered and written one
+    module at a time, so that the help of all the flags is never joined into
+    a single string.  The help cached by GetHelp() is used, but nothing is
+    added to the cache, so the memory used does not grow with the number of
+    flags.
+
+    Args:
+      outfile: A file-like object with a write() method.
+      prefix: str, per-line output prefix.
+      include_special_flags: bool, whether to include description of
+        _SPECIAL_FLAGS, i.e. --flagfile and --undefok.
+      query: None, or a regular expression: only the help of the flags
+        matching it is written, see search().
+      max_threads: int, maximal number of threads rendering the sections of
+        different modules concurrently.  The sections are still written in
+        the same order, but all of them are rendered before the first one is
+        written.  This only pays off when rendering does not hold the GIL,
+        e.g. with deferred help strings doing I/O.
+
+    Raises:
+      re.error: if query is not a valid regular expression.
+    """
+    self.__WriteHelp(outfile, prefix, include_special_flags, query,
+                     max_threads, False)
+
+  def __WriteHelp(self, outfile, prefix, include_special_flags, query,
+                  max_threads, store_cache):
+    """Writes the help, see write_help().
+
+    Args:
+      outfile: A file-like object with a write() method.
+      prefix: str, per-line output prefix.
+      include_special_flags: bool, whether to include the special flags.
+      query: None, or a regular expression, see write_help().
+      max_threads: int, see write_help().
+      store_cache: bool, whether to cache the help rendered for modules and
+        flags.
+    """
+    matches = None if query is None else set(self.search(query))
+    started = False
+    for lines in self.__IterHelpSections(prefix, include_special_flags,
+                                         matches, max_threads, store_cache):
+      if lines:
+        if started:
+          outfile.write('\n')
+        outfile.write('\n'.join(lines))
+        started = True
+
+  def __IterHelpSections(self, prefix, include_special_flags, matches=None,
+                         max_threads=1, store_cache=True):
+    """Yields the lists of lines of the help, one module at a time.
+
+    Args:
+      prefix: str, per-line output prefix.
+      include_special_flags: bool, whether to include the special flags.
+      matches: None, or a set of Flag objects: the only flags to render.
+      max_threads: int, maximal number of threads rendering modules.
+      store_cache: bool, whether to cache the help rendered for modules and
+        flags.
+    """
+    # The terminal width is probed once for the whole help.
+    width = _helpers.GetHelpWidth()
 
     flags_by_module = self.FlagsByModuleDict()
     if flags_by_module:
@@ -870,33 +1456,174 @@ class FlagValues(object):
         modules.remove(main_module)
         modules = [main_module] + modules
 
-      for module in modules:
-        self.__RenderOurModuleFlags(module, helplist)
+      def RenderModule(module):
+        lines = []
+        if matches is None:
+          self.__RenderCachedModuleFlags(module, False, lines, '', width,
+                                         store_cache)
+        else:
+          flags = [flag for flag in flags_by_module[module] if flag in matches]
+          if flags:
+            self.__RenderModuleFlags(module, flags, lines, width=width,
+                                     store_cache=store_cache)
+        return lines
+
+      if max_threads > 1:
+        sections = _helpers.MapConcurrently(RenderModule, modules, max_threads)
+      else:
+        sections = (RenderModule(module) for module in modules)
+      for lines in sections:
+        yield lines
       if include_special_flags:
-        self.__RenderModuleFlags('gflags',
-                                 _helpers.SPECIAL_FLAGS.FlagDict().values(),
-                                 helplist)
+        flags = list(_helpers.SPECIAL_FLAGS.FlagDict().values())
+        if matches is not None:
+          flags = [flag for flag in flags if flag in matches]
+        lines = []
+        if flags:
+          self.__RenderModuleFlags('gflags', flags, lines, width=width,
+                                   store_cache=store_cache)
+        yield lines
     else:
       # Just print one long list of flags.
-      values = self.FlagDict().values()
+      values = list(self.FlagDict().values())
       if include_special_flags:
-        values.append(_helpers.SPECIAL_FLAGS.FlagDict().values())
-      self.__RenderFlagList(values, helplist, prefix)
+        values.extend(_helpers.SPECIAL_FLAGS.FlagDict().values())
+      if matches is not None:
+        values = [flag for flag in values if flag in matches]
+      lines = []
+      self.__RenderFlagList(values, lines, prefix, width, store_cache)
+      yield lines
+
+  def search(self, query):
+    """Returns the flags whose name, short name, help or module matches query.
+
+    The fields of every flag are searched with re.MULTILINE, each as a single
+    line, so that e.g. '^dns_' matches the flags whose name starts with
+    'dns_'.  The special flags are searched too, as flags of module 'gflags'.
+    The index of the searched text is built at the first search and dropped
+    whenever flags are registered or removed.
 
-    return '\n'.join(helplist)
+    Args:
+      query: str, a regular expression, or a compiled regular expression.
 
-  def __RenderModuleFlags(self, module, flags, output_lines, prefix=''):
+    Returns:
+      A list of Flag objects sorted by name, without duplicates.
+
+    Raises:
+      re.error: if query is not a valid regular expression.
+    """
+    if isinstance(query, six.string_types):
+      query = re.compile(query, re.MULTILINE)
+    text, offsets, flags, fields = self.__GetSearchIndex()
+    matches = []
+    position = 0
+    while True:
+      match = query.search(text, position)
+      if match is None:
+        break
+      entry = bisect.bisect_right(offsets, match.start()) - 1
+      # Matches across a line break (e.g. with '\s') may span two fields:
+      # check the fields of the flag one by one in that case.
+      if ('\n' not in match.group() or
+          any(query.search(field) for field in fields[entry])):
+        matches.append(flags[entry])
+      if entry + 1 == len(offsets):
+        break
+      position = offsets[entry + 1]
+    return matches
+
+  def __GetSearchIndex(self):
+    """Returns the index searched by search(), built if needed."""
+    index = self.__dict__['__search_index']
+    if index is not None:
+      return index
+    modules_by_flag = {}
+    for module, flags in six.iteritems(self.FlagsByModuleDict()):
+      for flag in flags:
+        modules_by_flag.setdefault(flag, module)
+    flags = set(self.FlagDict().values())
+    for flag in _helpers.SPECIAL_FLAGS.FlagDict().values():
+      modules_by_flag.setdefault(flag, 'gflags')
+      flags.add(flag)
+    flags = sorted(flags, key=lambda flag: flag.name)
+    fields = []
+    offsets = []
+    offset = 0
+    for flag in flags:
+      flag_fields = (flag.name, flag.short_name or '',
+                     ' '.join((flag.help or '').split()),
+                     modules_by_flag.get(flag, ''))
+      fields.append(flag_fields)
+      offsets.append(offset)
+      offset += sum(len(field) + 1 for field in flag_fields)
+    text = ''.join(field + '\n' for flag_fields in fields
+                   for field in flag_fields)
+    index = self.__dict__['__search_index'] = (text, offsets, flags, fields)
+    return index
+
+  def __RenderModuleFlags(self, module, flags, output_lines, prefix='',
+                          width=None, store_cache=True):
     """Generates a help string for a given module."""
     if not isinstance(module, str):
       module = module.__name__
     output_lines.append('\n%s%s:' % (prefix, module))
-    self.__RenderFlagList(flags, output_lines, prefix + '  ')
+    self.__RenderFlagList(flags, output_lines, prefix + '  ', width,
+                          store_cache)
 
-  def __RenderOurModuleFlags(self, module, output_lines, prefix=''):
-    """Generates a help string for a given module."""
-    flags = self._GetFlagsDefinedByModule(module)
+  def __RenderCachedModuleFlags(self, module, key_flags_only, output_lines,
+                                prefix, width, store_cache=True):
+    """Generates the help of the flags, or key flags, of a module.
+
+    The rendered lines are cached per module, help width and prefix.  A
+    cached entry is used only if the help inputs of its flags did not change
+    since it was rendered.
+
+    Args:
+      module: A module object or a module name (a string).
+      key_flags_only: bool, whether to render the key flags of the module
+        instead of the flags it defines.
+      output_lines: A list of strings.  The generated help message lines
+        will be appended to this list.
+      prefix: A string that is prepended to each generated help line.
+      width: int, maximal length of the help lines.
+      store_cache: bool, whether to cache the rendered help.  If False, only
+        valid cached help is used.
+    """
+    if not isinstance(module, str):
+      module = module.__name__
+    cache = self.__dict__['__module_help_cache']
+    key = (module, key_flags_only, width, prefix)
+    entry = cache.get(key)
+    if entry is None or any(_FlagHelpInputs(flag) != inputs
+                            for flag, inputs in entry[0]):
+      if key_flags_only:
+        flags = self._GetKeyFlagsForModule(module)
+      else:
+        flags = self._GetFlagsDefinedByModule(module)
+      lines = []
+      if flags:
+        self.__RenderModuleFlags(module, flags, lines, prefix, width,
+                                 store_cache)
+      if not store_cache:
+        output_lines.extend(lines)
+        return
+      entry = cache[key] = (
+          tuple((flag, _FlagHelpInputs(flag)) for flag in flags), lines)
+    output_lines.extend(entry[1])
+
+  def _InvalidateHelpCaches(self, flags=None):
+    """Drops the search index and the cached help of modules and flags.
+
+    Args:
+      flags: iterable of Flag objects whose cached help must be dropped, or
+        None to only drop the cached help of modules.
+    """
+    self.__dict__['__module_help_cache'].clear()
+    self.__dict__['__search_index'] = None
     if flags:
-      self.__RenderModuleFlags(module, flags, output_lines, prefix)
+      flag_help_cache = self.__dict__['__flag_help_cache']
+      for flag in flags:
+        flag_help_cache.pop(flag, None)
 
   def __RenderOurModuleKeyFlags(self, module, output_lines, prefix=''):
     """Generates a help string for the key flags of a given module.
@@ -907,9 +1634,8 @@ class FlagValues(object):
         lines will be appended to this list.
       prefix: A string that is prepended to each generated help line.
     """
-    key_flags = self._GetKeyFlagsForModule(module)
-    if key_flags:
-      self.__RenderModuleFlags(module, key_flags, output_lines, prefix)
+    self.__RenderCachedModuleFlags(module, True, output_lines, prefix,
+                                   _helpers.GetHelpWidth())
 
   def ModuleHelp(self, module):
     """Describe the key flags of a module.
@@ -932,9 +1658,12 @@ class FlagValues(object):
     """
     return self.ModuleHelp(sys.argv[0])
 
-  def __RenderFlagList(self, flaglist, output_lines, prefix='  '):
+  def __RenderFlagList(self, flaglist, output_lines, prefix='  ', width=None,
+                       store_cache=True):
     fl = self.FlagDict()
     special_fl = _helpers.SPECIAL_FLAGS.FlagDict()
+    if width is None:
+      width = _helpers.GetHelpWidth()
     flaglist = [(flag.name, flag) for flag in flaglist]
     flaglist.sort()
     flagset = {}
@@ -948,26 +1677,45 @@ class FlagValues(object):
       # only print help once
       if flag in flagset: continue
       flagset[flag] = 1
-      flaghelp = ''
-      if flag.short_name: flaghelp += '-%s,' % flag.short_name
-      if flag.boolean:
-        flaghelp += '--[no]%s:' % flag.name
-      else:
-        flaghelp += '--%s:' % flag.name
-      flaghelp += ' '
-      if flag.help:
-        flaghelp += flag.help
-      flaghelp = _helpers.TextWrap(
-          flaghelp, indent=prefix+'  ', firstline_indent=prefix)
-      if flag.default_as_str:
-        flaghelp += '\n'
-        flaghelp += _helpers.TextWrap(
-            '(default: %s)' % flag.default_as_str, indent=prefix+'  ')
-      if flag.parser.syntactic_help:
-        flaghelp += '\n'
-        flaghelp += _helpers.TextWrap(
-            '(%s)' % flag.parser.syntactic_help, indent=prefix+'  ')
-      output_lines.append(flaghelp)
+      output_lines.append(
+          self.__RenderFlagHelp(flag, prefix, width, store_cache))
+
+  def __RenderFlagHelp(self, flag, prefix, width, store_cache=True):
+    """Returns the help of a flag, wrapped to width, from the cache if valid."""
+    flag_help_cache = self.__dict__['__flag_help_cache']
+    if store_cache:
+      cache = flag_help_cache.setdefault(flag, {})
+    else:
+      cache = flag_help_cache.get(flag, {})
+    key = (width, prefix)
+    inputs = _FlagHelpInputs(flag)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == inputs:
+      return entry[1]
+    flaghelp = ''
+    if flag.short_name: flaghelp += '-%s,' % flag.short_name
+    if flag.boolean:
+      flaghelp += '--[no]%s:' % flag.name
+    else:
+      flaghelp += '--%s:' % flag.name
+    flaghelp += ' '
+    if flag.help:
+      flaghelp += flag.help
+    flaghelp = _helpers.TextWrap(
+        flaghelp, length=width, indent=prefix+'  ', firstline_indent=prefix)
+    if flag.default_as_str:
+      flaghelp += '\n'
+      flaghelp += _helpers.TextWrap(
+          '(default: %s)' % flag.default_as_str, length=width,
+          indent=prefix+'  ')
+    if flag.parser.syntactic_help:
+      flaghelp += '\n'
+      flaghelp += _helpers.TextWrap(
+          '(%s)' % flag.parser.syntactic_help, length=width,
+          indent=prefix+'  ')
+    if store_cache:
+      cache[key] = (inputs, flaghelp)
+    return flaghelp
 
   def get_flag_value(self, name, default):  # pylint: disable=invalid-name
     """Returns the value of a flag (if not None) or a default value.
@@ -1131,20 +1879,23 @@ class FlagValues(object):
     --> In a flagfile, a line beginning with # or // is a comment.
     --> Entirely blank lines _should_ be ignored.
     """
-    rest_of_args = argv
+    # Walk the arguments with an index: slicing off the first argument at
+    # each step makes long command lines quadratic.
+    args = list(argv)
+    index = 0
     new_argv = []
-    while rest_of_args:
-      current_arg = rest_of_args[0]
-      rest_of_args = rest_of_args[1:]
+    while index < len(args):
+      current_arg = args[index]
+      index += 1
       if self.__IsFlagFileDirective(current_arg):
         # This handles the case of -(-)flagfile foo.  In this case the
         # next arg really is part of this one.
         if current_arg == '--flagfile' or current_arg == '-flagfile':
-          if not rest_of_args:
+          if index == len(args):
             raise exceptions.IllegalFlagValueError(
                 '--flagfile with no argument')
-          flag_filename = os.path.expanduser(rest_of_args[0])
-          rest_of_args = rest_of_args[1:]
+          flag_filename = os.path.expanduser(args[index])
+          index += 1
         else:
           # This handles the case of (-)-flagfile=foo.
           flag_filename = self.ExtractFilename(current_arg)
@@ -1160,18 +1911,16 @@ class FlagValues(object):
             break
         else:
           if ('=' not in current_arg and
-              rest_of_args and not rest_of_args[0].startswith('-')):
+              index < len(args) and not args[index].startswith('-')):
             # If this is an occurence of a legitimate --x y, skip the value
             # so that it won't be mistaken for a standalone arg.
             fl = self.FlagDict()
             name = current_arg.lstrip('-')
             if name in fl and not fl[name].boolean:
-              current_arg = rest_of_args[0]
-              rest_of_args = rest_of_args[1:]
-              new_argv.append(current_arg)
+              new_argv.append(args[index])
+              index += 1
 
-    if rest_of_args:
-      new_argv.extend(rest_of_args)
+    new_argv.extend(args[index:])
 
     return new_argv
 
@@ -1207,7 +1956,7 @@ class FlagValues(object):
     with open(filename, 'a') as out_file:
       out_file.write(self.FlagsIntoString())
 
-  def WriteHelpInXMLFormat(self, outfile=None):
+  def WriteHelpInXMLFormat(self, outfile=None, max_threads=1):
     """Outputs flag documentation in XML format.
 
     NOTE: We use element names that are consistent with those used by
@@ -1217,44 +1966,109 @@ class FlagValues(object):
     interfere / overlap with existing XML elements used by the C++
     library.  Please maintain this consistency.
 
+    The document is written to outfile flag by flag, without building it
+    in memory; the output is the same as the one of minidom's toprettyxml.
+
     Args:
       outfile: File object we write to.  Default None means sys.stdout.
+      max_threads: int, maximal number of threads rendering the elements of
+        the flags of different modules concurrently, see write_help().  The
+        elements of a module are then buffered until they are written.
     """
+    outfile = outfile or sys.stdout
+    if six.PY2:
+      writer = codecs.getwriter('utf-8')(outfile)
+    else:
+      writer = outfile
+    # Only the extra elements of the flags are built as DOM nodes; the
+    # document is just their factory and never holds any of them.
     doc = minidom.Document()
-    all_flag = doc.createElement('AllFlags')
-    doc.appendChild(all_flag)
-
-    all_flag.appendChild(_helpers.CreateXMLDOMElement(
-        doc, 'program', os.path.basename(sys.argv[0])))
+    writer.write(u'<?xml version="1.0" encoding="utf-8"?>\n<AllFlags>\n')
+    _helpers.WriteXMLElement(
+        writer, 'program', os.path.basename(sys.argv[0]), '  ')
 
     usage_doc = sys.modules['__main__'].__doc__
     if not usage_doc:
       usage_doc = '\nUSAGE: %s [flags]\n' % sys.argv[0]
     else:
       usage_doc = usage_doc.replace('%s', sys.argv[0])
-    all_flag.appendChild(_helpers.CreateXMLDOMElement(doc, 'usage', usage_doc))
+    _helpers.WriteXMLElement(writer, 'usage', usage_doc, '  ')
 
-    # Get list of key flags for the main module.
-    key_flags = self._GetKeyFlagsForModule(sys.argv[0])
+    # Get the set of key flags for the main module.
+    key_flags = set(self._GetKeyFlagsForModule(sys.argv[0]))
 
     # Sort flags by declaring module name and next by flag name.
     flags_by_module = self.FlagsByModuleDict()
     all_module_names = list(flags_by_module.keys())
     all_module_names.sort()
-    for module_name in all_module_names:
+
+    def WriteModuleFlags(module_name, module_writer):
       flag_list = [(f.name, f) for f in flags_by_module[module_name]]
       flag_list.sort()
       for unused_flag_name, flag in flag_list:
-        is_key = flag in key_flags
-        all_flag.appendChild(flag._create_xml_dom_element(  # pylint: disable=protected-access
-            doc, module_name, is_key=is_key))
+        flag._write_xml(  # pylint: disable=protected-access
+            module_writer, doc, module_name, is_key=flag in key_flags)
+
+    if max_threads > 1:
+      def RenderModuleFlags(module_name):
+        module_writer = six.StringIO()
+        WriteModuleFlags(module_name, module_writer)
+        return module_writer.getvalue()
+
+      for text in _helpers.MapConcurrently(
+          RenderModuleFlags, all_module_names, max_threads):
+        writer.write(text)
+    else:
+      for module_name in all_module_names:
+        WriteModuleFlags(module_name, writer)
 
+    writer.write(u'</AllFlags>\n')
+    outfile.flush()
+
+  def write_schema_json(self, outfile=None):
+    """Outputs the schema of the flags as a JSON object.
+
+    The object has a "version" field, the version of the format, a "flags"
+    field, the list of the flags sorted by module and name, and a
+    "fingerprint" field, the SHA-256 hex digest of the definitions of the
+    flags: the schema can be cached by fingerprint, which does not depend on
+    the current values.
+
+    Each flag is an object with the fields name, short_name, type, help,
+    default, current, module and key (whether it is a key flag of the main
+    module), plus lower_bound, upper_bound, enum_values and list_separators
+    when the parser has them.  The default and current fields are parsed
+    values; arrays are written as lists, and the values that JSON cannot
+    represent as strings.
+
+    The flags are written to outfile one at a time, in a single pass.  The
+    fingerprint is computed while they are written, so it is the last field
+    of the object: readers must not expect it before the flags.
+
+    Args:
+      outfile: File object we write to.  Default None means sys.stdout.
+    """
     outfile = outfile or sys.stdout
-    if six.PY2:
-      outfile.write(doc.toprettyxml(indent='  ', encoding='utf-8'))
-    else:
-      outfile.write(
-          doc.toprettyxml(indent='  ', encoding='utf-8').decode('utf-8'))
+    key_flags = set(self._GetKeyFlagsForModule(sys.argv[0]))
+    flags_by_module = self.FlagsByModuleDict()
+    fingerprint = hashlib.sha256(
+        ('%d\n' % _SCHEMA_VERSION).encode('ascii'))
+    outfile.write('{"version": %d, "flags": [' % _SCHEMA_VERSION)
+    separator = '\n'
+    for module_name in sorted(flags_by_module):
+      for flag in sorted(flags_by_module[module_name], key=lambda f: f.name):
+        definition = json.dumps(
+            flag._schema_fields(  # pylint: disable=protected-access
+                module_name, flag in key_flags),
+            sort_keys=True, default=_EncodeSchemaValue)
+        fingerprint.update(definition.encode('ascii') + b'\n')
+        # Appends the current value to the definition object.
+        outfile.write('%s%s, "current": %s}' % (
+            separator, definition[:-1],
+            json.dumps(flag.value, sort_keys=True,
+                       default=_EncodeSchemaValue)))
+        separator = ',\n'
+    outfile.write('\n], "fingerprint": "%s"}\n' % fingerprint.hexdigest())
     outfile.flush()
 
   # New PEP8 style functions.
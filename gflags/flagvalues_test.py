@@ -0,0 +1,753 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Unittest for flagvalues module."""
+
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+from xml.dom import minidom
+
+import gflags
+from gflags import _helpers
+from gflags.flags_modules_for_testing import module_foo
+
+
+class FlagValuesExportTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_string('name', 'default', 'help', short_name='n',
+                         flag_values=self.fv)
+    gflags.DEFINE_integer('count', 3, 'help', flag_values=self.fv)
+    gflags.DEFINE_string('nothing', None, 'help', flag_values=self.fv)
+    gflags.DEFINE_string('other', 'x', 'help', flag_values=self.fv,
+                         module_name='other.module')
+    self.fv(['program', '--count=5'])
+
+  def testIterFlagValuesSkipsShortNames(self):
+    self.assertEqual(
+        [('name', 'default'), ('count', 5), ('nothing', None), ('other', 'x')],
+        list(self.fv.iter_flag_values()))
+
+  def testIterFlagValuesOnlyNonDefault(self):
+    self.assertEqual([('count', 5)],
+                     list(self.fv.iter_flag_values(only_non_default=True)))
+
+  def testIterFlagValuesByModule(self):
+    self.assertEqual([('other', 'x')],
+                     list(self.fv.iter_flag_values(modules=['other.module'])))
+    self.assertEqual([], list(self.fv.iter_flag_values(modules=[module_foo])))
+
+  def testIterFlagValuesByModuleSkipsDeletedFlags(self):
+    del self.fv.other
+    self.assertEqual([],
+                     list(self.fv.iter_flag_values(modules=['other.module'])))
+
+  def testWriteFlagValues(self):
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    self.fv.write_flag_values(out)
+    self.assertEqual('--name=default\n--count=5\n--other=x\n', out.getvalue())
+
+  def testFlagValuesDictKeepsShortNames(self):
+    self.assertEqual(
+        {'name': 'default', 'n': 'default', 'count': 5, 'nothing': None,
+         'other': 'x'},
+        self.fv.FlagValuesDict())
+
+
+class IncrementalValidationTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    self.calls = []
+    for name in ('a', 'b', 'c'):
+      gflags.DEFINE_integer(name, 0, 'help', flag_values=self.fv)
+      gflags.register_validator(name, self._MakeChecker(name),
+                                flag_values=self.fv)
+
+  def _MakeChecker(self, name):
+
+    def Checker(value):
+      self.calls.append(name)
+      return value >= 0
+
+    return Checker
+
+  def testFirstParseVerifiesAllValidators(self):
+    self.fv(['program'])
+    self.assertEqual(['a', 'b', 'c'], self.calls)
+
+  def testLaterParsesVerifyOnlyChangedFlags(self):
+    self.fv(['program'])
+    del self.calls[:]
+    self.fv(['program', '--b=3'])
+    self.assertEqual(['b'], self.calls)
+    del self.calls[:]
+    self.fv(['program'])
+    self.assertEqual([], self.calls)
+
+  def testChangedFlagFailsValidation(self):
+    self.fv(['program'])
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      self.fv, ['program', '--c=-1'])
+
+  def testNewValidatorIsVerifiedAtNextParse(self):
+    self.fv(['program'])
+    gflags.register_validator('a', lambda value: value > 0,
+                              flag_values=self.fv)
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv, ['program'])
+
+  def testMultiFlagsValidatorOrder(self):
+    gflags.register_multi_flags_validator(
+        ['a', 'c'], lambda values: self.calls.append('a,c') or True,
+        flag_values=self.fv)
+    self.fv(['program'])
+    del self.calls[:]
+    self.fv(['program', '--c=1', '--a=2'])
+    self.assertEqual(['a', 'c', 'a,c'], self.calls)
+
+  def testResetVerifiesAllValidatorsAgain(self):
+    self.fv(['program'])
+    self.fv.Reset()
+    del self.calls[:]
+    self.fv(['program'])
+    self.assertEqual(['a', 'b', 'c'], self.calls)
+
+  def testDeletedFlagValidatorsAreDropped(self):
+    self.fv(['program'])
+    del self.fv.b
+    del self.calls[:]
+    self.fv.validate_all()
+    self.assertEqual(['a', 'c'], self.calls)
+
+  def testValidateAll(self):
+    self.fv(['program'])
+    self.fv['a'].value = -5
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv.validate_all)
+
+  def testDirectlyAssignedValueIsVerifiedAtNextParse(self):
+    self.fv(['program'])
+    self.fv['a'].value = -5
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv, ['program'])
+
+  def testFailureIsReportedAgainAtNextParse(self):
+    self.fv(['program'])
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      self.fv, ['program', '--a=-1'])
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv, ['program'])
+    self.fv(['program', '--a=1'])
+    self.fv(['program'])
+
+  def testCollectedFailureIsReportedAgainAtNextParse(self):
+    self.fv(['program'])
+    self.assertRaises(gflags.AggregateFlagsError, self.fv,
+                      ['program', '--a=-1'], collect_errors=True)
+    self.assertRaises(gflags.AggregateFlagsError, self.fv, ['program'],
+                      collect_errors=True)
+    self.fv(['program', '--a=1'])
+
+  def testOnlyDirectlyAssignedFlagsAreRecorded(self):
+    gflags.DEFINE_integer('d', None, 'help', flag_values=self.fv)
+    self.fv(['program', '--a=3'])
+    self.assertEqual(set(), self.fv._GetAssignedFlags())
+    other = gflags.FlagValues()
+    gflags.DEFINE_integer('x', None, 'help', flag_values=other)
+    other['x'].value = 1
+    self.assertEqual(set(), self.fv._GetAssignedFlags())
+    self.assertEqual(set([other['x']]), other._GetAssignedFlags())
+
+  def testValidateAllReusesIndex(self):
+    self.fv.validate_all()
+    validators = self.fv._GetSortedValidators()
+    self.fv.validate_all()
+    self.assertIs(validators, self.fv._GetSortedValidators())
+
+  def testOtherFlagValuesAreNotAffected(self):
+    other = gflags.FlagValues()
+    gflags.DEFINE_integer('x', 0, 'help', flag_values=other)
+    gflags.register_validator('x', self._MakeChecker('x'), flag_values=other)
+    other(['program'])
+    del self.calls[:]
+    gflags.register_validator('a', lambda value: True, flag_values=self.fv)
+    other(['program'])
+    self.assertEqual([], self.calls)
+
+  def testValidatorOfSharedFlagIsVerifiedEverywhere(self):
+    other = gflags.FlagValues()
+    other['a'] = self.fv['a']
+    other(['program'])
+    gflags.register_validator('a', lambda value: value > 0,
+                              flag_values=self.fv)
+    self.assertRaises(gflags.IllegalFlagValueError, other, ['program'])
+
+
+class ReadFlagsFromFilesTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_string('name', None, 'help', flag_values=self.fv)
+    gflags.DEFINE_boolean('verbose', False, 'help', flag_values=self.fv)
+
+  def testFlagValuesAreNotMistakenForArguments(self):
+    self.assertEqual(
+        ['--name', 'x', '--verbose', 'arg', '--', '--flagfile=f'],
+        self.fv.ReadFlagsFromFiles(
+            ['--name', 'x', '--verbose', 'arg', '--', '--flagfile=f']))
+
+  def testStopsAtFirstArgumentWithoutGnuGetopt(self):
+    self.assertEqual(
+        ['arg', '--flagfile=f'],
+        self.fv.ReadFlagsFromFiles(['arg', '--flagfile=f'], force_gnu=False))
+
+  def testMissingFlagFileName(self):
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      self.fv.ReadFlagsFromFiles, ['--flagfile'])
+
+
+class HelpCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_string('name', 'default', 'Name.', flag_values=self.fv,
+                         module_name='main.module')
+    gflags.DEFINE_integer('count', 3, 'Count.', flag_values=self.fv,
+                          module_name='other.module')
+    self.wrapped = []
+    text_wrap = _helpers.TextWrap
+
+    def CountingTextWrap(text, *args, **kwargs):
+      self.wrapped.append(text)
+      return text_wrap(text, *args, **kwargs)
+
+    _helpers.TextWrap = CountingTextWrap
+    self.addCleanup(setattr, _helpers, 'TextWrap', text_wrap)
+
+  def testRepeatedCallsDoNotWrapAgain(self):
+    help_text = self.fv.GetHelp()
+    self.assertTrue(self.wrapped)
+    del self.wrapped[:]
+    self.assertEqual(help_text, self.fv.GetHelp())
+    self.assertEqual('\nother.module:\n  --count: Count.\n'
+                     '    (default: \'3\')\n    (an integer)',
+                     self.fv.ModuleHelp('other.module'))
+    self.assertEqual([], self.wrapped)
+
+  def testSetDefault(self):
+    self.fv.GetHelp()
+    self.fv.SetDefault('count', 5)
+    self.assertIn("(default: '5')", self.fv.GetHelp())
+
+  def testRegisteredAndRemovedFlags(self):
+    self.fv.GetHelp()
+    gflags.DEFINE_string('late', None, 'Late.', flag_values=self.fv,
+                         module_name='other.module')
+    self.assertIn('--late: Late.', self.fv.GetHelp())
+    del self.fv.late
+    self.assertNotIn('--late', self.fv.GetHelp())
+
+  def testChangedHelpIsRenderedAgain(self):
+    self.fv.GetHelp()
+    self.fv['count'].help = 'Changed.'
+    self.assertIn('--count: Changed.', self.fv.GetHelp())
+
+  def testWriteHelpStreamsModules(self):
+    writes = []
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    out_write = out.write
+    out.write = lambda text: writes.append(text) or out_write(text)
+    self.fv.write_help(out)
+    self.assertEqual(self.fv.GetHelp(), out.getvalue())
+    self.assertEqual(['\n', '\n'], writes[1::2])
+    self.assertEqual(
+        ['main.module', 'other.module', 'gflags'],
+        [section.split(':', 1)[0].strip() for section in writes[::2]])
+    self.assertIn('--count: Count.', writes[2])
+    self.assertNotIn('--count', writes[0])
+
+  def testWriteHelpDoesNotFillCaches(self):
+    self.fv.write_help(io.StringIO() if str is not bytes else io.BytesIO())
+    self.assertEqual({}, self.fv.__dict__['__module_help_cache'])
+    self.assertEqual({}, self.fv.__dict__['__flag_help_cache'])
+    help_text = self.fv.GetHelp()
+    del self.wrapped[:]
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    self.fv.write_help(out)
+    self.assertEqual(help_text, out.getvalue())
+    self.assertEqual([], self.wrapped)
+
+  def testHelpWithoutModules(self):
+    fv = gflags.FlagValues()
+    fv['solo'] = gflags.Flag(gflags.ArgumentParser(),
+                             gflags.ArgumentSerializer(), 'solo', 'x', 'Solo.')
+    self.assertEqual("> --solo: Solo.\n>   (default: 'x')",
+                     fv.GetHelp(prefix='> ', include_special_flags=False))
+
+
+class SearchTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_string('dns_server', 'a', 'The DNS server.', short_name='d',
+                         flag_values=self.fv)
+    gflags.DEFINE_integer('dns_ttl', 3, 'Time to live\nof DNS answers.',
+                          flag_values=self.fv, module_name='net.dns')
+    gflags.DEFINE_integer('port', 3, 'Port number.', flag_values=self.fv)
+
+  def _Search(self, query):
+    return [flag.name for flag in self.fv.search(query)]
+
+  def testFields(self):
+    self.assertEqual(['dns_server', 'dns_ttl'], self._Search('^dns_'))
+    self.assertEqual(['dns_server'], self._Search('^d$'))
+    self.assertEqual(['dns_ttl'], self._Search('live of'))
+    self.assertEqual(['dns_ttl'], self._Search('^net'))
+    self.assertEqual(['flagfile'], self._Search('^flagfile$'))
+
+  def testMatchesDoNotSpanFields(self):
+    self.assertEqual([], self._Search(r'answers\s+net'))
+    self.assertEqual(['dns_ttl'], self._Search(r'answers\.$'))
+
+  def testIndexIsRebuiltAfterRegistration(self):
+    self.assertEqual([], self._Search('timeout'))
+    gflags.DEFINE_integer('timeout', 3, 'Timeout.', flag_values=self.fv)
+    self.assertEqual(['timeout'], self._Search('timeout'))
+    del self.fv.timeout
+    self.assertEqual([], self._Search('timeout'))
+
+  def testWriteHelpOfMatchingFlags(self):
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    self.fv.write_help(out, query='ttl')
+    self.assertEqual("\nnet.dns:\n  --dns_ttl: Time to live\n    of DNS "
+                     "answers.\n    (default: '3')\n    (an integer)",
+                     out.getvalue())
+
+  def testHelpSearchFlag(self):
+    self.assertEqual(['program', 'arg'],
+                     self.fv(['program', '--helpsearch', '^port$', 'arg']))
+    self.assertEqual('^port$', self.fv.help_search_query())
+    self.fv(['program'])
+    self.assertIsNone(self.fv.help_search_query())
+
+  def testHelpSearchFlagWithKnownOnly(self):
+    self.assertEqual(
+        ['program', '--helpsearch', 'port', '--other', 'arg'],
+        self.fv(['program', '--helpsearch', 'port', '--port=4', '--other',
+                 'arg'], known_only=True))
+    self.assertEqual(4, self.fv.port)
+    self.assertEqual('port', self.fv.help_search_query())
+
+  def testInvalidHelpSearch(self):
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv,
+                      ['program', '--helpsearch=('])
+
+
+class ConcurrentHelpTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    for i in range(40):
+      gflags.DEFINE_integer('flag%d' % i, i, 'Help of flag %d. ' % i * 10,
+                            flag_values=self.fv,
+                            module_name='module%d' % (i % 7))
+
+  def testHelpIsIdentical(self):
+    expected = self.fv.GetHelp()
+    self.fv._InvalidateHelpCaches(self.fv.FlagDict().values())
+    self.assertEqual(expected, self.fv.GetHelp(max_threads=4))
+
+  def testXmlIsIdentical(self):
+    outputs = []
+    for max_threads in (1, 4):
+      out = io.StringIO() if str is not bytes else io.BytesIO()
+      self.fv.WriteHelpInXMLFormat(out, max_threads=max_threads)
+      outputs.append(out.getvalue())
+    self.assertEqual(outputs[0], outputs[1])
+
+
+def _MinidomXml(fv):
+  """Returns the XML help of fv, as minidom pretty prints it."""
+  doc = minidom.Document()
+  all_flag = doc.createElement('AllFlags')
+  doc.appendChild(all_flag)
+  all_flag.appendChild(_helpers.CreateXMLDOMElement(
+      doc, 'program', os.path.basename(sys.argv[0])))
+  usage_doc = sys.modules['__main__'].__doc__
+  if not usage_doc:
+    usage_doc = '\nUSAGE: %s [flags]\n' % sys.argv[0]
+  else:
+    usage_doc = usage_doc.replace('%s', sys.argv[0])
+  all_flag.appendChild(_helpers.CreateXMLDOMElement(doc, 'usage', usage_doc))
+  key_flags = fv._GetKeyFlagsForModule(sys.argv[0])
+  flags_by_module = fv.FlagsByModuleDict()
+  for module_name in sorted(flags_by_module):
+    for flag in sorted(flags_by_module[module_name], key=lambda f: f.name):
+      all_flag.appendChild(flag._create_xml_dom_element(
+          doc, module_name, is_key=flag in key_flags))
+  xml = doc.toprettyxml(indent='  ', encoding='utf-8')
+  return xml if str is bytes else xml.decode('utf-8')
+
+
+class _ExtraElementFlag(gflags.Flag):
+
+  def _extra_xml_dom_elements(self, doc):
+    element = doc.createElement('extra')
+    element.setAttribute('kind', 'a&"b')
+    element.appendChild(_helpers.CreateXMLDOMElement(doc, 'nested', '<x>'))
+    return [element]
+
+
+class _OverriddenElementFlag(gflags.Flag):
+
+  def _create_xml_dom_element(self, doc, module_name, is_key=False):
+    return _helpers.CreateXMLDOMElement(doc, 'custom', self.name)
+
+
+class StreamingXmlTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_string('text', u'a&b<c>"d\' \x01\u00e9\u4e2d',
+                         u'H\u00e9lp & <more>', short_name='t',
+                         flag_values=self.fv)
+    gflags.DEFINE_string('nohelp', '', '', flag_values=self.fv)
+    gflags.DEFINE_string('none', None, 'No default.', flag_values=self.fv)
+    gflags.DEFINE_boolean('verbose', True, 'Bool.', flag_values=self.fv,
+                          module_name='other')
+    gflags.DEFINE_integer('count', 3, 'Int.', lower_bound=0, upper_bound=10,
+                          flag_values=self.fv, module_name='other')
+    gflags.DEFINE_float('ratio', 0.5, 'Float.', lower_bound=0.0,
+                        flag_values=self.fv)
+    gflags.DEFINE_enum('mode', 'a', ['a', 'b'], 'Enum.', flag_values=self.fv)
+    gflags.DEFINE_multi_enum('modes', ['a'], ['a', 'b'], 'Multi enum.',
+                             flag_values=self.fv)
+    gflags.DEFINE_list('names', 'x,y', 'List.', flag_values=self.fv)
+    gflags.DEFINE_spaceseplist('words', 'x y', 'Words.', flag_values=self.fv)
+    gflags.DEFINE_multi_integer('ints', [1, 2], 'Multi int.', lower_bound=0,
+                                flag_values=self.fv)
+    gflags.DEFINE_int_list('int_list', '1,2', 'Int list.',
+                           upper_bound=5, flag_values=self.fv)
+    gflags.DEFINE_json('config', {'a': [1, '<b>']}, 'Json.',
+                       flag_values=self.fv)
+    gflags.DEFINE_flag(_ExtraElementFlag(
+        gflags.ArgumentParser(), gflags.ArgumentSerializer(), 'extra', 'e',
+        'Extra.'), flag_values=self.fv)
+    gflags.DEFINE_flag(_OverriddenElementFlag(
+        gflags.ArgumentParser(), gflags.ArgumentSerializer(), 'overridden',
+        'o', 'Overridden.'), flag_values=self.fv)
+    self.fv._RegisterKeyFlagForModule(sys.argv[0], self.fv['count'])
+    self.fv._RegisterKeyFlagForModule(sys.argv[0], self.fv['text'])
+
+  def _WriteXml(self, **kwargs):
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    self.fv.WriteHelpInXMLFormat(out, **kwargs)
+    return out.getvalue()
+
+  def testOutputIsIdenticalToMinidom(self):
+    self.fv(['program', '--text=x\x02&y', '--ints=7', '--modes=b'])
+    expected = _MinidomXml(self.fv)
+    self.assertEqual(expected, self._WriteXml())
+    self.assertEqual(expected, self._WriteXml(max_threads=4))
+
+  def testOutputIsWrittenIncrementally(self):
+    writes = []
+
+    class RecordingFile(object):
+
+      def write(self, text):
+        writes.append(text)
+
+      def flush(self):
+        pass
+
+    self.fv.WriteHelpInXMLFormat(RecordingFile())
+    self.assertEqual(_MinidomXml(self.fv), ''.join(writes))
+    self.assertGreater(len(writes), len(self.fv.FlagDict()))
+
+
+class SchemaJsonTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_integer('count', 3, 'Int.', lower_bound=0, short_name='c',
+                          flag_values=self.fv, module_name='module_b')
+    gflags.DEFINE_multi_enum('modes', 'a', ['a', 'b'], 'Modes.',
+                             flag_values=self.fv, module_name='module_a')
+    gflags.DEFINE_list('names', 'x,y', 'Names.', flag_values=self.fv,
+                       module_name='module_a')
+    gflags.DEFINE_int_list('ints', '1 2', 'Ints.', upper_bound=5,
+                           flag_values=self.fv, module_name='module_b')
+    gflags.DEFINE_json('config', '{"a": [1]}', 'Config.',
+                       flag_values=self.fv, module_name='module_b')
+    self.fv._RegisterKeyFlagForModule(sys.argv[0], self.fv['count'])
+    self.fv(['program', '--count=5', '--modes=b', '--modes=a'])
+
+  def _WriteSchema(self):
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    self.fv.write_schema_json(out)
+    return json.loads(out.getvalue())
+
+  def testFields(self):
+    schema = self._WriteSchema()
+    self.assertEqual(1, schema['version'])
+    flags = schema['flags']
+    self.assertEqual(['modes', 'names', 'config', 'count', 'ints'],
+                     [flag['name'] for flag in flags])
+    self.assertEqual(
+        {'name': 'count', 'short_name': 'c', 'type': 'int', 'help': 'Int.',
+         'default': 3, 'current': 5, 'module': 'module_b', 'key': True,
+         'lower_bound': 0},
+        flags[3])
+    self.assertEqual(['a'], flags[0]['default'])
+    self.assertEqual(['b', 'a'], flags[0]['current'])
+    self.assertEqual(['a', 'b'], flags[0]['enum_values'])
+    self.assertFalse(flags[0]['key'])
+    self.assertEqual([','], flags[1]['list_separators'])
+    self.assertEqual({'a': [1]}, flags[2]['default'])
+    self.assertEqual([1, 2], flags[4]['current'])
+    self.assertEqual(5, flags[4]['upper_bound'])
+    self.assertNotIn('lower_bound', flags[4])
+    self.assertIn(',', flags[4]['list_separators'])
+
+  def testFieldOrder(self):
+    out = io.StringIO() if str is not bytes else io.BytesIO()
+    self.fv.write_schema_json(out)
+    schema = json.loads(out.getvalue(), object_pairs_hook=lambda pairs: pairs)
+    self.assertEqual(['version', 'flags', 'fingerprint'],
+                     [key for key, _ in schema])
+
+  def testFingerprintIgnoresCurrentValues(self):
+    fingerprint = self._WriteSchema()['fingerprint']
+    self.fv(['program', '--count=7'])
+    self.assertEqual(fingerprint, self._WriteSchema()['fingerprint'])
+    self.fv.SetDefault('count', 4)
+    self.assertNotEqual(fingerprint, self._WriteSchema()['fingerprint'])
+
+
+class KeyFlagsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    for name in ('c', 'a', 'b'):
+      gflags.DEFINE_string(name, '', 'help', flag_values=self.fv,
+                           module_name='other')
+    gflags.DEFINE_string('own', '', 'help', flag_values=self.fv,
+                         module_name='main')
+
+  def testOrderIsKeptAndDuplicatesAreDropped(self):
+    for name in ('b', 'own', 'c', 'b', 'a', 'c'):
+      self.fv._RegisterKeyFlagForModule('main', self.fv[name])
+    self.assertEqual(['b', 'own', 'c', 'a'],
+                     [f.name for f in self.fv.KeyFlagsByModuleDict()['main']])
+    self.assertEqual(['own', 'b', 'c', 'a'],
+                     [f.name for f in self.fv._GetKeyFlagsForModule('main')])
+
+  def testDeletedFlagCanBeKeyAgain(self):
+    self.fv._RegisterKeyFlagForModule('main', self.fv['a'])
+    del self.fv.a
+    self.assertEqual([], self.fv.KeyFlagsByModuleDict()['main'])
+    gflags.DEFINE_string('a', '', 'help', flag_values=self.fv,
+                         module_name='other')
+    self.fv._RegisterKeyFlagForModule('main', self.fv['a'])
+    self.assertEqual(['a'],
+                     [f.name for f in self.fv.KeyFlagsByModuleDict()['main']])
+
+
+class CollectErrorsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_integer('count', 0, 'help', flag_values=self.fv)
+    gflags.DEFINE_integer('size', 0, 'help', flag_values=self.fv)
+    gflags.DEFINE_string('name', 'x', 'help', flag_values=self.fv)
+    gflags.register_validator('size', lambda value: value < 10,
+                              message='size too big', flag_values=self.fv)
+    gflags.register_validator('name', lambda value: value != 'bad',
+                              message='bad name', flag_values=self.fv)
+
+  def testAllErrorsAreReported(self):
+    try:
+      self.fv(['program', '--count=abc', '--size=20', '--nmae=y',
+               '--name=bad', '--unknown'], collect_errors=True)
+    except gflags.AggregateFlagsError as e:
+      errors = e.errors
+    else:
+      self.fail('AggregateFlagsError not raised')
+    self.assertEqual(
+        [gflags.IllegalFlagValueError, gflags.UnrecognizedFlagError,
+         gflags.UnrecognizedFlagError, gflags.IllegalFlagValueError,
+         gflags.IllegalFlagValueError],
+        [type(error) for error in errors])
+    self.assertEqual('nmae', errors[1].flagname)
+    self.assertIn('name', str(errors[1]))
+    self.assertIn('size too big', str(errors[3]))
+    self.assertIn('bad name', str(errors[4]))
+    self.assertEqual(20, self.fv['size'].value)
+
+  def testNoErrors(self):
+    self.assertEqual(
+        ['program', 'arg'],
+        self.fv(['program', '--size=3', 'arg'], collect_errors=True))
+    self.assertEqual(3, self.fv.size)
+
+  def testFailedValidatorsAreReportedAgain(self):
+    self.assertRaises(gflags.AggregateFlagsError, self.fv,
+                      ['program', '--size=20'], collect_errors=True)
+    self.assertRaises(gflags.AggregateFlagsError, self.fv, ['program'],
+                      collect_errors=True)
+
+  def testValidatorsOfUnparsableFlagsAreSkipped(self):
+    gflags.DEFINE_integer('level', None, 'help', flag_values=self.fv)
+    gflags.mark_flag_as_required('level', flag_values=self.fv)
+    for argv in (['program', '--level=abc'],
+                 ['program', '--level=1', '--level=abc']):
+      with self.assertRaises(gflags.AggregateFlagsError) as cm:
+        self.fv(argv, collect_errors=True)
+      self.assertEqual(1, len(cm.exception.errors))
+      self.assertIn('--level=abc', str(cm.exception.errors[0]))
+    self.fv(['program', '--level=2'], collect_errors=True)
+    self.assertEqual(2, self.fv.level)
+
+  def testDefaultModeRaisesFirstError(self):
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv,
+                      ['program', '--count=abc', '--unknown'])
+
+
+class IndependentValidatorsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_integer('a', 0, 'help', flag_values=self.fv)
+    gflags.DEFINE_integer('b', 0, 'help', flag_values=self.fv)
+
+  def testValidatorsRunConcurrently(self):
+    events = [threading.Event(), threading.Event()]
+
+    def MakeChecker(index):
+
+      def Checker(unused_value):
+        events[index].set()
+        return events[1 - index].wait(5) is not False
+
+      return Checker
+
+    gflags.register_validator('a', MakeChecker(0), independent=True,
+                              flag_values=self.fv)
+    gflags.register_validator('b', MakeChecker(1), independent=True,
+                              flag_values=self.fv)
+    self.fv(['program'])
+    self.assertTrue(events[0].is_set() and events[1].is_set())
+
+  def testFirstFailureByInsertionOrderWins(self):
+
+    def SlowFailure(unused_value):
+      time.sleep(0.05)
+      return False
+
+    gflags.register_validator('a', SlowFailure, message='first',
+                              independent=True, flag_values=self.fv)
+    gflags.register_validator('b', lambda value: False, message='second',
+                              independent=True, flag_values=self.fv)
+    with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+      self.fv(['program'])
+    self.assertIn('first', str(cm.exception))
+
+  def testSequentialValidatorFailsBeforeLaterIndependentOnes(self):
+    gflags.register_validator('a', lambda value: False, message='sequential',
+                              flag_values=self.fv)
+    gflags.register_multi_flags_validator(
+        ['a', 'b'], lambda values: False, message='independent',
+        independent=True, flag_values=self.fv)
+    gflags.register_validator('b', lambda value: False, message='other',
+                              independent=True, flag_values=self.fv)
+    with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+      self.fv(['program'])
+    self.assertIn('sequential', str(cm.exception))
+
+  def testExceptionsOtherThanValidationErrorPropagate(self):
+
+    def Broken(unused_value):
+      raise KeyError('broken')
+
+    gflags.register_validator('a', Broken, independent=True,
+                              flag_values=self.fv)
+    gflags.register_validator('b', lambda value: True, independent=True,
+                              flag_values=self.fv)
+    self.assertRaises(KeyError, self.fv, ['program'])
+
+
+def _PositiveChecker(value):
+  return value > 0
+
+
+class ValidatorStatsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_integer('a', 1, 'help', flag_values=self.fv)
+    gflags.register_validator('a', _PositiveChecker, flag_values=self.fv)
+
+  def testDisabledByDefault(self):
+    self.fv(['program'])
+    self.assertEqual({}, self.fv.validator_stats())
+
+  def testRecordsCallsAndFailures(self):
+    self.fv.enable_validator_stats()
+    self.fv(['program', '--a=2'])
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      self.fv, ['program', '--a=-1'])
+    stats = self.fv.validator_stats()
+    key = (('a',), __name__ + '._PositiveChecker')
+    self.assertEqual([key], list(stats))
+    self.assertEqual(2, stats[key].calls)
+    self.assertEqual(1, stats[key].failures)
+    self.assertTrue(stats[key].seconds >= 0)
+
+  def testLogsSlowValidators(self):
+    self.fv.enable_validator_stats(log_threshold=-1)
+    logger = logging.getLogger()
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    try:
+      self.fv(['program'])
+    finally:
+      logger.removeHandler(handler)
+    self.assertEqual(1, len(records))
+    self.assertIn('_PositiveChecker (a)', records[0].getMessage())
+
+
+if __name__ == '__main__':
+  unittest.main()
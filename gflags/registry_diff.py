@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Differences between two flag registries.
+
+A registry is either a live FlagValues object, or a file with the flag
+documentation of a program: the JSON schema written by
+FlagValues.write_schema_json or the XML written by
+FlagValues.WriteHelpInXMLFormat.  For instance, to gate a release on the
+flags of the new version of a program:
+
+  diff = registry_diff.diff_registries('deployed_flags.json', FLAGS)
+  if diff.removed or diff.changed:
+    ...
+
+or, from the command line:
+
+  python -m gflags.registry_diff deployed_flags.json new_flags.json
+
+which writes the differences as a JSON object and exits with status 1 if
+there are any, 0 otherwise (like diff).
+
+The flags are indexed by name, so diffing takes time linear in the number of
+flags, plus the sorting of the names of the reported flags.  XML files are
+parsed incrementally.
+
+Default values and bounds are compared only when both registries hold them
+the same way: parsed values for FlagValues objects and JSON schemas, and
+strings in the command-line syntax for XML files.
+"""
+
+import collections
+import io
+import json
+import sys
+from xml.etree import ElementTree
+
+import six
+
+from gflags import flagvalues
+
+
+# The flag properties compared by diff_registries, in report order.
+_COMPARED_FIELDS = ('type', 'default', 'enum_values', 'lower_bound',
+                    'upper_bound')
+
+# The compared properties whose values are parsed in JSON schemas and
+# strings in XML files.
+_VALUE_FIELDS = frozenset(['default', 'lower_bound', 'upper_bound'])
+
+# Versions of the JSON schema that can be read.
+_SUPPORTED_SCHEMA_VERSIONS = frozenset([1])
+
+
+# A registry loaded by load_registry: flags is a dictionary, flag name ->
+# dictionary of the properties of the flag, as in the JSON schema; parsed
+# is False if the values of the properties in _VALUE_FIELDS are strings read
+# from XML.
+Registry = collections.namedtuple('Registry', ['flags', 'parsed'])
+
+# The change of a property of a flag defined by both registries.
+FlagChange = collections.namedtuple(
+    'FlagChange', ['name', 'field', 'old', 'new'])
+
+# The result of diff_registries.  added and removed are sorted lists of flag
+# names, changed a list of FlagChange sorted by flag name, and values_compared
+# whether the default values and bounds were compared.
+RegistryDiff = collections.namedtuple(
+    'RegistryDiff', ['added', 'removed', 'changed', 'values_compared'])
+
+
+def load_registry(source):
+  """Loads a registry.
+
+  Args:
+    source: A FlagValues object, a Registry (returned as is), or the path
+      of a JSON schema or XML file.
+
+  Returns:
+    A Registry.
+
+  Raises:
+    ValueError: if the file is neither a supported JSON schema nor XML, or is
+      malformed.
+    IOError: if the file cannot be read.
+  """
+  if isinstance(source, Registry):
+    return source
+  if isinstance(source, flagvalues.FlagValues):
+    schema = six.StringIO()
+    source.write_schema_json(schema)
+    return _LoadSchema(json.loads(schema.getvalue()))
+  with io.open(source, 'rb') as registry_file:
+    if registry_file.peek(64).lstrip().startswith(b'<'):
+      return _LoadXml(registry_file)
+    try:
+      schema = json.loads(registry_file.read().decode('utf-8'))
+    except ValueError as e:
+      raise ValueError('%s is neither a JSON schema nor XML: %s' % (source, e))
+  return _LoadSchema(schema)
+
+
+def _LoadSchema(schema):
+  """Returns the Registry of a decoded JSON schema."""
+  if not isinstance(schema, dict) or 'flags' not in schema:
+    raise ValueError('not a flag schema')
+  if schema.get('version') not in _SUPPORTED_SCHEMA_VERSIONS:
+    raise ValueError('unsupported flag schema version %r' %
+                     (schema.get('version'),))
+  flags = schema['flags']
+  if not isinstance(flags, list) or not all(
+      isinstance(flag, dict) and
+      isinstance(flag.get('name'), six.string_types) for flag in flags):
+    raise ValueError('malformed flag schema: "flags" must be a list of '
+                     'objects with a "name"')
+  return Registry(dict((flag['name'], flag) for flag in flags), True)
+
+
+def _LoadXml(xml_file):
+  """Returns the Registry of an XML file, parsed flag by flag."""
+  try:
+    return _ParseXml(xml_file)
+  except ElementTree.ParseError as e:
+    raise ValueError('malformed XML: %s' % e)
+
+
+def _ParseXml(xml_file):
+  """Same as _LoadXml, but raises ElementTree.ParseError on malformed XML."""
+  flags = {}
+  root = None
+  for event, element in ElementTree.iterparse(xml_file,
+                                              events=('start', 'end')):
+    if root is None:
+      root = element
+    if event != 'end' or element.tag != 'flag':
+      continue
+    fields = {}
+    for child in element:
+      text = child.text or ''
+      if child.tag == 'enum_value':
+        fields.setdefault('enum_values', []).append(text)
+      elif child.tag == 'file':
+        fields['module'] = text
+      elif child.tag == 'key':
+        fields['key'] = True
+      else:
+        fields[child.tag] = text
+    if 'name' in fields:
+      flags[fields['name']] = fields
+    # Only the flags of the registry are kept, not their XML elements.
+    root.clear()
+  return Registry(flags, False)
+
+
+def diff_registries(old, new):
+  """Returns the differences between two registries.
+
+  Args:
+    old: The registry before the changes: a FlagValues object, a Registry,
+      or the path of a JSON schema or XML file.
+    new: The registry after the changes, likewise.
+
+  Returns:
+    A RegistryDiff.
+  """
+  old = load_registry(old)
+  new = load_registry(new)
+  values_compared = old.parsed == new.parsed
+  fields = [field for field in _COMPARED_FIELDS
+            if values_compared or field not in _VALUE_FIELDS]
+  old_flags = old.flags
+  new_flags = new.flags
+  changed = []
+  for name in sorted(name for name in new_flags if name in old_flags):
+    old_flag = old_flags[name]
+    new_flag = new_flags[name]
+    for field in fields:
+      old_value = old_flag.get(field)
+      new_value = new_flag.get(field)
+      if old_value != new_value:
+        changed.append(FlagChange(name, field, old_value, new_value))
+  return RegistryDiff(
+      added=sorted(name for name in new_flags if name not in old_flags),
+      removed=sorted(name for name in old_flags if name not in new_flags),
+      changed=changed,
+      values_compared=values_compared)
+
+
+def write_diff_json(diff, outfile=None):
+  """Outputs a RegistryDiff as a JSON object.
+
+  Args:
+    diff: A RegistryDiff.
+    outfile: File object we write to.  Default None means sys.stdout.
+  """
+  outfile = outfile or sys.stdout
+  outfile.write(json.dumps({
+      'added': diff.added,
+      'removed': diff.removed,
+      'changed': [change._asdict() for change in diff.changed],
+      'values_compared': diff.values_compared,
+  }, sort_keys=True, indent=2))
+  outfile.write('\n')
+  outfile.flush()
+
+
+def main(argv):
+  """Diffs the registries of two files, see the module docstring.
+
+  Args:
+    argv: The command line: the program name and the paths of the old and
+      new registries.
+
+  Returns:
+    The exit status: 0 without differences, 1 with differences and 2 on
+    errors.
+  """
+  if len(argv) != 3:
+    sys.stderr.write('Usage: %s OLD_REGISTRY NEW_REGISTRY\n' % argv[0])
+    return 2
+  try:
+    diff = diff_registries(argv[1], argv[2])
+  except (IOError, OSError, ValueError) as e:
+    sys.stderr.write('%s: %s\n' % (argv[0], e))
+    return 2
+  write_diff_json(diff)
+  return int(bool(diff.added or diff.removed or diff.changed))
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Unittest for registry_diff module."""
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import six
+
+import gflags
+from gflags import registry_diff
+
+
+def _DefineOldFlags(fv):
+  gflags.DEFINE_integer('count', 3, 'Count.', lower_bound=0, flag_values=fv)
+  gflags.DEFINE_enum('mode', 'a', ['a', 'b'], 'Mode.', flag_values=fv)
+  gflags.DEFINE_string('name', 'x', 'Name.', flag_values=fv)
+  gflags.DEFINE_list('hosts', 'a,b', 'Hosts.', flag_values=fv)
+
+
+def _DefineNewFlags(fv):
+  gflags.DEFINE_integer('count', 4, 'Count.', lower_bound=0, flag_values=fv)
+  gflags.DEFINE_enum('mode', 'a', ['a', 'b', 'c'], 'Mode.', flag_values=fv)
+  gflags.DEFINE_float('name', 1.5, 'Name.', flag_values=fv)
+  gflags.DEFINE_list('hosts', 'a,b', 'Other help.', flag_values=fv)
+  gflags.DEFINE_boolean('verbose', False, 'Verbose.', flag_values=fv)
+
+
+class RegistryDiffTest(unittest.TestCase):
+
+  def setUp(self):
+    self.old_fv = gflags.FlagValues()
+    _DefineOldFlags(self.old_fv)
+    self.new_fv = gflags.FlagValues()
+    _DefineNewFlags(self.new_fv)
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _WriteFile(self, name, write_method):
+    path = os.path.join(self.tmpdir, name)
+    output = six.StringIO()
+    write_method(output)
+    with io.open(path, 'w', encoding='utf-8') as registry_file:
+      registry_file.write(six.text_type(output.getvalue()))
+    return path
+
+  def testFlagValues(self):
+    diff = registry_diff.diff_registries(self.old_fv, self.new_fv)
+    self.assertEqual(['verbose'], diff.added)
+    self.assertEqual([], diff.removed)
+    self.assertTrue(diff.values_compared)
+    self.assertEqual(
+        [('count', 'default', 3, 4),
+         ('mode', 'enum_values', ['a', 'b'], ['a', 'b', 'c']),
+         ('name', 'type', 'string', 'float'),
+         ('name', 'default', 'x', 1.5)],
+        [tuple(change) for change in diff.changed])
+
+  def testRemovedFlags(self):
+    diff = registry_diff.diff_registries(self.new_fv, self.old_fv)
+    self.assertEqual([], diff.added)
+    self.assertEqual(['verbose'], diff.removed)
+
+  def testSchemaFileMatchesFlagValues(self):
+    path = self._WriteFile('old.json', self.old_fv.write_schema_json)
+    diff = registry_diff.diff_registries(path, self.old_fv)
+    self.assertEqual(([], [], [], True), tuple(diff))
+    self.assertEqual(
+        registry_diff.diff_registries(self.old_fv, self.new_fv),
+        registry_diff.diff_registries(path, self.new_fv))
+
+  def testXmlFiles(self):
+    old_path = self._WriteFile('old.xml', self.old_fv.WriteHelpInXMLFormat)
+    new_path = self._WriteFile('new.xml', self.new_fv.WriteHelpInXMLFormat)
+    diff = registry_diff.diff_registries(old_path, new_path)
+    self.assertEqual(['verbose'], diff.added)
+    self.assertTrue(diff.values_compared)
+    self.assertEqual(
+        [('count', 'default', '3', '4'),
+         ('mode', 'enum_values', ['a', 'b'], ['a', 'b', 'c']),
+         ('name', 'type', 'string', 'float'),
+         ('name', 'default', 'x', '1.5')],
+        [tuple(change) for change in diff.changed])
+
+  def testXmlAndSchemaDoNotCompareValues(self):
+    old_path = self._WriteFile('old.xml', self.old_fv.WriteHelpInXMLFormat)
+    diff = registry_diff.diff_registries(old_path, self.new_fv)
+    self.assertFalse(diff.values_compared)
+    self.assertEqual(
+        [('mode', 'enum_values', ['a', 'b'], ['a', 'b', 'c']),
+         ('name', 'type', 'string', 'float')],
+        [tuple(change) for change in diff.changed])
+
+  def testUnsupportedSchemaVersion(self):
+    path = os.path.join(self.tmpdir, 'future.json')
+    with open(path, 'w') as schema_file:
+      json.dump({'version': 2, 'flags': []}, schema_file)
+    with self.assertRaises(ValueError) as cm:
+      registry_diff.load_registry(path)
+    self.assertIn('version', str(cm.exception))
+
+  def testMain(self):
+    old_path = self._WriteFile('old.json', self.old_fv.write_schema_json)
+    new_path = self._WriteFile('new.json', self.new_fv.write_schema_json)
+    output = six.StringIO()
+    stdout = sys.stdout
+    sys.stdout = output
+    try:
+      self.assertEqual(0, registry_diff.main(['diff', old_path, old_path]))
+      self.assertEqual(1, registry_diff.main(['diff', old_path, new_path]))
+    finally:
+      sys.stdout = stdout
+    self.assertEqual(2, registry_diff.main(['diff', old_path]))
+    decoder = json.JSONDecoder()
+    unchanged, end = decoder.raw_decode(output.getvalue())
+    self.assertEqual([], unchanged['changed'])
+    changed = json.loads(output.getvalue()[end:])
+    self.assertEqual(['verbose'], changed['added'])
+    self.assertEqual(
+        {'name': 'count', 'field': 'default', 'old': 3, 'new': 4},
+        changed['changed'][0])
+
+  def testMalformedFilesAreErrors(self):
+    xml_path = self._WriteFile('truncated.xml',
+                               self.old_fv.WriteHelpInXMLFormat)
+    with io.open(xml_path, 'r+b') as xml_file:
+      xml_file.truncate(os.path.getsize(xml_path) // 2)
+    schema_path = os.path.join(self.tmpdir, 'nameless.json')
+    with open(schema_path, 'w') as schema_file:
+      json.dump({'version': 1, 'flags': [{'type': 'int'}]}, schema_file)
+    stderr = sys.stderr
+    sys.stderr = six.StringIO()
+    try:
+      self.assertEqual(2, registry_diff.main(['diff', xml_path, xml_path]))
+      self.assertEqual(
+          2, registry_diff.main(['diff', schema_path, schema_path]))
+      errors = sys.stderr.getvalue()
+    finally:
+      sys.stderr = stderr
+    self.assertIn('malformed XML', errors)
+    self.assertIn('malformed flag schema', errors)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -39,12 +39,32 @@ See 'FLAGS VALIDATORS' in the flags module's docstring for a usage manual.
 __author__ = 'olexiy@google.com (Olexiy Oryeshko)'
 
 
+import array
+import collections
+import threading
+
+import six
+
 from gflags import exceptions
 
+try:
+  from collections import abc as collections_abc  # pylint: disable=g-import-not-at-top
+except ImportError:  # Python 2.
+  collections_abc = collections
+
 
 # TODO(yileiyang): Remove this.
 Error = exceptions.ValidationError  # pylint: disable=invalid-name
 
+# Number of distinct inputs whose results are remembered by a pure validator.
+_PURE_RESULTS_CACHE_SIZE = 16
+
+# Marks a missing entry of a results cache.
+_MISSING = object()
+
+# Types whose instances _fingerprint converts recursively.
+_CONTAINER_TYPES = frozenset([list, tuple, dict, set, frozenset])
+
 
 class Validator(object):
   """Base class for flags validators.
@@ -56,7 +76,11 @@ class Validator(object):
   # Used to assign each validator an unique insertion_index
   validators_count = 0
 
-  def __init__(self, checker, message):
+  # Whether the flag parsers already enforce the constraint, in which case
+  # FlagValues skips it when verifying freshly parsed values.
+  parser_checked = False
+
+  def __init__(self, checker, message, independent=False, pure=False):
     """Constructor to create all validators.
 
     Args:
@@ -64,9 +88,20 @@ class Validator(object):
         Input of this method varies, see SingleFlagValidator and
           multi_flags_validator for a detailed description.
       message: string, error message to be shown to the user
+      independent: bool, whether checker has no side effects and may run
+        concurrently with other independent validators.
+      pure: bool, whether the result of checker depends only on its input,
+        so that the results for recent inputs can be reused.
     """
     self.checker = checker
     self.message = message
+    self.independent = independent
+    self.pure = pure
+    if pure:
+      # OrderedDict: hash of the fingerprint of an input -> (fingerprint,
+      # None or error message), least recently used first.
+      self._results = collections.OrderedDict()
+      self._results_lock = threading.Lock()
     Validator.validators_count += 1
     # Used to assert validators in the order they were registered (CL/18694236)
     self.insertion_index = Validator.validators_count
@@ -81,9 +116,38 @@ class Validator(object):
       Error: if constraint is not satisfied.
     """
     param = self._get_input_to_checker_function(flag_values)
-    if not self.checker(param):
+    if self.pure:
+      self._verify_pure(param)
+    elif not self.checker(param):
       raise exceptions.ValidationError(self.message)
 
+  def _verify_pure(self, param):
+    """Same as verify, reusing the results of the checker for recent inputs."""
+    try:
+      fingerprint = _fingerprint(param)
+      # Tuples do not cache their hash: compute it only once.
+      key = hash(fingerprint)
+    except TypeError:
+      # Unhashable input: the result cannot be remembered.
+      if not self.checker(param):
+        raise exceptions.ValidationError(self.message)
+      return
+    with self._results_lock:
+      entry = self._results.pop(key, _MISSING)
+    if entry is not _MISSING and entry[0] == fingerprint:
+      message = entry[1]
+    else:
+      try:
+        message = None if self.checker(param) else self.message
+      except exceptions.ValidationError as e:
+        message = str(e)
+    with self._results_lock:
+      self._results[key] = (fingerprint, message)
+      if len(self._results) > _PURE_RESULTS_CACHE_SIZE:
+        self._results.popitem(last=False)
+    if message is not None:
+      raise exceptions.ValidationError(message)
+
   def get_flags_names(self):
     """Return the names of the flags checked by this validator.
 
@@ -114,7 +178,8 @@ class SingleFlagValidator(Validator):
   is not valid, either returns False or raises an Exception.
   """
 
-  def __init__(self, flag_name, checker, message):
+  def __init__(self, flag_name, checker, message, independent=False,
+               pure=False):
     """Constructor.
 
     Args:
@@ -126,8 +191,12 @@ class SingleFlagValidator(Validator):
           raise Error.
       message: string, error message to be shown to the user if validator's
         condition is not satisfied
+      independent: bool, whether checker may run concurrently with other
+        independent validators.
+      pure: bool, whether the result of checker depends only on its input.
     """
-    super(SingleFlagValidator, self).__init__(checker, message)
+    super(SingleFlagValidator, self).__init__(
+        checker, message, independent, pure)
     self.flag_name = flag_name
 
   def get_flags_names(self):
@@ -155,7 +224,8 @@ class MultiFlagsValidator(Validator):
   if values are not valid, either returns False or raises an Exception.
   """
 
-  def __init__(self, flag_names, checker, message):
+  def __init__(self, flag_names, checker, message, independent=False,
+               pure=False):
     """Constructor.
 
     Args:
@@ -168,8 +238,12 @@ class MultiFlagsValidator(Validator):
           raise Error.
       message: string, error message to be shown to the user if validator's
         condition is not satisfied
+      independent: bool, whether checker may run concurrently with other
+        independent validators.
+      pure: bool, whether the result of checker depends only on its input.
     """
-    super(MultiFlagsValidator, self).__init__(checker, message)
+    super(MultiFlagsValidator, self).__init__(
+        checker, message, independent, pure)
     self.flag_names = flag_names
 
   def _get_input_to_checker_function(self, flag_values):
@@ -192,3 +266,422 @@ class MultiFlagsValidator(Validator):
 
   def get_flags_names(self):
     return self.flag_names
+
+
+class ConstraintValidator(Validator):
+  """Validator for a declarative constraint, see gflags.constrain_*.
+
+  A constraint is a row (kind, flag names, argument) instead of a checker
+  closure: verify() reads the values of the flags and looks up the check for
+  the kind in _CONSTRAINT_CHECKS, a table of plain functions.  The functions
+  take the flag names, the list of flag values and the argument, and return
+  an error message, or None when the constraint is satisfied.  FlagValues
+  checks all its constraints in a single pass over a ConstraintTable, and
+  only calls verify() for the failed ones.
+  """
+
+  def __init__(self, kind, flag_names, argument, message=None,
+               parser_checked=False):
+    """Constructor.
+
+    Args:
+      kind: string, key of _CONSTRAINT_CHECKS.
+      flag_names: [string], names of the flags constrained.
+      argument: argument of the check, e.g. the bounds of a range.
+      message: string, error message to be shown to the user if the
+        constraint is not satisfied, or None to use the message of the check.
+      parser_checked: bool, whether the flag parser already enforces the
+        constraint, so that the values resulting from parsing need not be
+        verified again.
+    """
+    super(ConstraintValidator, self).__init__(
+        _CONSTRAINT_CHECKS[kind], message)
+    self.kind = kind
+    self.flag_names = flag_names
+    self.argument = argument
+    self.parser_checked = parser_checked
+
+  def verify(self, flag_values):
+    error = self.checker(self.flag_names,
+                         self._get_input_to_checker_function(flag_values),
+                         self.argument)
+    if error is not None:
+      raise exceptions.ValidationError(self.message or error)
+
+  def get_flags_names(self):
+    return self.flag_names
+
+  def print_flags_with_values(self, flag_values):
+    if len(self.flag_names) == 1:
+      return 'flag --%s=%s' % (self.flag_names[0],
+                               flag_values[self.flag_names[0]].value)
+    return 'flags ' + ', '.join('%s=%s' % (key, flag_values[key].value)
+                                for key in self.flag_names)
+
+  def _get_input_to_checker_function(self, flag_values):
+    """Given flag values, construct the input to be given to checker.
+
+    Args:
+      flag_values: gflags.FlagValues
+    Returns:
+      list, the values of the flags in the order of self.flag_names.
+    """
+    return [flag_values[key].value for key in self.flag_names]
+
+
+class ConstraintTable(object):
+  """The constraints of a FlagValues, compiled to rows checked in one loop.
+
+  Each ConstraintValidator is compiled once into a row (scalar check,
+  check, flag names, argument).  filter_unsatisfied() evaluates the rows of
+  many validators in a single loop, reading the flag values straight from
+  the flag dictionary, without the per-validator method calls and exception
+  handling of Validator.verify().  The kinds in _SCALAR_CHECKS are first
+  checked with a cheaper predicate on the value of their only flag.
+  """
+
+  def __init__(self):
+    # Dictionary: Validator -> row of a ConstraintValidator, or None for the
+    # other validators.
+    self._rows = {}
+
+  def _compile(self, validator):
+    """Returns the row of validator, or None if it is not a constraint."""
+    if not isinstance(validator, ConstraintValidator):
+      return None
+    scalar_check = None
+    if len(validator.flag_names) == 1:
+      scalar_check = _SCALAR_CHECKS.get(validator.kind)
+    return (scalar_check, validator.checker, validator.flag_names,
+            validator.argument)
+
+  def filter_unsatisfied(self, validators, flag_dict):
+    """Returns the validators not known to be satisfied, in the same order.
+
+    Args:
+      validators: iterable of Validator.
+      flag_dict: dictionary, flag name -> Flag, see FlagValues.FlagDict().
+
+    Returns:
+      A list of the validators that are not constraints, and of the
+      constraints that are not satisfied or could not be checked (e.g. when
+      a flag is missing).  They must be verified with Validator.verify().
+    """
+    rows = self._rows
+    unsatisfied = []
+    for validator in validators:
+      row = rows.get(validator, self)
+      if row is self:
+        row = rows[validator] = self._compile(validator)
+      if row is not None:
+        scalar_check, check, flag_names, argument = row
+        try:
+          if scalar_check is not None:
+            if scalar_check(flag_dict[flag_names[0]].value, argument):
+              continue
+          elif check(flag_names, [flag_dict[name].value for name in flag_names],
+                     argument) is None:
+            continue
+        except Exception:  # pylint: disable=broad-except
+          # Let Validator.verify() raise the error.
+          pass
+      unsatisfied.append(validator)
+    return unsatisfied
+
+
+def _fingerprint(value):
+  """Returns a hashable representation of a checker input.
+
+  Lists, tuples, sets and dictionaries are converted recursively; the types
+  are kept so that e.g. 1 and True get different fingerprints.
+
+  Args:
+    value: the input of a checker.
+  Returns:
+    A tuple usable as a dictionary key if all the scalar values are hashable.
+  """
+  if isinstance(value, (list, tuple)):
+    items = tuple(value)
+    types = tuple(map(type, items))
+    if not _CONTAINER_TYPES.isdisjoint(types):
+      items = tuple(map(_fingerprint, items))
+    return (type(value), types, items)
+  if isinstance(value, dict):
+    return (type(value), tuple(sorted(
+        (key, _fingerprint(item)) for key, item in six.iteritems(value))))
+  if isinstance(value, (set, frozenset)):
+    return (type(value), frozenset(_fingerprint(item) for item in value))
+  return (type(value), value)
+
+
+def _is_sequence(value):
+  """Returns whether value is the value of a list flag.
+
+  Only lists, tuples and arrays (array.array, one-dimensional NumPy arrays)
+  are list values: the items of e.g. mappings or sets are not checked one by
+  one.
+
+  Args:
+    value: the value of a flag.
+  Returns:
+    A bool.
+  """
+  if isinstance(value, (list, tuple, array.array)):
+    return True
+  # NumPy arrays, as parsed by IntegerListParser(use_numpy=True).
+  return getattr(value, 'ndim', None) == 1 and hasattr(value, 'tolist')
+
+
+def _items(value):
+  """Returns the items of a list value, or value itself as a single item."""
+  if _is_sequence(value):
+    return value
+  return (value,)
+
+
+def _is_set(value):
+  return value is not None and value is not False
+
+
+def _check_range(unused_flag_names, values, bounds):
+  lower_bound, upper_bound, description = bounds
+  value = values[0]
+  if value is None:
+    return None
+  if _is_sequence(value):
+    if not len(value):  # pylint: disable=g-explicit-length-test
+      return None
+    smallest, largest = min(value), max(value)
+  else:
+    smallest = largest = value
+  if lower_bound is not None and smallest < lower_bound:
+    return '%s is not %s' % (smallest, description)
+  if upper_bound is not None and largest > upper_bound:
+    return '%s is not %s' % (largest, description)
+  return None
+
+
+def _check_regex(unused_flag_names, values, regex):
+  if values[0] is None:
+    return None
+  for item in _items(values[0]):
+    if not isinstance(item, six.string_types):
+      return '%r is not a string' % (item,)
+    match = regex.match(item)
+    if match is None or match.end() != len(item):
+      return '%r does not match %r' % (item, regex.pattern)
+  return None
+
+
+def _check_one_of(unused_flag_names, values, allowed_values):
+  if values[0] is None:
+    return None
+  for item in _items(values[0]):
+    try:
+      allowed = item in allowed_values
+    except TypeError:  # Unhashable items, e.g. dictionaries.
+      allowed = False
+    if not allowed:
+      return '%r is not one of %s' % (
+          item, ', '.join(sorted(repr(v) for v in allowed_values)))
+  return None
+
+
+def _check_non_empty(unused_flag_names, values, unused_argument):
+  if values[0] is not None and not len(values[0]):  # pylint: disable=g-explicit-length-test
+    return 'value must not be empty'
+  return None
+
+
+def _check_required(flag_names, values, unused_argument):
+  if values[0] is None:
+    return 'Flag --%s must be specified.' % flag_names[0]
+  return None
+
+
+def _check_mutual_exclusion(flag_names, values, required):
+  flag_count = sum(1 for value in values if value is not None)
+  if flag_count == 1 or (not required and flag_count == 0):
+    return None
+  return '%s one of (%s) must be specified.' % (
+      'Exactly' if required else 'At most', ', '.join(flag_names))
+
+
+def _check_implies(flag_names, values, unused_argument):
+  if not _is_set(values[0]):
+    return None
+  missing = [name for name, value in zip(flag_names[1:], values[1:])
+             if value is None]
+  if missing:
+    return '--%s requires %s to be specified.' % (
+        flag_names[0], ', '.join('--' + name for name in missing))
+  return None
+
+
+# JSON schema type name -> predicate on decoded JSON values.
+_JSON_SCHEMA_TYPES = {
+    'object': lambda value: isinstance(value, collections_abc.Mapping),
+    'array': lambda value: isinstance(value, (list, tuple)),
+    'string': lambda value: isinstance(value, six.string_types),
+    'integer': lambda value: (isinstance(value, six.integer_types) and
+                              not isinstance(value, bool)),
+    'number': lambda value: (isinstance(value, six.integer_types + (float,))
+                             and not isinstance(value, bool)),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+
+# Keywords that _check_json_schema_definition accepts.
+_JSON_SCHEMA_KEYWORDS = frozenset([
+    'type', 'enum', 'minimum', 'maximum', 'properties', 'required',
+    'additionalProperties', 'items', 'title', 'description'])
+
+
+def _check_json_schema_definition(schema, path='$'):
+  """Checks that a schema only uses the supported subset of JSON Schema.
+
+  See _json_schema_error for the supported keywords.  The annotations title and
+  description are accepted and ignored.
+
+  Args:
+    schema: dict, the schema to check.
+    path: string, where schema is in the checked schema, e.g. $.items.
+  Raises:
+    ValueError: if the schema is not valid.
+  """
+  if not isinstance(schema, dict):
+    raise ValueError('%s: a JSON schema must be a dict, found %r' %
+                     (path, schema))
+  for keyword in sorted(schema):
+    if keyword not in _JSON_SCHEMA_KEYWORDS:
+      raise ValueError('%s: unsupported JSON schema keyword %r' %
+                       (path, keyword))
+  types = schema.get('type', [])
+  if isinstance(types, six.string_types):
+    types = [types]
+  if not isinstance(types, (list, tuple)):
+    raise ValueError('%s: type must be a name or a list of names, found %r' %
+                     (path, types))
+  for name in types:
+    if name not in _JSON_SCHEMA_TYPES:
+      raise ValueError('%s: unknown JSON schema type %r' % (path, name))
+  if not isinstance(schema.get('enum', []), (list, tuple)):
+    raise ValueError('%s: enum must be a list' % path)
+  for keyword in ('minimum', 'maximum'):
+    if (keyword in schema and
+        not _JSON_SCHEMA_TYPES['number'](schema[keyword])):
+      raise ValueError('%s: %s must be a number, found %r' %
+                       (path, keyword, schema[keyword]))
+  required = schema.get('required', [])
+  if (not isinstance(required, (list, tuple)) or
+      not all(isinstance(key, six.string_types) for key in required)):
+    raise ValueError('%s: required must be a list of property names' % path)
+  if not isinstance(schema.get('additionalProperties', True), bool):
+    raise ValueError('%s: additionalProperties must be a bool' % path)
+  properties = schema.get('properties', {})
+  if not isinstance(properties, dict):
+    raise ValueError('%s: properties must be a dict' % path)
+  for key in sorted(properties):
+    _check_json_schema_definition(properties[key], '%s.properties.%s' %
+                                  (path, key))
+  if 'items' in schema:
+    _check_json_schema_definition(schema['items'], path + '.items')
+
+
+def _json_schema_error(value, schema, path):
+  """Returns why a decoded JSON value does not match a schema, or None.
+
+  The schema is a dictionary using a small subset of JSON Schema: the
+  keywords type (a name or a list of names), enum, minimum, maximum,
+  properties, required, additionalProperties (a bool) and items.
+
+  Args:
+    value: the decoded JSON value.
+    schema: dict, the schema of the value.
+    path: string, where value is in the checked JSON document, e.g. $.a[0].
+  Returns:
+    An error message, or None.
+  """
+  types = schema.get('type')
+  if types is not None:
+    if isinstance(types, six.string_types):
+      types = [types]
+    if not any(_JSON_SCHEMA_TYPES[name](value) for name in types):
+      return '%s: expected %s, found %r' % (path, ' or '.join(types), value)
+  if 'enum' in schema and value not in schema['enum']:
+    return '%s: %r is not one of %r' % (path, value, list(schema['enum']))
+  # Like in JSON Schema, the bounds only apply to numbers.
+  if _JSON_SCHEMA_TYPES['number'](value):
+    if 'minimum' in schema and value < schema['minimum']:
+      return '%s: %r is less than %r' % (path, value, schema['minimum'])
+    if 'maximum' in schema and value > schema['maximum']:
+      return '%s: %r is greater than %r' % (path, value, schema['maximum'])
+  if isinstance(value, collections_abc.Mapping):
+    for key in schema.get('required', ()):
+      if key not in value:
+        return '%s: missing required property %r' % (path, key)
+    properties = schema.get('properties', {})
+    for key in sorted(value):
+      if key in properties:
+        error = _json_schema_error(value[key], properties[key],
+                                   '%s.%s' % (path, key))
+        if error is not None:
+          return error
+      elif schema.get('additionalProperties', True) is False:
+        return '%s: unexpected property %r' % (path, key)
+  elif isinstance(value, (list, tuple)) and 'items' in schema:
+    for index, item in enumerate(value):
+      error = _json_schema_error(item, schema['items'],
+                                 '%s[%d]' % (path, index))
+      if error is not None:
+        return error
+  return None
+
+
+def _check_json_schema(unused_flag_names, values, schema):
+  if values[0] is None:
+    return None
+  return _json_schema_error(values[0], schema, '$')
+
+
+# Types of the values that _in_range can compare to the bounds.
+_SCALAR_NUMBER_TYPES = frozenset(six.integer_types + (float,))
+
+
+def _in_range(value, bounds):
+  """Returns True if value is None or a number within bounds."""
+  if value is None:
+    return True
+  lower_bound, upper_bound = bounds[0], bounds[1]
+  return (type(value) in _SCALAR_NUMBER_TYPES and
+          (lower_bound is None or value >= lower_bound) and
+          (upper_bound is None or value <= upper_bound))
+
+
+def _is_one_of(value, allowed_values):
+  """Returns True if value is None or an allowed string."""
+  return value is None or (isinstance(value, six.string_types) and
+                           value in allowed_values)
+
+
+# Constraint kind -> predicate (value of the only flag, argument) returning
+# True if the constraint is satisfied, and False if the check of the kind in
+# _CONSTRAINT_CHECKS must decide.  See ConstraintTable.
+_SCALAR_CHECKS = {
+    'range': _in_range,
+    'required': lambda value, unused_argument: value is not None,
+    'one_of': _is_one_of,
+}
+
+# Constraint kind -> check function, see ConstraintValidator.
+_CONSTRAINT_CHECKS = {
+    'range': _check_range,
+    'regex': _check_regex,
+    'one_of': _check_one_of,
+    'non_empty': _check_non_empty,
+    'required': _check_required,
+    'mutual_exclusion': _check_mutual_exclusion,
+    'implies': _check_implies,
+    'json_schema': _check_json_schema,
+}
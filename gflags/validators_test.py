@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Unittest for validators module."""
+
+import unittest
+
+import gflags
+from gflags import validators as gflags_validators
+
+
+class ConstraintsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_integer('count', 5, 'help', lower_bound=0, upper_bound=10,
+                          flag_values=self.fv)
+    gflags.DEFINE_string('name', None, 'help', flag_values=self.fv)
+    gflags.DEFINE_string('mode', 'fast', 'help', flag_values=self.fv)
+    gflags.DEFINE_list('items', [], 'help', flag_values=self.fv)
+    gflags.DEFINE_boolean('verbose', False, 'help', flag_values=self.fv)
+    gflags.DEFINE_integer('level', None, 'help', flag_values=self.fv)
+
+  def _AssertErrorMessage(self, expected, argv):
+    with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+      self.fv(argv)
+    self.assertEqual(expected, str(cm.exception))
+
+  def testRange(self):
+    gflags.constrain_range('level', 1, 3, flag_values=self.fv)
+    self.fv(['program', '--level=2'])
+    self._AssertErrorMessage(
+        'flag --level=4: 4 is not in the range [1, 3]',
+        ['program', '--level=4'])
+
+  def testRegex(self):
+    gflags.constrain_regex('name', r'[a-z]+', flag_values=self.fv)
+    self.fv(['program', '--name=abc'])
+    self._AssertErrorMessage(
+        "flag --name=abc1: 'abc1' does not match '[a-z]+'",
+        ['program', '--name=abc1'])
+
+  def testOneOfChecksEveryListItem(self):
+    gflags.constrain_one_of('items', ['a', 'b'], flag_values=self.fv)
+    self.fv(['program', '--items=a,b,a'])
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      self.fv, ['program', '--items=a,c'])
+
+  def testMappingsAndSetsAreNotListValues(self):
+    gflags.DEFINE_json('config', '{"a": 1}', 'help', flag_values=self.fv)
+    gflags.constrain_regex('config', r'[a-z]+', flag_values=self.fv)
+    self._AssertErrorMessage(
+        "flag --config={'a': 1}: {'a': 1} is not a string", ['program'])
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_json('config', '{"a": 1}', 'help', flag_values=self.fv)
+    gflags.constrain_one_of('config', ['a'], flag_values=self.fv)
+    self._AssertErrorMessage(
+        "flag --config={'a': 1}: {'a': 1} is not one of 'a'", ['program'])
+    gflags.DEFINE_flag(gflags.Flag(
+        gflags.ArgumentParser(), gflags.ArgumentSerializer(), 'letters',
+        None, 'help'), flag_values=self.fv)
+    self.fv['letters'].value = set(['a'])
+    gflags.constrain_one_of('letters', ['a'], flag_values=self.fv)
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv, ['program'])
+
+  def testNonEmpty(self):
+    gflags.constrain_non_empty('mode', flag_values=self.fv)
+    self.fv(['program'])
+    self._AssertErrorMessage('flag --mode=: value must not be empty',
+                             ['program', '--mode='])
+
+  def testRequired(self):
+    gflags.mark_flag_as_required('name', flag_values=self.fv)
+    self._AssertErrorMessage('flag --name=None: Flag --name must be specified.',
+                             ['program'])
+
+  def testMutualExclusion(self):
+    gflags.mark_flags_as_mutual_exclusive(['name', 'level'],
+                                          flag_values=self.fv)
+    self.fv(['program', '--level=1'])
+    self._AssertErrorMessage(
+        'flags name=x, level=1: At most one of (name, level) must be '
+        'specified.', ['program', '--name=x'])
+
+  def testImplies(self):
+    gflags.constrain_implies('verbose', ['name', 'level'], flag_values=self.fv)
+    self.fv(['program'])
+    self._AssertErrorMessage(
+        'flags verbose=True, name=x, level=None: --verbose requires --level '
+        'to be specified.', ['program', '--verbose', '--name=x'])
+
+  def testCustomMessage(self):
+    gflags.constrain_range('level', upper_bound=3, message='too high',
+                           flag_values=self.fv)
+    self._AssertErrorMessage('flag --level=7: too high',
+                             ['program', '--level=7'])
+
+  def testParserBoundsAreVerifiedOnDirectlyAssignedValues(self):
+    self.assertTrue(self.fv['count'].validators[0].parser_checked)
+    # Bypasses both the parser and the validators.
+    self.fv['count'].value = 50
+    with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+      self.fv(['program'])
+    self.assertEqual(
+        'flag --count=50: 50 is not an integer in the range [0, 10]',
+        str(cm.exception))
+    self.fv(['program', '--count=5'])
+    self.fv['count'].value = 50
+    self.assertRaises(gflags.IllegalFlagValueError, self.fv, ['program'])
+    self.assertRaises(gflags.IllegalFlagValueError,
+                      self.fv, ['program', '--count=11'])
+
+  def testParserBoundsAreVerifiedOnAssignment(self):
+    self.fv(['program'])
+    with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+      self.fv.count = 11
+    self.assertEqual(
+        'flag --count=11: 11 is not an integer in the range [0, 10]',
+        str(cm.exception))
+
+  def testConstraintTable(self):
+    gflags.constrain_range('level', 1, 3, flag_values=self.fv)
+    gflags.constrain_one_of('mode', ['fast', 'slow'], flag_values=self.fv)
+    gflags.constrain_non_empty('items', flag_values=self.fv)
+    gflags.mark_flag_as_required('name', flag_values=self.fv)
+    gflags.register_validator('count', lambda value: True,
+                              flag_values=self.fv)
+    table = gflags_validators.ConstraintTable()
+    validators = self.fv._GetSortedValidators()
+    self.assertEqual(
+        [self.fv['items'].validators[0], self.fv['name'].validators[0],
+         self.fv['count'].validators[1]],
+        table.filter_unsatisfied(validators, self.fv.FlagDict()))
+    self.fv['mode'].value = 'other'
+    self.fv['name'].value = 'x'
+    self.fv['items'].value = ['a']
+    self.assertEqual(
+        [self.fv['mode'].validators[0], self.fv['count'].validators[1]],
+        table.filter_unsatisfied(validators, self.fv.FlagDict()))
+
+  def testJsonSchema(self):
+    gflags.DEFINE_json(
+        'config', '{"port": 80}', 'help', flag_values=self.fv,
+        schema={'type': 'object', 'required': ['port'],
+                'additionalProperties': False,
+                'properties': {
+                    'port': {'type': 'integer', 'minimum': 1},
+                    'hosts': {'type': 'array', 'items': {'type': 'string'}},
+                }})
+    self.fv(['program', '--config={"port": 8080, "hosts": ["a"]}'])
+    for argument, error in (
+        ('{"hosts": []}', "$: missing required property 'port'"),
+        ('{"port": 0}', '$.port: 0 is less than 1'),
+        ('{"port": true}', '$.port: expected integer, found True'),
+        ('{"port": 1, "hosts": ["a", 2]}',
+         '$.hosts[1]: expected string, found 2'),
+        ('{"port": 1, "other": 2}', "$: unexpected property 'other'")):
+      with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+        self.fv(['program', '--config=' + argument])
+      self.assertTrue(str(cm.exception).endswith(error), cm.exception)
+
+  def testInvalidJsonSchemaIsRejectedAtDefinition(self):
+    for schema, error in (
+        ({'type': 'dict'}, "$: unknown JSON schema type 'dict'"),
+        ({'items': {'minimun': 1}},
+         "$.items: unsupported JSON schema keyword 'minimun'"),
+        ({'properties': {'port': {'maximum': '5'}}},
+         "$.properties.port: maximum must be a number, found '5'"),
+        ({'required': 'port'},
+         '$: required must be a list of property names'),
+        ([], '$: a JSON schema must be a dict, found []')):
+      with self.assertRaises(ValueError) as cm:
+        gflags.DEFINE_json('config', None, 'help', flag_values=self.fv,
+                           schema=schema)
+      self.assertEqual(error, str(cm.exception))
+    self.assertNotIn('config', self.fv)
+    gflags.DEFINE_json('config', None, 'help', flag_values=self.fv,
+                       schema={'type': ['object', 'null'], 'title': 'Config'})
+
+  def testJsonSchemaBoundsOnlyApplyToNumbers(self):
+    gflags.DEFINE_json(
+        'config', None, 'help', flag_values=self.fv,
+        schema={'items': {'minimum': 1, 'maximum': 5}})
+    self.fv(['program', '--config=["a", true, null, {}, 2, 3.5]'])
+    for argument, error in (
+        ('["a", 0]', '$[1]: 0 is less than 1'),
+        ('[6.5, "a"]', '$[0]: 6.5 is greater than 5')):
+      with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+        self.fv(['program', '--config=' + argument])
+      self.assertTrue(str(cm.exception).endswith(error), cm.exception)
+
+
+class PureValidatorTest(unittest.TestCase):
+
+  def setUp(self):
+    self.fv = gflags.FlagValues()
+    gflags.DEFINE_list('items', ['a'], 'help', flag_values=self.fv)
+    gflags.DEFINE_integer('count', 1, 'help', flag_values=self.fv)
+    self.calls = []
+
+  def _Checker(self, values):
+    self.calls.append(values)
+    return len(values['items']) <= values['count']
+
+  def testResultsAreReusedForSameInput(self):
+    gflags.register_multi_flags_validator(
+        ['items', 'count'], self._Checker, pure=True, flag_values=self.fv)
+    self.fv(['program'])
+    self.fv.count = 2
+    self.fv.count = 1
+    self.fv.validate_all()
+    self.assertEqual(2, len(self.calls))
+
+  def testFailuresAreReused(self):
+    gflags.register_multi_flags_validator(
+        ['items', 'count'], self._Checker, message='too many items',
+        pure=True, flag_values=self.fv)
+    self.fv(['program'])
+    for unused_i in range(2):
+      with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+        self.fv.items = ['a', 'b']
+      self.assertIn('too many items', str(cm.exception))
+    self.assertEqual(2, len(self.calls))
+
+  def testValidationErrorMessagesAreReused(self):
+
+    def Checker(value):
+      self.calls.append(value)
+      raise gflags.ValidationError('never valid: %s' % value)
+
+    gflags.register_validator('count', Checker, pure=True,
+                              flag_values=self.fv)
+    for unused_i in range(2):
+      with self.assertRaises(gflags.IllegalFlagValueError) as cm:
+        self.fv.validate_all()
+      self.assertEqual('flag --count=1: never valid: 1', str(cm.exception))
+    self.assertEqual([1], self.calls)
+
+  def testInputTypesAreDistinguished(self):
+    gflags.DEFINE_boolean('flag', True, 'help', flag_values=self.fv)
+    gflags.register_validator('flag', lambda value: value is True, pure=True,
+                              flag_values=self.fv)
+    self.fv(['program'])
+    self.assertRaises(gflags.IllegalFlagValueError, setattr, self.fv, 'flag',
+                      1)
+
+  def testCacheIsBounded(self):
+    gflags.register_validator('count', lambda value: self.calls.append(value)
+                              or True, pure=True, flag_values=self.fv)
+    self.fv(['program'])
+    for i in range(100):
+      self.fv.count = i
+    self.assertTrue(
+        len(self.fv['count'].validators[0]._results) <= 16)  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+  unittest.main()